@@ -0,0 +1,111 @@
+# app/accounting.py
+import sys
+
+DICT_ENTRY_BYTES = 40  # hash table slot and index share of one dict entry
+
+def tuple_bytes(length: int) -> int:
+    return 40 + 8 * length
+
+def set_bytes(length: int) -> int:
+    """Approximate sys.getsizeof of a set or frozenset; tables are kept at most 60% full."""
+    slots = 8
+    while slots * 3 < length * 5:
+        slots *= 2
+    return 216 if slots == 8 else 200 + 16 * slots
+
+# Value size model per Storage structure, from the value's number of elements
+VALUE_BYTES = {
+    "connections": tuple_bytes,
+    "channels": set_bytes,
+    "memberships": set_bytes,
+    "channel_requests": lambda length: 184,
+    "request_index": set_bytes,
+    "invitations": set_bytes,
+    "group_owners": lambda length: 0,  # values are address strings owned by other structures
+    "group_invites": set_bytes,
+    "sequences": lambda length: 28,
+}
+
+# Structures whose value lengths are tracked as histograms
+HISTOGRAMS = {"channels": "subscribers_per_channel", "connections": "devices_per_address"}
+
+class Histogram:
+    """Counts of values by power-of-two length bucket: 0, 1, 2-3, 4-7, ..."""
+    def __init__(self):
+        self.buckets = []
+
+    def move(self, old: int | None, new: int | None) -> None:
+        """Move one value from the bucket of length old to that of length new; None means absent."""
+        if old is not None:
+            self.buckets[old.bit_length()] -= 1
+        if new is not None:
+            index = new.bit_length()
+            if index >= len(self.buckets):
+                self.buckets.extend([0] * (index + 1 - len(self.buckets)))
+            self.buckets[index] += 1
+
+    def report(self) -> dict:
+        labels = ("0", "1") + tuple(f"{1 << (i - 1)}-{(1 << i) - 1}" for i in range(2, len(self.buckets)))
+        return {label: count for label, count in zip(labels, self.buckets) if count}
+
+class MemoryAccounting:
+    """Running entry, element and estimated byte counts of Storage structures.
+
+    Storage reports every change of a dictionary value as the value's
+    element count before and after, None meaning no entry. Counters are
+    adjusted in constant time, so a report costs the same with millions of
+    entries. Byte estimates are shallow: dict entries, keys and value
+    containers, not the address strings they share with other structures.
+    """
+    def __init__(self):
+        self.entries = dict.fromkeys(VALUE_BYTES, 0)
+        self.elements = dict.fromkeys(VALUE_BYTES, 0)
+        self.bytes = dict.fromkeys(VALUE_BYTES, 0)
+        self.histograms = {name: Histogram() for name in HISTOGRAMS}
+
+    def update(self, structure: str, key: str, old: int | None, new: int | None) -> None:
+        """Record that the value under key went from old to new elements."""
+        value_bytes = VALUE_BYTES[structure]
+        delta = 0
+        if old is None:
+            self.entries[structure] += 1
+            delta += DICT_ENTRY_BYTES + sys.getsizeof(key)
+        else:
+            self.elements[structure] -= old
+            delta -= value_bytes(old)
+        if new is None:
+            self.entries[structure] -= 1
+            delta -= DICT_ENTRY_BYTES + sys.getsizeof(key)
+        else:
+            self.elements[structure] += new
+            delta += value_bytes(new)
+        self.bytes[structure] += delta
+        if structure in self.histograms:
+            self.histograms[structure].move(old, new)
+
+    def report(self) -> dict:
+        """Return counts, estimated bytes and histograms."""
+        structures = {
+            name: {"entries": self.entries[name], "elements": self.elements[name], "estimated_bytes": self.bytes[name]}
+            for name in VALUE_BYTES
+        }
+        return {
+            "structures": structures,
+            "estimated_bytes": sum(self.bytes.values()),
+            "histograms": {label: self.histograms[name].report() for name, label in HISTOGRAMS.items()},
+        }
+
+def measure(store) -> dict:
+    """Walk every structure and return its actual shallow size, for checking the estimates.
+
+    This is proportional to the number of entries, unlike MemoryAccounting.report().
+    """
+    sizes = {}
+    for name in VALUE_BYTES:
+        total = 0
+        for key, value in getattr(store, name).items():
+            total += DICT_ENTRY_BYTES + sys.getsizeof(key)
+            if name != "group_owners":
+                total += sys.getsizeof(value)
+        sizes[name] = total
+    return sizes
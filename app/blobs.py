@@ -0,0 +1,203 @@
+# app/blobs.py
+import asyncio
+import hashlib
+import os
+import re
+import time
+import uuid
+from app import utils
+
+BLOB_MAX_SIZE = 100 * 1024 * 1024  # bytes per blob at most
+BLOB_CHUNK_SIZE = 256 * 1024  # bytes per binary upload frame at most
+BLOB_READ_SIZE = 1024 * 1024  # bytes read at a time when hashing a finished upload
+UPLOAD_ID_SIZE = 16  # bytes of the upload id prefix of a binary frame
+OFFSET_SIZE = 8  # bytes of the big-endian offset following the upload id
+UPLOAD_EXPIRY = 24 * 60 * 60  # seconds an unfinished upload is kept without new chunks
+UPLOAD_SWEEP_INTERVAL = 60 * 60  # seconds between sweeps for expired partial files
+DIGEST_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+
+def is_valid_digest(digest: str) -> bool:
+    """Check if a string is a lowercase hex SHA-256 digest."""
+    return isinstance(digest, str) and bool(DIGEST_PATTERN.match(digest))
+
+def parse_chunk(frame: bytes) -> tuple[bool, str | tuple[str, int, bytes]]:
+    """Split a binary upload frame into (upload id, offset, data).
+
+    Frames are the 16 raw bytes of the upload id, the offset of the data as
+    an unsigned 64-bit big-endian integer, then the data.
+    """
+    header_size = UPLOAD_ID_SIZE + OFFSET_SIZE
+    if len(frame) <= header_size:
+        return False, "Binary frame too short"
+    if len(frame) - header_size > BLOB_CHUNK_SIZE:
+        return False, f"Chunk too large (max {BLOB_CHUNK_SIZE} bytes)"
+    upload_id = frame[:UPLOAD_ID_SIZE].hex()
+    offset = int.from_bytes(frame[UPLOAD_ID_SIZE:header_size], "big")
+    return True, (upload_id, offset, frame[header_size:])
+
+class Upload:
+    """A partially received blob, appended to a .part file."""
+    __slots__ = ("upload_id", "owner", "digest", "size", "offset", "path", "lock")
+
+    def __init__(self, upload_id: str, owner: str, digest: str, size: int, path: str):
+        self.upload_id = upload_id
+        self.owner = owner
+        self.digest = digest
+        self.size = size
+        self.path = path
+        self.offset = os.path.getsize(path) if os.path.exists(path) else 0
+        self.lock = asyncio.Lock()  # Keeps chunks from several sockets in order
+
+class BlobStore:
+    """Content-addressed files on disk with resumable chunked uploads.
+
+    A blob is stored once under its SHA-256 digest, so uploading the same
+    content again completes immediately. Uploads are keyed by (owner, digest):
+    restarting an interrupted upload resumes from the bytes already on disk.
+    Chunks are written straight to disk and the digest is verified by
+    streaming the file back, so a blob is never held in memory as a whole.
+    Partial files untouched for expiry seconds are swept, at most once per
+    UPLOAD_SWEEP_INTERVAL as uploads start.
+    """
+    def __init__(self, directory: str | None = None, expiry: float = UPLOAD_EXPIRY):
+        self.directory = directory or utils.join_paths(utils.get_data_path(), 'blobs')
+        self.expiry = expiry
+        self.uploads = {}  # upload id -> Upload
+        self.upload_ids = {}  # (owner, digest) -> upload id
+        self._next_sweep = 0.0
+        self.logger = utils.get_logger(__name__)
+
+    def path(self, digest: str) -> str:
+        """Return the path of a blob, fanned out by the first two digest characters."""
+        return utils.join_paths(self.directory, digest[:2], digest)
+
+    def exists(self, digest: str) -> bool:
+        """Check if a blob is stored."""
+        return is_valid_digest(digest) and utils.path_exists(self.path(digest))
+
+    def start(self, owner: str, digest: str, size: int) -> tuple[bool, str | Upload | None]:
+        """Start or resume an upload.
+
+        Returns:
+            tuple[bool, str | Upload | None]: The upload to continue, None if the
+            blob is already stored, or an error message.
+        """
+        if not is_valid_digest(digest):
+            return False, "Invalid blob digest"
+        if not isinstance(size, int) or isinstance(size, bool) or not 0 < size <= BLOB_MAX_SIZE:
+            return False, f"Invalid blob size (max {BLOB_MAX_SIZE} bytes)"
+        if self.exists(digest):
+            return True, None
+        self._schedule_sweep()
+        upload_id = self.upload_ids.get((owner, digest))
+        partial_path = utils.join_paths(self.directory, 'uploads', f"{owner.lower()}-{digest}.part")
+        if upload_id is not None:
+            stale = self.uploads[upload_id]
+            if stale.size == size:
+                return True, stale
+            # Restarted with another size: the bytes so far belong to a different declaration
+            if stale.lock.locked():
+                return False, "Upload in progress with another size"
+            self.uploads.pop(upload_id)
+            open(partial_path, "wb").close()
+        upload_id = uuid.uuid4().hex
+        os.makedirs(os.path.dirname(partial_path), exist_ok=True)
+        upload = Upload(upload_id, owner, digest, size, partial_path)
+        if upload.offset > size:
+            os.remove(partial_path)
+            upload.offset = 0
+        self.uploads[upload_id] = upload
+        self.upload_ids[(owner, digest)] = upload_id
+        return True, upload
+
+    async def write(self, owner: str, upload_id: str, offset: int, data: bytes) -> tuple[bool, str | Upload]:
+        """Append a chunk to an upload, finishing it when the last byte arrives.
+
+        The offset must match the bytes received so far; a mismatch is reported
+        so the client can resume from upload.offset.
+        """
+        upload = self.uploads.get(upload_id)
+        if upload is None or upload.owner != owner:
+            return False, "Unknown upload"
+        async with upload.lock:
+            if upload_id not in self.uploads:
+                return False, "Unknown upload"
+            if offset != upload.offset:
+                return False, f"Unexpected offset {offset}, expected {upload.offset}"
+            if upload.offset + len(data) > upload.size:
+                return False, "Chunk exceeds declared blob size"
+            await asyncio.to_thread(self._append, upload.path, data)
+            upload.offset += len(data)
+            if upload.offset == upload.size:
+                return await self.finish(upload)
+            return True, upload
+
+    async def finish(self, upload: Upload) -> tuple[bool, str | Upload]:
+        """Verify a fully received upload and move it into the store."""
+        self.uploads.pop(upload.upload_id, None)
+        self.upload_ids.pop((upload.owner, upload.digest), None)
+        digest = await asyncio.to_thread(self._hash_file, upload.path)
+        if digest != upload.digest:
+            os.remove(upload.path)
+            self.logger.warning(f"Upload {upload.upload_id} by {upload.owner} failed digest verification")
+            return False, "Blob digest mismatch"
+        target = self.path(digest)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(upload.path, target)
+        self.logger.info(f"Stored blob {digest} ({upload.size} bytes)")
+        return True, upload
+
+    def cancel(self, owner: str) -> None:
+        """Forget the in-memory state of an owner's uploads; partial files stay for resuming until swept."""
+        for upload_id in [u.upload_id for u in self.uploads.values() if u.owner == owner]:
+            upload = self.uploads.pop(upload_id)
+            self.upload_ids.pop((owner, upload.digest), None)
+
+    def _schedule_sweep(self) -> None:
+        now = time.monotonic()
+        if now < self._next_sweep:
+            return
+        self._next_sweep = now + UPLOAD_SWEEP_INTERVAL
+        active = {upload.path for upload in self.uploads.values()}
+        try:
+            asyncio.get_running_loop().run_in_executor(None, self.sweep, active)
+        except RuntimeError:
+            self.sweep(active)
+
+    def sweep(self, active: set[str] = frozenset()) -> int:
+        """Delete partial files not written to for expiry seconds, except those in active.
+
+        Returns:
+            int: The number of files deleted.
+        """
+        directory = utils.join_paths(self.directory, 'uploads')
+        if not utils.path_exists(directory):
+            return 0
+        deadline = time.time() - self.expiry
+        removed = 0
+        for name in os.listdir(directory):
+            path = utils.join_paths(directory, name)
+            if not name.endswith(".part") or path in active:
+                continue
+            try:
+                if os.path.getmtime(path) < deadline:
+                    os.remove(path)
+                    removed += 1
+            except FileNotFoundError:
+                continue  # Finished or swept meanwhile
+        if removed:
+            self.logger.info(f"Swept {removed} expired partial uploads")
+        return removed
+
+    @staticmethod
+    def _append(path: str, data: bytes) -> None:
+        with open(path, "ab") as f:
+            f.write(data)
+
+    @staticmethod
+    def _hash_file(path: str) -> str:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            while chunk := f.read(BLOB_READ_SIZE):
+                digest.update(chunk)
+        return digest.hexdigest()
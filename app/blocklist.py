@@ -0,0 +1,163 @@
+# app/blocklist.py
+import array
+import asyncio
+import bisect
+import hashlib
+import json
+import math
+import os
+import weakref
+from app import utils
+
+BLOCKLIST_CAPACITY = int(os.getenv("W3CHAT_BLOCKLIST_CAPACITY", "1000000"))  # pairs before the filter is resized
+BLOCKLIST_ERROR_RATE = 0.01  # Bloom filter false positive rate at capacity
+BLOCKLIST_MAX_ENTRIES = 10000  # addresses one user may block
+
+def fingerprint(blocker: str, blocked: str) -> int:
+    """Return the 64-bit hash of a (blocker, blocked) pair."""
+    key = f"{blocker.lower()}>{blocked.lower()}".encode()
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little")
+
+class BloomFilter:
+    """A bit array answering "maybe present" or "definitely absent".
+
+    Positions are derived from a 64-bit fingerprint by double hashing, so the
+    filter can be rebuilt from fingerprints alone.
+    """
+    def __init__(self, capacity: int, error_rate: float = BLOCKLIST_ERROR_RATE):
+        self.capacity = max(capacity, 1)
+        self.size = max(8, int(-self.capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / self.capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, value: int):
+        low, high = value & 0xFFFFFFFF, (value >> 32) | 1
+        return ((low + i * high) % self.size for i in range(self.hashes))
+
+    def add(self, value: int) -> None:
+        for position in self._positions(value):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, value: int) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(value))
+
+class BlockList:
+    """Per-user block lists, persisted as one JSON file per blocking address.
+
+    In memory each blocked pair costs a 64-bit fingerprint in a sorted array
+    plus about ten Bloom filter bits. is_blocked() checks the filter first,
+    so the common unblocked case costs one hash and a few bit tests; a filter
+    hit is confirmed by binary search in the fingerprints. Unblocked pairs
+    leave stale filter bits until the filter is rebuilt, which happens when
+    stale bits or growth past capacity would raise the error rate.
+    """
+    def __init__(self, directory: str | None = None, capacity: int = BLOCKLIST_CAPACITY):
+        self.directory = directory or utils.join_paths(utils.get_data_path(), 'blocks')
+        self.capacity = capacity
+        self.fingerprints = array.array("Q")
+        self.stale = 0  # removed pairs whose bits are still set
+        self.bloom = BloomFilter(capacity)
+        self._locks = weakref.WeakValueDictionary()  # Per-blocker locks serializing file rewrites
+        self.logger = utils.get_logger(__name__)
+
+    def lock(self, blocker: str) -> asyncio.Lock:
+        lock = self._locks.get(blocker.lower())
+        if lock is None:
+            lock = asyncio.Lock()
+            self._locks[blocker.lower()] = lock
+        return lock
+
+    def path(self, address: str) -> str:
+        return utils.join_paths(self.directory, f"{address.lower()}.json")
+
+    def load(self) -> None:
+        """Read every persisted list and build the filter."""
+        if not utils.path_exists(self.directory):
+            return
+        values = set()
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            with open(utils.join_paths(self.directory, name), "r") as f:
+                blocked = json.load(f)
+            blocker = name[:-len(".json")]
+            values.update(fingerprint(blocker, address) for address in blocked)
+        self.fingerprints = array.array("Q", sorted(values))
+        self._rebuild()
+        self.logger.info(f"Loaded {len(self.fingerprints)} blocked pairs")
+
+    def _rebuild(self) -> None:
+        while len(self.fingerprints) > self.capacity:
+            self.capacity *= 2
+        self.bloom = BloomFilter(self.capacity)
+        for value in self.fingerprints:
+            self.bloom.add(value)
+        self.stale = 0
+
+    def _contains(self, value: int) -> bool:
+        index = bisect.bisect_left(self.fingerprints, value)
+        return index < len(self.fingerprints) and self.fingerprints[index] == value
+
+    def is_blocked(self, blocker: str, sender: str) -> bool:
+        """Check if blocker has blocked sender."""
+        value = fingerprint(blocker, sender)
+        return value in self.bloom and self._contains(value)
+
+    def blocked_by(self, blocker: str) -> list[str]:
+        """Return the addresses a user has blocked, read from disk."""
+        path = self.path(blocker)
+        if not utils.path_exists(path):
+            return []
+        with open(path, "r") as f:
+            return json.load(f)
+
+    def _write(self, blocker: str, blocked: list[str]) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(blocker)
+        if not blocked:
+            utils.remove_path(path)
+            return
+        temporary = f"{path}.tmp"
+        with open(temporary, "w") as f:
+            json.dump(blocked, f)
+        os.replace(temporary, path)
+
+    async def block(self, blocker: str, address: str) -> tuple[bool, str]:
+        """Add an address to a user's block list."""
+        async with self.lock(blocker):
+            return await self._block(blocker, address)
+
+    async def unblock(self, blocker: str, address: str) -> tuple[bool, str]:
+        """Remove an address from a user's block list."""
+        async with self.lock(blocker):
+            return await self._unblock(blocker, address)
+
+    async def _block(self, blocker: str, address: str) -> tuple[bool, str]:
+        value = fingerprint(blocker, address)
+        if self._contains(value):
+            return True, "Address already blocked"
+        blocked = await asyncio.to_thread(self.blocked_by, blocker)
+        if len(blocked) >= BLOCKLIST_MAX_ENTRIES:
+            return False, f"Too many blocked addresses (max {BLOCKLIST_MAX_ENTRIES})"
+        # Memory is updated first so traffic is rejected while the file is written
+        bisect.insort(self.fingerprints, value)
+        self.bloom.add(value)
+        if len(self.fingerprints) > self.capacity:
+            self._rebuild()
+        blocked.append(address.lower())
+        await asyncio.to_thread(self._write, blocker, blocked)
+        self.logger.debug(f"{blocker} blocked {address}")
+        return True, "Address blocked"
+
+    async def _unblock(self, blocker: str, address: str) -> tuple[bool, str]:
+        value = fingerprint(blocker, address)
+        if not self._contains(value):
+            return True, "Address not blocked"
+        del self.fingerprints[bisect.bisect_left(self.fingerprints, value)]
+        self.stale += 1
+        if self.stale > len(self.fingerprints) // 2 + 1000:
+            self._rebuild()
+        blocked = await asyncio.to_thread(self.blocked_by, blocker)
+        await asyncio.to_thread(self._write, blocker, [a for a in blocked if a != address.lower()])
+        self.logger.debug(f"{blocker} unblocked {address}")
+        return True, "Address unblocked"
@@ -0,0 +1,47 @@
+# app/coalescing.py
+import asyncio
+from typing import Awaitable, Callable
+
+class FlushTimer:
+    """Runs a flush coroutine once per window, starting at the first pending change.
+
+    Services buffer changes and call schedule() after each one: the first call
+    starts the window, later calls within it are free. expedite() ends the
+    current window early, for example when a batch is full. The flush runs
+    after the timer is cleared, so changes made while it runs start a new window.
+    """
+    def __init__(self, flush: Callable[[], Awaitable[None]]):
+        self.flush = flush
+        self._task = None
+        self._due = None
+
+    @property
+    def scheduled(self) -> bool:
+        return self._task is not None
+
+    def schedule(self, window: float) -> None:
+        """Flush after window seconds unless a flush is already scheduled."""
+        if self._task is None:
+            # Created per window so it belongs to the loop running the flush
+            self._due = asyncio.Event()
+            self._task = asyncio.create_task(self._flush_later(window))
+
+    def expedite(self) -> None:
+        """Flush now instead of at the end of the window."""
+        if self._task is not None:
+            self._due.set()
+
+    def cancel(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _flush_later(self, window: float) -> None:
+        try:
+            await asyncio.wait_for(self._due.wait(), window)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            if self._task is asyncio.current_task():
+                self._task = None
+        await self.flush()
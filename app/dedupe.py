@@ -0,0 +1,35 @@
+# app/dedupe.py
+import collections
+import time
+
+DEDUPE_WINDOW = 300.0  # seconds a client message id is remembered
+DEDUPE_MAX_ENTRIES = 100000  # ids remembered across all senders at most
+CLIENT_MSG_ID_MAX_LENGTH = 64
+
+class DedupeWindow:
+    """Remembers recent (sender, client message id) pairs in bounded memory.
+
+    Pairs live in a ring buffer ordered by arrival plus a set for O(1)
+    lookups. A pair is forgotten once it is older than the window or pushed
+    out by newer pairs when the buffer is full.
+    """
+    def __init__(self, window: float = DEDUPE_WINDOW, max_entries: int = DEDUPE_MAX_ENTRIES):
+        self.window = window
+        self.max_entries = max_entries
+        self.order = collections.deque()  # (arrival time, key), oldest first
+        self.seen = set()
+
+    def _expire(self, now: float) -> None:
+        while self.order and (len(self.order) >= self.max_entries or now - self.order[0][0] > self.window):
+            self.seen.discard(self.order.popleft()[1])
+
+    def check_and_add(self, sender_address: str, client_msg_id: str) -> bool:
+        """Record a message id, returning True if it was already seen in the window."""
+        now = time.monotonic()
+        self._expire(now)
+        key = (sender_address, client_msg_id)
+        if key in self.seen:
+            return True
+        self.seen.add(key)
+        self.order.append((now, key))
+        return False
@@ -0,0 +1,66 @@
+# app/ephemeral.py
+from typing import Callable
+from app import utils, coalescing, profiling
+
+EPHEMERAL_WINDOW = 0.3  # seconds between coalesced ephemeral updates
+EPHEMERAL_MAX_PENDING = 10000  # (sender, channel) pairs buffered per window at most
+EPHEMERAL_MAX_LAG = 0.05  # seconds of event loop lag above which ephemeral events are shed
+EPHEMERAL_MAX_EVENT = 32  # characters in an event name at most
+
+class EphemeralLane:
+    """Best-effort delivery of short-lived signals such as typing indicators.
+
+    Events are never acknowledged, indexed or stored beyond the current window.
+    Within a window only the latest event per (sender, channel) is kept and
+    published once to the other channel members. The lane is the first thing
+    dropped under load: new pairs are refused once the window buffer is full,
+    and a window is discarded without sending when the event loop lag
+    reported by profiling.lag_monitor is above the threshold. Frames are
+    offered to recipient sockets without waiting, so a socket with a full
+    bulk lane drops them instead of stalling the flush for everyone else.
+    """
+    def __init__(self, store, offer: Callable[[list[str], dict], int], window: float = EPHEMERAL_WINDOW,
+                 max_pending: int = EPHEMERAL_MAX_PENDING, max_lag: float = EPHEMERAL_MAX_LAG):
+        self.store = store
+        self.offer = offer  # Queues a frame for recipients, returns the number of sockets that refused it
+        self.window = window
+        self.max_pending = max_pending
+        self.max_lag = max_lag
+        self.pending = {}  # (sender, channel) -> latest event in the current window
+        self.dropped = 0
+        self._timer = coalescing.FlushTimer(self.flush)
+        self.logger = utils.get_logger(__name__)
+
+    def publish(self, channel_name: str, sender_address: str, event: str) -> bool:
+        """Queue an event for the next window.
+
+        Returns:
+            bool: False if the event was dropped.
+        """
+        key = (sender_address, channel_name)
+        if key not in self.pending and len(self.pending) >= self.max_pending:
+            self.dropped += 1
+            return False
+        self.pending[key] = event
+        self._timer.schedule(self.window)
+        return True
+
+    async def flush(self) -> None:
+        """Publish the latest event of every pending pair, unless the loop is overloaded."""
+        pending, self.pending = self.pending, {}
+        if profiling.lag_monitor.last > self.max_lag:
+            self.dropped += len(pending)
+            self.logger.debug(f"Shed {len(pending)} ephemeral events under event loop lag")
+            return
+        for (sender_address, channel_name), event in pending.items():
+            members = self.store.channels.get(channel_name, frozenset())
+            if sender_address not in members:
+                continue  # Left the channel within the window
+            recipients = members - {sender_address}
+            if recipients:
+                self.dropped += self.offer(recipients, {
+                    "type": "ephemeral",
+                    "from": sender_address,
+                    "channel": channel_name,
+                    "event": event
+                })
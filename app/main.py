@@ -1,19 +1,37 @@
 # app/main.py
-from fastapi import FastAPI
-from fastapi.responses import FileResponse
-from fastapi.staticfiles import StaticFiles
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
+from app.routers.admin import router as admin_router
 from app.routers.auth import router as auth_router
-from app.routers.websocket import router as websocket_router
-from app import utils
+from app.routers.blobs import router as blobs_router
+from app.routers.fallback import router as fallback_router
+from app.routers.websocket import router as websocket_router, push_dispatcher
+from app import utils, static_assets, profiling
 
 # Setup logging
 utils.setup_logging()
 
-app = FastAPI()
-app.mount("/static", StaticFiles(directory="frontend"), name="static")
+# Load and precompress the frontend bundle once at startup
+assets = static_assets.StaticAssets("frontend")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    profiling.lag_monitor.start()
+    yield
+    profiling.lag_monitor.stop()
+    await push_dispatcher.close()
+
+app = FastAPI(lifespan=lifespan)
 app.include_router(auth_router)
 app.include_router(websocket_router)
+app.include_router(admin_router)
+app.include_router(blobs_router)
+app.include_router(fallback_router)
+
+@app.api_route("/", methods=["GET", "HEAD"])
+async def home(request: Request):
+    return assets.response(request, static_assets.INDEX_FILE)
 
-@app.get("/")
-async def home():
-    return FileResponse("frontend/index.html")
\ No newline at end of file
+@app.api_route("/static/{path:path}", methods=["GET", "HEAD"])
+async def static(request: Request, path: str):
+    return assets.response(request, path)
\ No newline at end of file
@@ -0,0 +1,52 @@
+# app/nonces.py
+import collections
+import secrets
+import time
+
+NONCE_TTL = 300.0  # seconds a login nonce stays valid
+NONCE_MAX_ENTRIES = 100000  # outstanding nonces; the oldest are dropped first
+NONCE_MESSAGE_PREFIX = "Sign this message to authenticate with w3chat: "
+
+def login_message(nonce: str) -> str:
+    """Return the text a client signs to log in with a nonce."""
+    return f"{NONCE_MESSAGE_PREFIX}{nonce}"
+
+def parse_login_message(message: str) -> str | None:
+    """Return the nonce of a login message, or None if it is not one."""
+    if not message.startswith(NONCE_MESSAGE_PREFIX):
+        return None
+    return message[len(NONCE_MESSAGE_PREFIX):] or None
+
+class NonceStore:
+    """Single-use login nonces with a fixed lifetime and a bounded count.
+
+    Nonces are kept in issue order, which is also expiry order, so expired
+    ones are dropped from the front and, when full, the oldest outstanding
+    nonce makes room for a new one. Issuing and consuming are O(1).
+    """
+    def __init__(self, ttl: float = NONCE_TTL, max_entries: int = NONCE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.nonces = collections.OrderedDict()  # nonce -> expiry time
+
+    def _expire(self, now: float) -> None:
+        while self.nonces:
+            nonce, expires = next(iter(self.nonces.items()))
+            if expires > now:
+                break
+            del self.nonces[nonce]
+
+    def issue(self) -> str:
+        """Create a nonce."""
+        now = time.monotonic()
+        self._expire(now)
+        if len(self.nonces) >= self.max_entries:
+            self.nonces.popitem(last=False)
+        nonce = secrets.token_hex(16)
+        self.nonces[nonce] = now + self.ttl
+        return nonce
+
+    def consume(self, nonce: str) -> bool:
+        """Use up a nonce, return whether it was outstanding and not expired."""
+        expires = self.nonces.pop(nonce, None)
+        return expires is not None and expires > time.monotonic()
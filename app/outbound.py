@@ -0,0 +1,195 @@
+# app/outbound.py
+import asyncio
+import collections
+import contextlib
+import json
+from app import utils, tracing
+
+# Frames that must not wait behind bulk data; everything else goes to the bulk lane
+CONTROL_TYPES = frozenset({"ack", "pong", "error", "info", "channel_request", "token", "upload", "upload_complete"})
+CONTROL_WEIGHT = 4  # control frames written per bulk frame while both lanes are backed up
+BULK_MAX_FRAMES = 256  # bulk frames queued per socket before senders wait
+TYPE_PREFIX = '{"type":"'
+
+# Opt-in micro-batching, negotiated with the WebSocket subprotocol
+BATCH_SUBPROTOCOL = "w3chat.batch"
+BATCH_MIN_WINDOW = 0.001  # seconds a batch waits for more frames when traffic is sparse
+BATCH_MAX_WINDOW = 0.005  # seconds a batch waits for more frames under sustained bursts
+BATCH_MAX_BYTES = 64 * 1024  # encoded bytes per batch; a batch is written early once full
+
+def frame_type(payload: str) -> str | None:
+    """Return the type of an encoded frame without decoding it.
+
+    Frames are built with "type" as their first key, so it is read from the prefix.
+    """
+    if not payload.startswith(TYPE_PREFIX):
+        return None
+    end = payload.find('"', len(TYPE_PREFIX))
+    return payload[len(TYPE_PREFIX):end] if end != -1 else None
+
+class OutboundSocket:
+    """A WebSocket whose writes are scheduled on a control lane and a bulk lane.
+
+    While the socket is idle a frame is written straight away, so ordering and
+    latency are unchanged. Frames sent while a write is in progress are queued:
+    control frames (acks, pongs, errors, request notices) go ahead of bulk
+    data, but after CONTROL_WEIGHT control frames one bulk frame is written,
+    so neither lane starves. Frames within a lane keep their order. Anything
+    else, such as receive() or close(), is passed to the wrapped socket.
+    Queued frames remember the trace span that sent them, so the "send"
+    stage of a sampled frame times its actual socket write.
+
+    With batch enabled every frame is queued, and frames arriving within the
+    batch window or up to BATCH_MAX_BYTES are written as one JSON array frame
+    in lane order. The window doubles while batches collect several frames
+    and halves while they carry a single one, within BATCH_MIN_WINDOW and
+    BATCH_MAX_WINDOW.
+    """
+    def __init__(self, websocket, control_weight: int = CONTROL_WEIGHT, bulk_max_frames: int = BULK_MAX_FRAMES,
+                 batch: bool = False, batch_max_bytes: int = BATCH_MAX_BYTES):
+        self.websocket = websocket
+        self.control_weight = control_weight
+        self.bulk_max_frames = bulk_max_frames
+        self.batch = batch
+        self.batch_max_bytes = batch_max_bytes
+        self.window = BATCH_MIN_WINDOW
+        self.control = collections.deque()
+        self.bulk = collections.deque()
+        self.queued_bytes = 0
+        self.writes = 0  # Frames written to the socket, a batch counting once
+        self.error = None  # Exception that stopped the writer
+        self._writing = False
+        self._control_run = 0
+        self._drain_task = None
+        self._space = asyncio.Event()
+        self._full = asyncio.Event()
+        self.logger = utils.get_logger(__name__)
+
+    def __getattr__(self, name):
+        return getattr(self.websocket, name)
+
+    async def send_json(self, message: dict) -> None:
+        """Encode a frame like WebSocket.send_json and send it."""
+        await self.send_text(json.dumps(message, separators=(",", ":"), ensure_ascii=False))
+
+    async def send_text(self, payload: str) -> None:
+        """Write an encoded frame now if the socket is idle, otherwise queue it on its lane."""
+        if self.error is not None:
+            raise RuntimeError(f"Outbound writer stopped: {self.error}")
+        if not self.batch and not self._writing and not self.control and not self.bulk:
+            self._writing = True
+            try:
+                with tracing.tracer.span("send"):
+                    await self.websocket.send_text(payload)
+                self.writes += 1
+            finally:
+                self._writing = False
+                self._schedule()
+            return
+        entry = (payload, tracing.current_span())
+        if frame_type(payload) in CONTROL_TYPES:
+            self.control.append(entry)
+        else:
+            # Senders wait for room rather than buffering without bound
+            while len(self.bulk) >= self.bulk_max_frames and self.error is None:
+                self._space.clear()
+                await self._space.wait()
+            if self.error is not None:
+                raise RuntimeError(f"Outbound writer stopped: {self.error}")
+            self.bulk.append(entry)
+        self.queued_bytes += len(payload)
+        if self.queued_bytes >= self.batch_max_bytes:
+            self._full.set()
+        self._schedule()
+
+    def offer(self, payload: str) -> bool:
+        """Queue a bulk frame that may be lost, without waiting for room.
+
+        Returns:
+            bool: False if the frame was dropped because the bulk lane is full or the writer stopped.
+        """
+        if self.error is not None or len(self.bulk) >= self.bulk_max_frames:
+            return False
+        self.bulk.append((payload, tracing.current_span()))
+        self.queued_bytes += len(payload)
+        if self.queued_bytes >= self.batch_max_bytes:
+            self._full.set()
+        self._schedule()
+        return True
+
+    def _schedule(self) -> None:
+        if (self.control or self.bulk) and not self._writing and self._drain_task is None:
+            self._drain_task = asyncio.create_task(self._drain())
+
+    def _next(self) -> tuple[collections.deque, tuple]:
+        """Pop the next queued (payload, span) entry, control first with a weighted share for bulk."""
+        if self.control and (self._control_run < self.control_weight or not self.bulk):
+            self._control_run += 1
+            lane = self.control
+        else:
+            self._control_run = 0
+            lane = self.bulk
+            self._space.set()
+        entry = lane.popleft()
+        self.queued_bytes -= len(entry[0])
+        return lane, entry
+
+    async def _write_batch(self) -> None:
+        """Wait out the batch window unless a batch is already full, then write one array frame."""
+        if self.queued_bytes < self.batch_max_bytes:
+            try:
+                await asyncio.wait_for(self._full.wait(), self.window)
+            except asyncio.TimeoutError:
+                pass
+        frames = []
+        spans = []
+        size = 2
+        while self.control or self.bulk:
+            lane, entry = self._next()
+            payload, span = entry
+            if frames and size + len(payload) + 1 > self.batch_max_bytes:
+                # Put it back for the next batch
+                lane.appendleft(entry)
+                self.queued_bytes += len(payload)
+                break
+            frames.append(payload)
+            if span is not None:
+                spans.append(span)
+            size += len(payload) + 1
+        if self.queued_bytes < self.batch_max_bytes:
+            self._full.clear()
+        if len(frames) > 1:
+            self.window = min(self.window * 2, BATCH_MAX_WINDOW)
+        else:
+            self.window = max(self.window / 2, BATCH_MIN_WINDOW)
+        with contextlib.ExitStack() as stack:
+            # Every sampled frame in the batch shares the one write
+            for span in spans:
+                stack.enter_context(tracing.tracer.child(span, "send", batch=len(frames)))
+            await self.websocket.send_text(frames[0] if len(frames) == 1 else f"[{','.join(frames)}]")
+        self.writes += 1
+
+    async def _drain(self) -> None:
+        """Write queued frames until both lanes are empty."""
+        self._writing = True
+        self._control_run = 0
+        try:
+            while self.control or self.bulk:
+                if self.batch:
+                    await self._write_batch()
+                    continue
+                _, (payload, span) = self._next()
+                with tracing.tracer.child(span, "send"):
+                    await self.websocket.send_text(payload)
+                self.writes += 1
+        except Exception as e:
+            # Nobody awaits this task, so the failure is kept and raised to later senders
+            self.error = e
+            self.control.clear()
+            self.bulk.clear()
+            self.queued_bytes = 0
+            self._space.set()
+            self.logger.debug(f"Outbound writer stopped: {str(e)}")
+        finally:
+            self._writing = False
+            self._drain_task = None
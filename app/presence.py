@@ -0,0 +1,106 @@
+# app/presence.py
+from typing import Awaitable, Callable
+from app import utils, coalescing
+
+PRESENCE_WINDOW = 1.0  # seconds between coalesced presence updates
+
+class Presence:
+    """Publishes online/offline changes to subscribed peers in coalesced batches.
+
+    An address is online while it has at least one connection in
+    Storage.connections. Changes are collected for PRESENCE_WINDOW seconds and
+    published once per window; an address that flaps back to its previous
+    state within the window produces no update at all. Peer relationships are
+    re-checked against the reverse membership index at publish time, so a
+    watcher stops receiving updates once it no longer shares a channel.
+    """
+    def __init__(self, store, send: Callable[[list[str], dict], Awaitable[None]], window: float = PRESENCE_WINDOW):
+        self.store = store
+        self.send = send
+        self.window = window
+        self.subscriptions = {}  # watcher -> set of watched addresses
+        self.watchers = {}  # watched address -> set of watchers
+        self.all_peers = set()  # watchers following every current channel peer
+        self.pending = {}  # address -> state before the first change in the current window
+        self._timer = coalescing.FlushTimer(self.flush)
+        self.logger = utils.get_logger(__name__)
+
+    def snapshot(self, addresses) -> dict:
+        """Return the current presence of the given addresses."""
+        return {address: self.store.is_online(address) for address in addresses}
+
+    def subscribe(self, watcher: str, addresses: list[str]) -> list[str]:
+        """Subscribe watcher to presence of the given addresses.
+
+        Only addresses sharing a channel with the watcher are accepted; an
+        empty list subscribes to all channel peers, including future ones.
+
+        Returns:
+            list[str]: The addresses currently visible to the watcher.
+        """
+        if not addresses:
+            self.all_peers.add(watcher)
+            allowed = list(self.store.get_peers(watcher))
+            self.logger.debug(f"{watcher} subscribed to presence of all peers")
+            return allowed
+        allowed = [a for a in addresses if a != watcher and self.store.are_peers(watcher, a)]
+        if allowed:
+            self.subscriptions.setdefault(watcher, set()).update(allowed)
+            for address in allowed:
+                self.watchers.setdefault(address, set()).add(watcher)
+        self.logger.debug(f"{watcher} subscribed to presence of {len(allowed)} addresses")
+        return allowed
+
+    def unsubscribe(self, watcher: str, addresses: list[str] | None = None) -> None:
+        """Unsubscribe watcher from the given addresses, or from all if None."""
+        if addresses is None:
+            self.all_peers.discard(watcher)
+        watched = self.subscriptions.get(watcher)
+        if not watched:
+            return
+        targets = list(watched) if addresses is None else [a for a in addresses if a in watched]
+        for address in targets:
+            watched.discard(address)
+            address_watchers = self.watchers.get(address)
+            if address_watchers is not None:
+                address_watchers.discard(watcher)
+                if not address_watchers:
+                    del self.watchers[address]
+        if not watched:
+            del self.subscriptions[watcher]
+
+    def update(self, address: str, online: bool) -> None:
+        """Record a presence change and schedule a coalesced flush."""
+        if address not in self.pending:
+            self.pending[address] = not online
+        self._timer.schedule(self.window)
+
+    def _current_watchers(self, address: str) -> set[str]:
+        """Return watchers that still share a channel with the address.
+
+        Explicit subscriptions to addresses that are no longer peers are dropped.
+        """
+        watchers = set()
+        if self.all_peers:
+            watchers.update(self.all_peers.intersection(self.store.get_peers(address)))
+        for watcher in list(self.watchers.get(address, ())):
+            if self.store.are_peers(watcher, address):
+                watchers.add(watcher)
+            else:
+                self.unsubscribe(watcher, [address])
+        return watchers
+
+    async def flush(self) -> None:
+        """Publish pending changes, one frame per watcher."""
+        pending, self.pending = self.pending, {}
+        updates = {}
+        for address, previous in pending.items():
+            online = self.store.is_online(address)
+            if online == previous:
+                continue  # Flapped back within the window
+            for watcher in self._current_watchers(address):
+                updates.setdefault(watcher, {})[address] = online
+        for watcher, presence in updates.items():
+            await self.send([watcher], {"type": "presence", "presence": presence})
+        if updates:
+            self.logger.debug(f"Published presence updates to {len(updates)} watchers")
@@ -0,0 +1,130 @@
+# app/profiling.py
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+LAG_INTERVAL = 0.5  # seconds between event loop lag probes
+SAMPLE_INTERVAL = 0.005  # seconds between profiler samples
+MAX_PROFILE_SECONDS = 60
+
+class HandlerTimer:
+    """Accumulates wall and CPU time per message handler.
+
+    Timing is off by default; callers check `enabled` before wrapping a
+    handler, so the disabled cost is one attribute lookup per frame. CPU time
+    is thread time spent between dispatch and completion, which includes any
+    other task that ran while the handler was suspended.
+    """
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.stats = {}  # handler name -> [calls, wall seconds, cpu seconds, max wall seconds]
+
+    async def run(self, name: str, handler_call) -> None:
+        """Await a handler coroutine and record its timing."""
+        wall_start = time.perf_counter()
+        cpu_start = time.thread_time()
+        try:
+            await handler_call
+        finally:
+            wall = time.perf_counter() - wall_start
+            cpu = time.thread_time() - cpu_start
+            stats = self.stats.get(name)
+            if stats is None:
+                stats = self.stats[name] = [0, 0.0, 0.0, 0.0]
+            stats[0] += 1
+            stats[1] += wall
+            stats[2] += cpu
+            stats[3] = max(stats[3], wall)
+
+    def report(self) -> dict:
+        """Return per-handler counts and timings in milliseconds."""
+        return {
+            name: {
+                "calls": calls,
+                "wall_ms_total": round(wall * 1000, 3),
+                "wall_ms_avg": round(wall * 1000 / calls, 3),
+                "wall_ms_max": round(wall_max * 1000, 3),
+                "cpu_ms_total": round(cpu * 1000, 3),
+            }
+            for name, (calls, wall, cpu, wall_max) in self.stats.items()
+        }
+
+    def reset(self) -> None:
+        """Drop accumulated timings."""
+        self.stats = {}
+
+class LoopLagMonitor:
+    """Measures how late the event loop wakes up a periodic probe."""
+    def __init__(self, interval: float = LAG_INTERVAL):
+        self.interval = interval
+        self.samples = 0
+        self.last = 0.0
+        self.max = 0.0
+        self.total = 0.0
+        self._task = None
+
+    def start(self) -> None:
+        """Start probing on the running loop."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._probe())
+
+    def stop(self) -> None:
+        """Stop probing."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _probe(self) -> None:
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.perf_counter() - start - self.interval)
+            self.samples += 1
+            self.last = lag
+            self.total += lag
+            self.max = max(self.max, lag)
+
+    def report(self) -> dict:
+        """Return lag statistics in milliseconds."""
+        return {
+            "samples": self.samples,
+            "last_ms": round(self.last * 1000, 3),
+            "avg_ms": round(self.total * 1000 / self.samples, 3) if self.samples else 0.0,
+            "max_ms": round(self.max * 1000, 3),
+        }
+
+def format_frame(frame) -> str:
+    """Format a frame as module:function for collapsed stacks."""
+    code = frame.f_code
+    return f"{os.path.splitext(os.path.basename(code.co_filename))[0]}:{code.co_name}"
+
+def sample_stacks(thread_id: int, seconds: float, interval: float = SAMPLE_INTERVAL) -> Counter:
+    """Sample the stack of a thread and count collapsed stacks.
+
+    Each key is a root-first, semicolon-separated stack as consumed by
+    flamegraph tools; the value is the number of samples it was seen in.
+    """
+    stacks = Counter()
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        frame = sys._current_frames().get(thread_id)
+        if frame is not None:
+            names = []
+            while frame is not None:
+                names.append(format_frame(frame))
+                frame = frame.f_back
+            stacks[";".join(reversed(names))] += 1
+        time.sleep(interval)
+    return stacks
+
+async def profile_loop(seconds: float) -> str:
+    """Sample the calling event loop's thread for seconds, return collapsed stacks."""
+    thread_id = threading.get_ident()
+    stacks = await asyncio.to_thread(sample_stacks, thread_id, seconds)
+    return "\n".join(f"{stack} {count}" for stack, count in stacks.most_common())
+
+handler_timer = HandlerTimer(enabled=os.getenv("W3CHAT_PROFILING") == "1")
+lag_monitor = LoopLagMonitor()
@@ -0,0 +1,160 @@
+# app/push.py
+import asyncio
+import os
+import time
+import httpx
+from app import utils, coalescing
+
+# Webhook receiving notifications for offline recipients, disabled when empty
+PUSH_URL = os.getenv("W3CHAT_PUSH_URL", "")
+PUSH_WINDOW = float(os.getenv("W3CHAT_PUSH_WINDOW", "2.0"))  # seconds notifications to a user are coalesced
+PUSH_TYPES = frozenset({"message", "group_invite"})  # frames worth notifying an offline user about
+PUSH_BATCH_SIZE = 100  # users per webhook request
+PUSH_MAX_PENDING = 10000  # users with queued notifications before new ones are dropped
+PUSH_RETRIES = 3  # attempts per batch
+PUSH_BACKOFF = 0.2  # seconds before the first retry, doubled after each attempt
+PUSH_TIMEOUT = 5.0  # seconds per webhook request
+BREAKER_THRESHOLD = 5  # consecutive failed requests that open the circuit
+BREAKER_RESET = 30.0  # seconds the circuit stays open before a trial request
+
+class CircuitBreaker:
+    """Stops calling a failing endpoint for a while.
+
+    After threshold consecutive failures the circuit opens and calls are
+    refused. Once reset_timeout has passed one trial call is let through: its
+    success closes the circuit, its failure opens it again.
+    """
+    def __init__(self, threshold: int = BREAKER_THRESHOLD, reset_timeout: float = BREAKER_RESET):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half_open" if time.monotonic() - self.opened_at >= self.reset_timeout else "open"
+
+    def allow(self) -> bool:
+        """Return whether a call may be made now."""
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self._trial:
+            self._trial = True
+            return True
+        return False
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self._trial or self.failures >= self.threshold:
+            self.opened_at = time.monotonic()
+        self._trial = False
+
+class PushDispatcher:
+    """Coalesces notifications for offline recipients and posts them to a webhook.
+
+    notify() only updates a per-user summary; after the window all pending
+    summaries are posted in batches of batch_size as
+    {"notifications": [{"address", "count", "channels", "last"}, ...]}.
+    Message contents are not forwarded. Requests share one keep-alive
+    connection pool, are retried with exponential backoff and are skipped
+    entirely while the circuit breaker is open; undeliverable batches are
+    dropped and counted.
+    """
+    def __init__(self, url: str = PUSH_URL, window: float = PUSH_WINDOW, batch_size: int = PUSH_BATCH_SIZE,
+                 max_pending: int = PUSH_MAX_PENDING, retries: int = PUSH_RETRIES, backoff: float = PUSH_BACKOFF,
+                 timeout: float = PUSH_TIMEOUT, breaker: CircuitBreaker | None = None):
+        self.url = url
+        self.window = window
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.breaker = breaker or CircuitBreaker()
+        self.pending = {}  # address -> notification summary
+        self.sent = 0  # notifications accepted by the webhook
+        self.dropped = 0  # notifications lost to overflow, failures or an open circuit
+        self._client = None
+        self._timer = coalescing.FlushTimer(self.flush)
+        self.logger = utils.get_logger(__name__)
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.url)
+
+    def notify(self, address: str, message: dict) -> None:
+        """Record a frame an offline address missed and schedule a coalesced flush."""
+        summary = self.pending.get(address)
+        if summary is None:
+            if len(self.pending) >= self.max_pending:
+                self.dropped += 1
+                return
+            summary = self.pending[address] = {"address": address, "count": 0, "channels": {}, "last": None}
+        channel_name = message.get("channel")
+        summary["count"] += 1
+        summary["channels"][channel_name] = summary["channels"].get(channel_name, 0) + 1
+        summary["last"] = {"type": message["type"], "from": message.get("from"), "channel": channel_name,
+                           "seq": message.get("seq"), "ts": int(time.time())}
+        self._timer.schedule(self.window)
+
+    def _get_client(self) -> httpx.AsyncClient:
+        # Created on first use so it binds to the running loop
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=10, max_keepalive_connections=10, keepalive_expiry=60.0),
+            )
+        return self._client
+
+    async def flush(self) -> None:
+        """Post every pending notification, batch_size users per request."""
+        pending, self.pending = self.pending, {}
+        notifications = list(pending.values())
+        for start in range(0, len(notifications), self.batch_size):
+            batch = notifications[start:start + self.batch_size]
+            if await self._post(batch):
+                self.sent += len(batch)
+            else:
+                self.dropped += len(batch)
+
+    async def _post(self, batch: list[dict]) -> bool:
+        """Post one batch with retries; return whether the webhook accepted it."""
+        for attempt in range(self.retries):
+            if not self.breaker.allow():
+                self.logger.warning(f"Push circuit open, dropped {len(batch)} notifications")
+                return False
+            try:
+                response = await self._get_client().post(self.url, json={"notifications": batch})
+                # Client errors will not succeed on retry, so they are not counted against the endpoint
+                if response.status_code < 500:
+                    self.breaker.record_success()
+                    if response.is_success:
+                        return True
+                    self.logger.error(f"Push webhook rejected batch: {response.status_code}")
+                    return False
+                error = f"status {response.status_code}"
+            except httpx.HTTPError as e:
+                error = str(e) or type(e).__name__
+            self.breaker.record_failure()
+            self.logger.warning(f"Push attempt {attempt + 1} failed: {error}")
+            if attempt + 1 < self.retries:
+                await asyncio.sleep(self.backoff * 2 ** attempt)
+        return False
+
+    async def close(self) -> None:
+        """Post what is pending and close the connection pool."""
+        self._timer.cancel()
+        if self.pending and self.enabled:
+            await self.flush()
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
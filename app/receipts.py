@@ -0,0 +1,79 @@
+# app/receipts.py
+from typing import Awaitable, Callable
+from app import utils, coalescing
+
+RECEIPT_WINDOW = 0.5  # seconds between coalesced receipt updates of a channel
+DELIVERED = "delivered"
+READ = "read"
+
+class Receipts:
+    """Tracks delivered/read high-water marks and publishes them in coalesced batches.
+
+    Messages carry a per-channel sequence number from Storage.next_sequence. A
+    receipt moves the mark of an address in a channel forward to a sequence
+    number; marks never move back, and reading implies delivery. State is one
+    integer per (channel, address) and kind. Changes are collected for
+    RECEIPT_WINDOW seconds and published as one frame per changed channel to
+    its participants.
+    """
+    def __init__(self, store, send: Callable[[list[str], dict], Awaitable[None]], window: float = RECEIPT_WINDOW):
+        self.store = store
+        self.send = send
+        self.window = window
+        self.marks = {DELIVERED: {}, READ: {}}  # kind -> channel -> address -> sequence number
+        self.pending = {}  # channel -> set of addresses whose marks changed in the current window
+        self._timer = coalescing.FlushTimer(self.flush)
+        self.logger = utils.get_logger(__name__)
+
+    def get(self, kind: str, channel_name: str, address: str) -> int:
+        """Return the mark of an address in a channel, 0 if none."""
+        return self.marks[kind].get(channel_name, {}).get(address, 0)
+
+    def update(self, kind: str, channel_name: str, address: str, sequence: int) -> bool:
+        """Move a mark forward and schedule a coalesced flush.
+
+        Returns:
+            bool: True if the mark moved.
+        """
+        kinds = (DELIVERED, READ) if kind == READ else (DELIVERED,)
+        moved = False
+        for mark_kind in kinds:
+            channel_marks = self.marks[mark_kind].setdefault(channel_name, {})
+            if channel_marks.get(address, 0) < sequence:
+                channel_marks[address] = sequence
+                moved = True
+        if moved:
+            self.pending.setdefault(channel_name, set()).add(address)
+            self._timer.schedule(self.window)
+        return moved
+
+    def forget(self, channel_name: str, address: str | None = None) -> None:
+        """Drop the marks of an address in a channel, or of the whole channel if None."""
+        for channel_marks in self.marks.values():
+            if address is None:
+                channel_marks.pop(channel_name, None)
+            elif channel_name in channel_marks:
+                channel_marks[channel_name].pop(address, None)
+        if address is None:
+            self.pending.pop(channel_name, None)
+
+    async def flush(self) -> None:
+        """Publish pending changes, one frame per channel."""
+        pending, self.pending = self.pending, {}
+        for channel_name, changed in pending.items():
+            members = self.store.channels.get(channel_name, frozenset())
+            changed = changed & members
+            if not changed:
+                continue
+            # A participant does not need its own receipt echoed unless others changed too
+            recipients = members - changed if len(changed) == 1 else members
+            if not recipients:
+                continue
+            await self.send(recipients, {
+                "type": "receipts",
+                "channel": channel_name,
+                DELIVERED: {address: self.get(DELIVERED, channel_name, address) for address in changed},
+                READ: {address: self.get(READ, channel_name, address) for address in changed},
+            })
+        if pending:
+            self.logger.debug(f"Published receipts for {len(pending)} channels")
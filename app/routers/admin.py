@@ -0,0 +1,114 @@
+# app/routers/admin.py
+import tracemalloc
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import PlainTextResponse
+from app import accounting, utils, profiling, sketches, tracing
+from app.routers import websocket
+
+MAX_ALLOCATIONS = 100  # tracemalloc statistics returned at most
+
+# Configure logging
+logger = utils.get_logger(__name__)
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+
+async def require_admin(token: str) -> str:
+    """Resolve the token to an admin address or reject the request."""
+    success, result = utils.decode_jwt(token)
+    if not success:
+        logger.warning(result)
+        raise HTTPException(status_code=401, detail=result)
+    if not utils.is_admin(result):
+        logger.warning(f"Non-admin address {result} attempted admin access")
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return result
+
+@router.get("/handlers")
+async def handler_timings(admin: str = Depends(require_admin)):
+    """Return per-handler timings."""
+    return {"enabled": profiling.handler_timer.enabled, "handlers": profiling.handler_timer.report()}
+
+@router.post("/handlers")
+async def configure_handler_timings(enabled: bool, reset: bool = False, admin: str = Depends(require_admin)):
+    """Enable or disable per-handler timings."""
+    profiling.handler_timer.enabled = enabled
+    if reset:
+        profiling.handler_timer.reset()
+    logger.info(f"Handler timings {'enabled' if enabled else 'disabled'} by {admin}")
+    return {"enabled": enabled}
+
+@router.get("/loop")
+async def loop_lag(admin: str = Depends(require_admin)):
+    """Return event loop lag statistics."""
+    return profiling.lag_monitor.report()
+
+@router.get("/profile", response_class=PlainTextResponse)
+async def profile(seconds: float = 5.0, admin: str = Depends(require_admin)):
+    """Sample the event loop thread and return collapsed stacks for flame graphs."""
+    if not 0 < seconds <= profiling.MAX_PROFILE_SECONDS:
+        raise HTTPException(status_code=400, detail=f"seconds must be in (0, {profiling.MAX_PROFILE_SECONDS}]")
+    logger.info(f"Profiling event loop for {seconds}s for {admin}")
+    return await profiling.profile_loop(seconds)
+
+@router.get("/top")
+async def top_talkers(limit: int = 10, admin: str = Depends(require_admin)):
+    """Return the heaviest senders, channels and channel request senders."""
+    if not 0 < limit <= sketches.HEAVY_HITTERS:
+        raise HTTPException(status_code=400, detail=f"limit must be in (0, {sketches.HEAVY_HITTERS}]")
+    return sketches.load_tracker.report(limit)
+
+@router.get("/traces")
+async def trace_percentiles(admin: str = Depends(require_admin)):
+    """Return per-stage latency percentiles of sampled frames."""
+    tracing.tracer.exporter.flush()
+    return {"sample_rate": tracing.tracer.sample_rate, "stages": tracing.tracer.exporter.percentiles()}
+
+@router.post("/traces")
+async def configure_tracing(sample_rate: float, admin: str = Depends(require_admin)):
+    """Set the fraction of inbound frames that are traced."""
+    if not 0 <= sample_rate <= 1:
+        raise HTTPException(status_code=400, detail="sample_rate must be in [0, 1]")
+    tracing.tracer.sample_rate = sample_rate
+    logger.info(f"Trace sample rate set to {sample_rate} by {admin}")
+    return {"sample_rate": sample_rate}
+
+@router.get("/memory")
+async def memory(exact: bool = False, admin: str = Depends(require_admin)):
+    """Return Storage entry counts, estimated sizes and size histograms.
+
+    The report is kept up to date incrementally; exact additionally walks
+    every structure to measure its shallow size.
+    """
+    report = websocket.store.accounting.report()
+    if exact:
+        report["measured_bytes"] = accounting.measure(websocket.store)
+    report["tracemalloc"] = tracemalloc.is_tracing()
+    return report
+
+@router.post("/memory/tracemalloc")
+async def configure_tracemalloc(enabled: bool, frames: int = 1, admin: str = Depends(require_admin)):
+    """Start or stop tracing allocations; only allocations made while tracing are reported."""
+    if enabled and not tracemalloc.is_tracing():
+        tracemalloc.start(max(1, min(frames, 25)))
+    elif not enabled and tracemalloc.is_tracing():
+        tracemalloc.stop()
+    logger.info(f"tracemalloc {'started' if enabled else 'stopped'} by {admin}")
+    return {"enabled": enabled}
+
+@router.get("/memory/tracemalloc")
+async def top_allocations(limit: int = 10, admin: str = Depends(require_admin)):
+    """Return the source lines holding the most traced memory."""
+    if not tracemalloc.is_tracing():
+        raise HTTPException(status_code=409, detail="tracemalloc is not running")
+    if not 0 < limit <= MAX_ALLOCATIONS:
+        raise HTTPException(status_code=400, detail=f"limit must be in (0, {MAX_ALLOCATIONS}]")
+    snapshot = tracemalloc.take_snapshot()
+    current, peak = tracemalloc.get_traced_memory()
+    return {
+        "current": current,
+        "peak": peak,
+        "top": [
+            {"location": str(stat.traceback), "size": stat.size, "count": stat.count}
+            for stat in snapshot.statistics("lineno")[:limit]
+        ],
+    }
@@ -1,23 +1,57 @@
 # app/routers/auth.py
 from fastapi import APIRouter, HTTPException
-from app import utils
+from app import nonces, utils
 
 # Configure logging
 logger = utils.get_logger(__name__)
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
+# Outstanding login challenges
+nonce_store = nonces.NonceStore()
+
+@router.get("/nonce")
+async def nonce():
+    """Issue a single-use login challenge and the message to sign with it."""
+    value = nonce_store.issue()
+    return {"nonce": value, "message": nonces.login_message(value), "expires_in": nonce_store.ttl}
+
 @router.post("/login")
 async def login(auth: utils.AuthRequest):
     logger.debug(f"Processing login request for address: {auth.address}")
+    # Replayed, stale or malformed messages are rejected before signature recovery
+    value = nonces.parse_login_message(auth.message)
+    if value is None or not nonce_store.consume(value):
+        logger.warning(f"Invalid or expired login nonce for address: {auth.address}")
+        raise HTTPException(status_code=401, detail="Invalid or expired nonce")
     is_valid, message = utils.verify_signature(auth)
     if not is_valid:
         logger.error(f"Signature verification failed: {message}")
         raise HTTPException(status_code=401, detail=message)
     
-    success, result = utils.generate_jwt(auth.address)
-    if not success:
-        logger.error(f"JWT generation failed: {result}")
-        raise HTTPException(status_code=500, detail=result)
+    tokens = issue_tokens(auth.address)
     logger.info(f"JWT generated for address: {auth.address}")
-    return {"token": result}
\ No newline at end of file
+    return tokens
+
+@router.post("/refresh")
+async def refresh(request: utils.RefreshRequest):
+    """Exchange a refresh token for a new access and refresh token pair, without a signature."""
+    success, address = utils.decode_jwt(request.refresh_token, utils.REFRESH_TOKEN)
+    if not success:
+        logger.warning(f"Token refresh failed: {address}")
+        raise HTTPException(status_code=401, detail="Invalid refresh token")
+    tokens = issue_tokens(address)
+    logger.debug(f"Refreshed tokens for address: {address}")
+    return tokens
+
+def issue_tokens(address: str) -> dict:
+    """Generate the access and refresh tokens returned to a client."""
+    success, token = utils.generate_jwt(address)
+    if not success:
+        logger.error(f"JWT generation failed: {token}")
+        raise HTTPException(status_code=500, detail=token)
+    success, refresh_token = utils.generate_jwt(address, utils.REFRESH_TOKEN)
+    if not success:
+        logger.error(f"JWT generation failed: {refresh_token}")
+        raise HTTPException(status_code=500, detail=refresh_token)
+    return {"token": token, "refresh_token": refresh_token}
\ No newline at end of file
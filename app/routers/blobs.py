@@ -0,0 +1,25 @@
+# app/routers/blobs.py
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import FileResponse
+from app import utils, blobs
+from app.routers import websocket
+
+# Configure logging
+logger = utils.get_logger(__name__)
+
+router = APIRouter(prefix="/blobs", tags=["blobs"])
+
+@router.get("/{digest}")
+async def download(digest: str, token: str):
+    """Serve a stored blob; Range requests are supported and the file is streamed from disk."""
+    success, result = utils.decode_jwt(token)
+    if not success:
+        logger.warning(result)
+        raise HTTPException(status_code=401, detail=result)
+    if not blobs.is_valid_digest(digest) or not websocket.blob_store.exists(digest):
+        raise HTTPException(status_code=404, detail="Blob not found")
+    return FileResponse(
+        websocket.blob_store.path(digest),
+        media_type="application/octet-stream",
+        headers={"Cache-Control": "private, max-age=31536000, immutable", "ETag": f'"{digest}"'}
+    )
@@ -0,0 +1,102 @@
+# app/routers/fallback.py
+from fastapi import APIRouter, Body, HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
+from app import utils, schemas, transports
+from app.routers import websocket
+
+# Configure logging
+logger = utils.get_logger(__name__)
+
+router = APIRouter(prefix="/http", tags=["fallback"])
+
+# HTTP sessions for clients that cannot open a WebSocket
+sessions = transports.HttpSessions()
+
+def get_address(token: str) -> str:
+    """Resolve an access token to its address or reject the request."""
+    success, result = utils.decode_jwt(token)
+    if not success:
+        logger.warning(result)
+        raise HTTPException(status_code=401, detail=result)
+    return result
+
+async def close(connection: transports.HttpConnection) -> None:
+    """Unregister a session's connection."""
+    await websocket.disconnect(connection.address, connection)
+
+async def open_session(address: str) -> transports.HttpConnection:
+    """Open a session and register it like a new WebSocket connection."""
+    connection = sessions.open(address, close)
+    await websocket.connect(address, connection)
+    return connection
+
+def get_session(session: str, address: str) -> transports.HttpConnection:
+    """Return the caller's session or reject the request."""
+    connection = sessions.get(session, address)
+    if connection is None:
+        raise HTTPException(status_code=404, detail="Unknown session")
+    return connection
+
+@router.get("/poll")
+async def poll(token: str, session: str | None = None, timeout: float = transports.POLL_TIMEOUT):
+    """Long-poll for frames; without a session, open one and return its initial frames.
+
+    Every pending frame is returned in one response as a JSON array.
+    """
+    address = get_address(token)
+    if session is None:
+        connection = await open_session(address)
+        timeout = 0
+    else:
+        connection = get_session(session, address)
+    frames = await connection.collect(min(max(timeout, 0), transports.POLL_TIMEOUT))
+    # Frames are already encoded, splice them into the body instead of decoding them again
+    body = f'{{"session":"{connection.session_id}","frames":[{",".join(frames)}]}}'
+    return Response(body, media_type="application/json")
+
+@router.get("/events")
+async def events(request: Request, token: str):
+    """Stream frames as Server-Sent Events; the first event carries the session id."""
+    address = get_address(token)
+    connection = await open_session(address)
+    connection.streaming = True
+
+    async def stream():
+        try:
+            yield f"event: session\ndata: {connection.session_id}\n\n"
+            while not await request.is_disconnected():
+                frames = await connection.collect(transports.SSE_KEEPALIVE)
+                # All frames queued since the last write go out in one chunk
+                yield "".join(f"data: {frame}\n\n" for frame in frames) if frames else ": keepalive\n\n"
+        finally:
+            if sessions.remove(connection.session_id):
+                await close(connection)
+
+    return StreamingResponse(stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@router.post("/send")
+async def send(token: str, session: str, frames: list = Body(...)):
+    """Dispatch a batch of client frames through the WebSocket handlers.
+
+    Replies such as acks and errors are delivered on the session like any other frame.
+    """
+    address = get_address(token)
+    connection = get_session(session, address)
+    if len(frames) > transports.SEND_MAX_FRAMES:
+        raise HTTPException(status_code=413, detail=f"Too many frames (max {transports.SEND_MAX_FRAMES})")
+    for data in frames:
+        success, frame = schemas.validate(data)
+        if not success:
+            await connection.send_json(frame)
+            continue
+        await websocket.dispatch(connection, frame, address)
+    return {"accepted": len(frames)}
+
+@router.post("/close")
+async def close_session(token: str, session: str):
+    """Close a session explicitly."""
+    address = get_address(token)
+    connection = get_session(session, address)
+    sessions.remove(connection.session_id)
+    await close(connection)
+    return {"closed": session}
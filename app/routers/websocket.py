@@ -1,6 +1,7 @@
 # app/websocket.py
+import json
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
-from app import utils, storage
+from app import utils, storage, outbound, push, blocklist, presence, receipts, ephemeral, blobs, dedupe, schemas, search, sketches, profiling, tracing
 
 # Configure logging
 logger = utils.get_logger(__name__)
@@ -10,77 +11,166 @@ router = APIRouter(prefix="/ws", tags=["websocket"])
 # Initialize storage
 store = storage.Storage()
 
+# Initialize message search index
+search_index = search.SearchIndex()
+search_index.load()
+
+# Per-user block lists, checked before any other work on requests and messages
+block_list = blocklist.BlockList()
+block_list.load()
+
+# Recently seen client message ids, so retried messages are not broadcast twice
+recent_messages = dedupe.DedupeWindow()
+
+# Initialize the attachment blob store
+blob_store = blobs.BlobStore()
+
+# Webhook notifications for offline recipients, enabled with W3CHAT_PUSH_URL
+push_dispatcher = push.PushDispatcher()
+
+def encode_message(message: dict) -> str:
+    """Encode a message the same way WebSocket.send_json does."""
+    return json.dumps(message, separators=(",", ":"), ensure_ascii=False)
+
 async def send_to_subscribers(recipient_addresses: list[str], message: dict):
     """Send a message to all WebSocket connections of recipient addresses."""
-    for address in recipient_addresses:
-        recipient_connections = store.connections.get(address, [])
-        for ws in recipient_connections:
-            try:
-                await ws.send_json(message)
-            except (WebSocketDisconnect, RuntimeError) as e:
-                logger.debug(f"Failed to send message to WebSocket for address {address}: {str(e)}")
-                continue
+    # Encode once and reuse the payload for every recipient socket
+    payload = encode_message(message)
+    if push_dispatcher.enabled and message["type"] in push.PUSH_TYPES:
+        for address in recipient_addresses:
+            if not store.connections.get(address):
+                push_dispatcher.notify(address, message)
+    with tracing.tracer.span("fanout", recipients=len(recipient_addresses)):
+        for address in recipient_addresses:
+            recipient_connections = store.connections.get(address, ())
+            for ws in recipient_connections:
+                try:
+                    await ws.send_text(payload)
+                except (WebSocketDisconnect, RuntimeError) as e:
+                    logger.debug(f"Failed to send message to WebSocket for address {address}: {str(e)}")
+                    continue
     logger.info("Message sent successfully")
 
-async def send_ack(websocket: WebSocket):
-    """Send acknowledgment to the websocket."""
-    await websocket.send_json({"type": "ack"})
+def offer_to_subscribers(recipient_addresses, message: dict) -> int:
+    """Queue a best-effort message on every connection of recipient addresses without waiting.
+
+    Returns:
+        int: The number of connections that dropped the message.
+    """
+    payload = encode_message(message)
+    dropped = 0
+    for address in recipient_addresses:
+        for ws in store.connections.get(address, ()):
+            if not ws.offer(payload):
+                dropped += 1
+    return dropped
+
+# Initialize presence service
+presence_service = presence.Presence(store, send_to_subscribers)
+
+# Initialize delivery and read receipts
+receipts_service = receipts.Receipts(store, send_to_subscribers)
+
+# Initialize the lossy lane for typing indicators and similar signals
+ephemeral_lane = ephemeral.EphemeralLane(store, offer_to_subscribers)
+
+async def send_ack(websocket: WebSocket, client_msg_id: str | None = None):
+    """Send acknowledgment to the websocket, echoing the client message id if any."""
+    await websocket.send_json({"type": "ack"} if client_msg_id is None else {"type": "ack", "client_msg_id": client_msg_id})
     logger.debug("Sent acknowledgment")
 
-async def process_ping(websocket: WebSocket, data: dict, sender_address: str):
+async def send_sync(websocket: WebSocket, address: str):
+    """Send the initial state of a newly connected address in one frame.
+
+    Everything is read from the reverse indexes, so the cost depends on the
+    address's own state rather than on the total number of channels.
+    """
+    inbound, outbound = store.get_channel_requests(address)
+    await websocket.send_json({
+        "type": "sync",
+        "channels": sorted(store.memberships.get(address, ())),
+        "requests": {"inbound": inbound, "outbound": outbound},
+        "invites": store.get_group_invites(address),
+        "presence": presence_service.snapshot(store.get_peers(address))
+    })
+
+async def process_ping(websocket: WebSocket, data: schemas.Ping, sender_address: str):
     """Process ping message and send pong response."""
     await websocket.send_json({"type": "pong"})
     logger.debug("Processed ping message")
 
-async def process_channel(websocket: WebSocket, data: dict, sender_address: str):
+async def process_channel(websocket: WebSocket, data: schemas.ChannelMessage, sender_address: str):
     """Process channel message type and forward to all channel subscribers."""
-    channel_name = data.get("channel")
-    data_content = data.get("data")
+    channel_name = data.channel
+    data_content = data.data
+    attachment = data.attachment
+    client_msg_id = data.client_msg_id
+    sketches.load_tracker.record_message(sender_address, channel_name)
 
-    if not isinstance(data_content, str):
-        await websocket.send_json({"type": "error", "message": "Message must be a string"})
-        logger.warning("Message is not a string")
-        return
-    if len(data_content) > 12000:
-        await websocket.send_json({"type": "error", "message": "Message too long (max 12000 characters)"})
-        logger.warning("Message too long")
-        return
-    
-    if not channel_name or not data_content:
-        await websocket.send_json({"type": "error", "message": "Invalid channel message format"})
-        logger.warning("Invalid channel message format")
+    # Messages to someone who blocked the sender are refused before any Storage work
+    if not utils.is_group_channel(channel_name) and any(
+        block_list.is_blocked(address, sender_address)
+        for address in channel_name.split(":") if address.lower() != sender_address.lower()
+    ):
+        await websocket.send_json({"type": "error", "message": "user is unavailable"})
+        logger.debug(f"Blocked message from {sender_address} in {channel_name}")
         return
+
+    with tracing.tracer.span("validate"):
+        if not (data_content or attachment):
+            await websocket.send_json({"type": "error", "message": "Invalid channel message format"})
+            logger.warning("Invalid channel message format")
+            return
+
+        # Attachments are referenced by the digest of an uploaded blob
+        if attachment is not None and not blob_store.exists(attachment):
+            await websocket.send_json({"type": "error", "message": "Unknown attachment"})
+            logger.warning(f"Unknown attachment from {sender_address}")
+            return
     
-    # Check if sender is a participant in the channel
-    if not utils.is_channel_participant(channel_name, sender_address):
-        await websocket.send_json({"type": "error", "message": "Unauthorized access to channel"})
-        logger.warning(f"Unauthorized access to channel {channel_name} by {sender_address}")
-        return
+        # Check if sender is a participant in the channel
+        if not store.is_participant(channel_name, sender_address):
+            await websocket.send_json({"type": "error", "message": "Unauthorized access to channel"})
+            logger.warning(f"Unauthorized access to channel {channel_name} by {sender_address}")
+            return
     
-    # Channel-based message handling
-    recipient_addresses = store.channels.get(channel_name, [])
-    if not recipient_addresses:
-        await websocket.send_json({"type": "error", "message": f"No subscribers in channel: {channel_name}"})
-        logger.warning("No subscribers in channel")
+        # Channel-based message handling, members are a copy-on-write snapshot
+        recipient_addresses = store.channels.get(channel_name, frozenset())
+        if not recipient_addresses:
+            await websocket.send_json({"type": "error", "message": f"No subscribers in channel: {channel_name}"})
+            logger.warning("No subscribers in channel")
+            return
+
+    # A retried message is acknowledged again but not broadcast again
+    if client_msg_id is not None and recent_messages.check_and_add(sender_address, client_msg_id):
+        await send_ack(websocket, client_msg_id)
+        logger.debug(f"Dropped duplicate message {client_msg_id} from {sender_address}")
         return
-    
-    await send_ack(websocket)
-    await send_to_subscribers(recipient_addresses, {
+
+    message = {
         "type": "message",
         "from": sender_address,
         "channel": channel_name,
-        "data": data_content
-    })
+        "data": data_content,
+        "seq": store.next_sequence(channel_name)
+    }
+    if attachment is not None:
+        message["attachment"] = attachment
+    await send_ack(websocket, client_msg_id)
+    await send_to_subscribers(recipient_addresses, message)
+    if data_content:
+        search_index.add(channel_name, sender_address, data_content)
 
-async def process_channel_request(websocket: WebSocket, data: dict, sender_address: str):
+async def process_channel_request(websocket: WebSocket, data: schemas.ChannelRequest, sender_address: str):
     """Process channel request and notify recipient."""
-    to_address = data.get("to")
-    if not to_address:
-        await websocket.send_json({"type": "error", "message": "Invalid recipient address"})
-        logger.warning("Invalid recipient address")
+    to_address = data.to
+    sketches.load_tracker.record_request(sender_address)
+    # Blocked senders get the same answer as for an offline recipient
+    if block_list.is_blocked(to_address, sender_address):
+        await websocket.send_json({"type": "error", "message": "user is unavailable"})
+        logger.debug(f"Blocked channel request from {sender_address} to {to_address}")
         return
-    
-    if not (utils.is_valid_address(sender_address) and utils.is_valid_address(to_address)):
+    if not utils.is_valid_address(sender_address):
         await websocket.send_json({"type": "error", "message": "Invalid Ethereum address"})
         logger.warning(f"Invalid Ethereum address: sender={sender_address}, to={to_address}")
         return
@@ -99,111 +189,326 @@ async def process_channel_request(websocket: WebSocket, data: dict, sender_addre
         logger.warning(f"Unauthorized channel approval for {channel_name} by {sender_address}")
         return
     
-    # Check if channel or request already exists
-    if channel_name in store.channels:
-        # Subscribe if channel already exists
-        success, msg = await store.subscribe_to_channel(channel_name, [sender_address])
+    # Serialize check-then-modify steps on this channel
+    async with store.lock(channel_name):
+        # Check if channel or request already exists
+        if channel_name in store.channels:
+            # Subscribe if channel already exists
+            success, msg = await store.subscribe_to_channel(channel_name, [sender_address])
+            if not success:
+                await websocket.send_json({"type": "error", "message": msg})
+                logger.warning(msg)
+                return
+            await websocket.send_json({"type": "info", "message": "Channel created", "channel": channel_name})
+            logger.info("Channel already exists")
+            return
+        if channel_name in store.channel_requests:
+            await websocket.send_json({"type": "error", "message": "Channel request already exists"})
+            logger.warning("Channel request already exists")
+            return
+    
+        # Notify recipient if online
+        recipient_connections = store.connections.get(to_address, [])
+        if recipient_connections:
+            # Store channel request
+            await store.add_channel_request(channel_name, sender_address)
+        
+            # Send acknowledgment to sender
+            await send_ack(websocket)
+            await send_to_subscribers([to_address], {
+                "type": "channel_request",
+                "from": sender_address,
+                "channel": channel_name
+            })
+        else:
+            await websocket.send_json({"type": "error", "message": "user is unavailable"})
+            logger.warning("attempt to request channel with unavailable user")
+
+async def process_channel_approve(websocket: WebSocket, data: schemas.ChannelApprove, sender_address: str):
+    """Process channel approval and create the channel."""
+    channel_name = data.channel
+    # Serialize check-then-modify steps on this channel
+    async with store.lock(channel_name):
+        if channel_name not in store.channel_requests:
+            await websocket.send_json({"type": "error", "message": "No such channel request"})
+            logger.warning("No such channel request")
+            return
+    
+        # Check if sender is a participant in the channel and not the requester
+        requester_address = store.channel_requests[channel_name]["from"]
+        if sender_address == requester_address:
+            await websocket.send_json({"type": "error", "message": "Requester cannot approve own channel request"})
+            logger.warning(f"Requester {sender_address} attempted to approve own channel request for {channel_name}")
+            return
+        if not utils.is_channel_participant(channel_name, sender_address):
+            await websocket.send_json({"type": "error", "message": "Unauthorized channel approval"})
+            logger.warning(f"Unauthorized channel approval for {channel_name} by {sender_address}")
+            return
+    
+        await store.add_channel(channel_name)
+    
+        # Delete channel request
+        success, msg = await store.delete_channel_request(channel_name)
+        if not success:
+            await websocket.send_json({"type": "error", "message": msg})
+            logger.warning(msg)
+            return
+        await send_ack(websocket)
+
+        # Subscribe both participants
+        success, msg = await store.subscribe_to_channel(channel_name, [sender_address, requester_address])
         if not success:
             await websocket.send_json({"type": "error", "message": msg})
             logger.warning(msg)
             return
-        await websocket.send_json({"type": "info", "message": "Channel created", "channel": channel_name})
-        logger.info("Channel already exists")
+    
+        # Notify subscribers
+        await store.notify_channel_creation(channel_name)
+
+async def process_channel_reject(websocket: WebSocket, data: schemas.ChannelReject, sender_address: str):
+    """Process channel request rejection and notify the requester."""
+    channel_name = data.channel
+    # Serialize check-then-modify steps on this channel
+    async with store.lock(channel_name):
+        if channel_name not in store.channel_requests:
+            await websocket.send_json({"type": "error", "message": "No such channel request"})
+            logger.warning("No such channel request")
+            return
+    
+        # Get requester address
+        requester_address = store.channel_requests[channel_name]["from"]
+    
+        # Delete channel request
+        success, msg = await store.delete_channel_request(channel_name)
+    
+        # Send acknowledgment to rejector
+        await send_ack(websocket)
+    
+        # Notify requester if online
+        requester_connections = store.connections.get(requester_address, [])
+        if requester_connections:
+            await send_to_subscribers([requester_address], {
+                "type": "info",
+                "message": f"Channel request rejected by {sender_address}",
+            })
+
+async def send_group_invites(channel_name: str, owner_address: str, addresses: list[str]):
+    """Notify invited addresses about a pending group invite."""
+    await send_to_subscribers(addresses, {
+        "type": "group_invite",
+        "from": owner_address,
+        "channel": channel_name
+    })
+
+async def process_group_create(websocket: WebSocket, data: schemas.GroupCreate, sender_address: str):
+    """Process group creation and invite the initial members."""
+    members = data.members
+    success, channel_name = await store.create_group(sender_address)
+    if not success:
+        await websocket.send_json({"type": "error", "message": channel_name})
+        logger.warning(channel_name)
         return
-    if channel_name in store.channel_requests:
-        await websocket.send_json({"type": "error", "message": "Channel request already exists"})
-        logger.warning("Channel request already exists")
+    success, result = await store.add_group_invites(channel_name, sender_address, members)
+    if not success:
+        await store.delete_channel(channel_name)
+        await websocket.send_json({"type": "error", "message": result})
+        logger.warning(result)
         return
-    
-    # Notify recipient if online
-    recipient_connections = store.connections.get(to_address, [])
-    if recipient_connections:
-        # Store channel request
-        await store.add_channel_request(channel_name, sender_address)
-        
-        # Send acknowledgment to sender
+    await send_ack(websocket)
+
+    # Notify owner and invitees
+    await store.notify_channel_creation(channel_name)
+    await send_group_invites(channel_name, sender_address, result)
+
+async def process_group_invite(websocket: WebSocket, data: schemas.GroupInvite, sender_address: str):
+    """Process group invitation and notify the invited addresses."""
+    channel_name = data.channel
+    members = data.members
+
+    # Serialize check-then-modify steps on this channel
+    async with store.lock(channel_name):
+        success, result = await store.add_group_invites(channel_name, sender_address, members)
+        if not success:
+            await websocket.send_json({"type": "error", "message": result})
+            logger.warning(f"Group invite for {channel_name} by {sender_address} failed: {result}")
+            return
         await send_ack(websocket)
-        await send_to_subscribers([to_address], {
-            "type": "channel_request",
-            "from": sender_address,
+        await send_group_invites(channel_name, sender_address, result)
+
+async def process_group_accept(websocket: WebSocket, data: schemas.GroupAccept, sender_address: str):
+    """Process acceptance of a group invite and join the group."""
+    channel_name = data.channel
+
+    # Serialize check-then-modify steps on this channel
+    async with store.lock(channel_name):
+        success, msg = await store.accept_group_invite(channel_name, sender_address)
+        if not success:
+            await websocket.send_json({"type": "error", "message": msg})
+            logger.warning(msg)
+            return
+        await send_ack(websocket)
+        await send_to_subscribers([sender_address], {
+            "type": "info",
+            "message": "Channel created",
             "channel": channel_name
         })
-    else:
-        await websocket.send_json({"type": "error", "message": "user is unavailable"})
-        logger.warning("attempt to request channel with unavailable user")
 
+async def process_group_reject(websocket: WebSocket, data: schemas.GroupReject, sender_address: str):
+    """Process rejection of a group invite."""
+    channel_name = data.channel
 
-async def process_channel_approve(websocket: WebSocket, data: dict, sender_address: str):
-    """Process channel approval and create the channel."""
-    channel_name = data.get("channel")
-    if not channel_name:
-        await websocket.send_json({"type": "error", "message": "Invalid channel name"})
-        logger.warning("Invalid channel name")
+    success, msg = await store.reject_group_invite(channel_name, sender_address)
+    if not success:
+        await websocket.send_json({"type": "error", "message": msg})
+        logger.warning(msg)
         return
-    if channel_name not in store.channel_requests:
-        await websocket.send_json({"type": "error", "message": "No such channel request"})
-        logger.warning("No such channel request")
+    await send_ack(websocket)
+
+async def process_group_leave(websocket: WebSocket, data: schemas.GroupLeave, sender_address: str):
+    """Process leaving a group and notify the remaining members."""
+    channel_name = data.channel
+
+    # Serialize check-then-modify steps on this channel
+    async with store.lock(channel_name):
+        success, msg = await store.remove_group_member(channel_name, sender_address)
+        if not success:
+            await websocket.send_json({"type": "error", "message": msg})
+            logger.warning(msg)
+            return
+        receipts_service.forget(channel_name, sender_address)
+        await send_ack(websocket)
+
+        await send_to_subscribers(store.channels.get(channel_name, frozenset()), {
+            "type": "info",
+            "message": f"Member left: {sender_address}",
+            "channel": channel_name
+        })
+
+async def process_presence_subscribe(websocket: WebSocket, data: schemas.PresenceSubscribe, sender_address: str):
+    """Subscribe to presence of channel peers and send their current state."""
+    subscribed = presence_service.subscribe(sender_address, data.addresses)
+    await websocket.send_json({"type": "presence", "presence": presence_service.snapshot(subscribed)})
+
+async def process_presence_unsubscribe(websocket: WebSocket, data: schemas.PresenceUnsubscribe, sender_address: str):
+    """Unsubscribe from presence of the given addresses, or of all peers."""
+    presence_service.unsubscribe(sender_address, data.addresses or None)
+    await send_ack(websocket)
+
+async def process_receipt(websocket: WebSocket, data: schemas.Receipt, sender_address: str):
+    """Move the sender's delivered or read mark in a channel forward.
+
+    Receipts are not acknowledged; peers get them in the next coalesced update.
+    """
+    channel_name = data.channel
+    sequence = data.seq
+    if not store.is_participant(channel_name, sender_address):
+        await websocket.send_json({"type": "error", "message": "Unauthorized access to channel"})
+        logger.warning(f"Unauthorized receipt in channel {channel_name} by {sender_address}")
         return
-    
-    # Check if sender is a participant in the channel and not the requester
-    requester_address = store.channel_requests[channel_name]["from"]
-    if sender_address == requester_address:
-        await websocket.send_json({"type": "error", "message": "Requester cannot approve own channel request"})
-        logger.warning(f"Requester {sender_address} attempted to approve own channel request for {channel_name}")
+    if sequence > store.sequences.get(channel_name, 0):
+        await websocket.send_json({"type": "error", "message": "Invalid receipt sequence"})
+        logger.warning(f"Receipt for unknown sequence {sequence} in {channel_name}")
         return
-    if not utils.is_channel_participant(channel_name, sender_address):
-        await websocket.send_json({"type": "error", "message": "Unauthorized channel approval"})
-        logger.warning(f"Unauthorized channel approval for {channel_name} by {sender_address}")
+    receipts_service.update(data.type, channel_name, sender_address, sequence)
+
+async def process_ephemeral(websocket: WebSocket, data: schemas.Ephemeral, sender_address: str):
+    """Queue a short-lived event such as a typing indicator for the channel peers.
+
+    Ephemeral events are not acknowledged and may be coalesced or dropped.
+    """
+    channel_name = data.channel
+    event = data.event
+    if not store.is_participant(channel_name, sender_address):
+        await websocket.send_json({"type": "error", "message": "Unauthorized access to channel"})
+        logger.warning(f"Unauthorized ephemeral in channel {channel_name} by {sender_address}")
         return
-    
-    await store.add_channel(channel_name)
-    
-    # Delete channel request
-    success, msg = await store.delete_channel_request(channel_name)
+    ephemeral_lane.publish(channel_name, sender_address, event)
+
+async def process_upload_start(websocket: WebSocket, data: schemas.UploadStart, sender_address: str):
+    """Start or resume a chunked attachment upload."""
+    digest = data.sha256
+    success, result = blob_store.start(sender_address, digest, data.size)
     if not success:
-        await websocket.send_json({"type": "error", "message": msg})
-        logger.warning(msg)
+        await websocket.send_json({"type": "error", "message": result})
+        logger.warning(f"Upload start by {sender_address} failed: {result}")
         return
-    await send_ack(websocket)
+    if result is None:
+        # Already stored, nothing to send
+        await websocket.send_json({"type": "upload_complete", "sha256": digest})
+        return
+    await websocket.send_json({"type": "upload", "upload_id": result.upload_id, "offset": result.offset})
 
-    # Subscribe both participants
-    success, msg = await store.subscribe_to_channel(channel_name, [sender_address, requester_address])
+async def process_chunk(websocket: WebSocket, frame: bytes, sender_address: str):
+    """Write a binary attachment chunk and report the upload progress."""
+    success, result = blobs.parse_chunk(frame)
+    if success:
+        upload_id, offset, chunk = result
+        success, result = await blob_store.write(sender_address, upload_id, offset, chunk)
     if not success:
-        await websocket.send_json({"type": "error", "message": msg})
-        logger.warning(msg)
+        await websocket.send_json({"type": "error", "message": result})
+        logger.warning(f"Upload chunk from {sender_address} rejected: {result}")
         return
-    
-    # Notify subscribers
-    await store.notify_channel_creation(channel_name)
+    if result.offset == result.size:
+        await websocket.send_json({"type": "upload_complete", "sha256": result.digest})
+        return
+    await websocket.send_json({"type": "upload", "upload_id": result.upload_id, "offset": result.offset})
 
-async def process_channel_reject(websocket: WebSocket, data: dict, sender_address: str):
-    """Process channel request rejection and notify the requester."""
-    channel_name = data.get("channel")
-    if not channel_name:
-        await websocket.send_json({"type": "error", "message": "Invalid channel name"})
-        logger.warning("Invalid channel name")
+async def process_renew(websocket: WebSocket, data: schemas.Renew, sender_address: str):
+    """Issue a fresh access token for the connected address from its refresh token."""
+    success, address = utils.decode_jwt(data.refresh_token, utils.REFRESH_TOKEN)
+    if not success or address != sender_address:
+        await websocket.send_json({"type": "error", "message": "Invalid refresh token"})
+        logger.warning(f"Token renewal failed for {sender_address}")
         return
-    if channel_name not in store.channel_requests:
-        await websocket.send_json({"type": "error", "message": "No such channel request"})
-        logger.warning("No such channel request")
+    success, token = utils.generate_jwt(sender_address)
+    if not success:
+        await websocket.send_json({"type": "error", "message": token})
+        logger.error(f"JWT generation failed: {token}")
+        return
+    await websocket.send_json({"type": "token", "token": token})
+    logger.debug(f"Renewed access token for {sender_address}")
+
+async def process_block(websocket: WebSocket, data: schemas.Block, sender_address: str):
+    """Process block and unblock of an address by the sender."""
+    if data.address.lower() == sender_address.lower():
+        await websocket.send_json({"type": "error", "message": "Cannot block self"})
+        return
+    action = block_list.block if data.type == "block" else block_list.unblock
+    success, msg = await action(sender_address, data.address)
+    if not success:
+        await websocket.send_json({"type": "error", "message": msg})
+        logger.warning(msg)
         return
-    
-    # Get requester address
-    requester_address = store.channel_requests[channel_name]["from"]
-    
-    # Delete channel request
-    success, msg = await store.delete_channel_request(channel_name)
-    
-    # Send acknowledgment to rejector
     await send_ack(websocket)
-    
-    # Notify requester if online
-    requester_connections = store.connections.get(requester_address, [])
-    if requester_connections:
-        await send_to_subscribers([requester_address], {
-            "type": "info",
-            "message": f"Channel request rejected by {sender_address}",
-        })
+
+async def process_search(websocket: WebSocket, data: schemas.Search, sender_address: str):
+    """Search message history of the caller's channels."""
+    query = data.query
+    channel_name = data.channel
+    offset = data.offset
+    limit = data.limit
+    if not query.strip():
+        await websocket.send_json({"type": "error", "message": "Invalid search query"})
+        logger.warning("Invalid search query")
+        return
+
+    if channel_name is not None:
+        if not store.is_participant(channel_name, sender_address):
+            await websocket.send_json({"type": "error", "message": "Unauthorized access to channel"})
+            logger.warning(f"Unauthorized search in channel {channel_name} by {sender_address}")
+            return
+        channel_names = [channel_name]
+    else:
+        channel_names = [c for c in store.memberships.get(sender_address, ()) if store.is_participant(c, sender_address)]
+
+    total, hits = search_index.search(query, channel_names, offset, limit)
+    await websocket.send_json({
+        "type": "search_results",
+        "query": query,
+        "total": total,
+        "offset": offset,
+        "hits": hits
+    })
 
 process_map = {
     "ping": process_ping,
@@ -211,17 +516,57 @@ process_map = {
     "channel_request": process_channel_request,
     "channel_approve": process_channel_approve,
     "channel_reject": process_channel_reject,
+    "group_create": process_group_create,
+    "group_invite": process_group_invite,
+    "group_accept": process_group_accept,
+    "group_reject": process_group_reject,
+    "group_leave": process_group_leave,
+    "presence_subscribe": process_presence_subscribe,
+    "presence_unsubscribe": process_presence_unsubscribe,
+    "delivered": process_receipt,
+    "read": process_receipt,
+    "ephemeral": process_ephemeral,
+    "upload_start": process_upload_start,
+    "renew": process_renew,
+    "block": process_block,
+    "unblock": process_block,
+    "search": process_search,
 }
 
 async def process_type(websocket: WebSocket, sender_address: str):
     """Process incoming WebSocket message based on its type."""
-    data = await websocket.receive_json()
-    message_type = data.get("type")
-    if not message_type or message_type not in process_map:
-        await websocket.send_json({"type": "error", "message": f"Invalid message type: {message_type}"})
-        logger.warning(f"Invalid message type received: {message_type}")
+    message = await websocket.receive()
+    if message["type"] == "websocket.disconnect":
+        raise WebSocketDisconnect(message["code"], message.get("reason"))
+    if message.get("bytes") is not None:
+        # Binary frames are attachment chunks and bypass JSON decoding entirely
+        await process_chunk(websocket, message["bytes"], sender_address)
         return
-    await process_map[message_type](websocket, data, sender_address)
+    text = message["text"]
+    # The trace starts once a frame has arrived, so idle time is not counted
+    with tracing.tracer.trace("frame", sender=sender_address):
+        with tracing.tracer.span("receive", bytes=len(text)):
+            # Parse and validate against the frame schemas in one pass
+            success, data = schemas.decode(text)
+        if not success:
+            await websocket.send_json(data)
+            logger.warning(f"Invalid frame from {sender_address}: {data['message']}")
+            return
+        await dispatch(websocket, data, sender_address)
+
+async def dispatch(connection, data: schemas.Frame, sender_address: str):
+    """Run the handler for a validated frame.
+
+    connection is a WebSocket or any transport with the same send_json and
+    send_text coroutines, such as transports.HttpConnection.
+    """
+    message_type = data.type
+    with tracing.tracer.span("dispatch", type=message_type):
+        handler_call = process_map[message_type](connection, data, sender_address)
+        if profiling.handler_timer.enabled:
+            await profiling.handler_timer.run(message_type, handler_call)
+        else:
+            await handler_call
 
 async def get_current_user(token: str):
     success, result = utils.decode_jwt(token)
@@ -230,24 +575,41 @@ async def get_current_user(token: str):
         raise WebSocketDisconnect(code=1008, reason=result)
     return result
 
+async def connect(address: str, connection):
+    """Register a connection, publish presence if it is the first one and send the sync frame."""
+    if await store.add_connection(address, connection):
+        presence_service.update(address, True)
+    await send_sync(connection, address)
+
+async def disconnect(address: str, websocket: WebSocket):
+    """Remove a connection and publish presence if it was the last one."""
+    if await store.remove_connection(address, websocket):
+        presence_service.update(address, False)
+        presence_service.unsubscribe(address)
+        blob_store.cancel(address)
+
 @router.websocket("/chat")
 async def websocket_endpoint(websocket: WebSocket, token: str):
     try:
         # Verify token
         address = await get_current_user(token)
-        await websocket.accept()
+        # Clients offering the batch subprotocol receive bursts as JSON array frames
+        batch = outbound.BATCH_SUBPROTOCOL in websocket.scope.get("subprotocols", ())
+        await websocket.accept(subprotocol=outbound.BATCH_SUBPROTOCOL if batch else None)
+        # Writes go through control and bulk lanes so acks and pongs skip queued messages
+        connection = outbound.OutboundSocket(websocket, batch=batch)
         
         # Add connection
-        await store.add_connection(address, websocket)
+        await connect(address, connection)
         
         try:
             while True:
                 # Receive JSON message
-                await process_type(websocket, address)
+                await process_type(connection, address)
         except WebSocketDisconnect:
-            await store.remove_connection(address, websocket)
+            await disconnect(address, connection)
         except Exception as e:
             logger.error(f"Unexpected error in WebSocket: {str(e)}")
-            await store.remove_connection(address, websocket)
+            await disconnect(address, connection)
     except WebSocketDisconnect:
         logger.info("WebSocket connection closed during initialization")
\ No newline at end of file
@@ -0,0 +1,138 @@
+# app/schemas.py
+from typing import Annotated, Literal, Union
+from pydantic import BaseModel, ConfigDict, Field, TypeAdapter, ValidationError
+from app import blobs, dedupe, ephemeral, search, storage, utils
+
+MESSAGE_MAX_LENGTH = 12000
+ADDRESS_PATTERN = r"^0x[a-fA-F0-9]{40}$"
+GROUP_NAME_PATTERN = rf"^{utils.GROUP_PREFIX}:[a-f0-9]{{32}}$"
+
+Address = Annotated[str, Field(pattern=ADDRESS_PATTERN)]
+ChannelName = Annotated[str, Field(min_length=1, max_length=256)]
+GroupName = Annotated[str, Field(pattern=GROUP_NAME_PATTERN)]
+AddressList = Annotated[list[str], Field(max_length=storage.GROUP_MAX_MEMBERS)]
+
+class Frame(BaseModel):
+    """Base of inbound frames; unknown fields are ignored and types are not coerced."""
+    model_config = ConfigDict(strict=True, frozen=True, extra="ignore")
+
+class Ping(Frame):
+    type: Literal["ping"]
+
+class ChannelMessage(Frame):
+    type: Literal["channel"]
+    channel: ChannelName
+    data: Annotated[str, Field(max_length=MESSAGE_MAX_LENGTH)] = ""
+    attachment: Annotated[str, Field(pattern=blobs.DIGEST_PATTERN.pattern)] | None = None
+    client_msg_id: Annotated[str, Field(min_length=1, max_length=dedupe.CLIENT_MSG_ID_MAX_LENGTH)] | None = None
+
+class ChannelRequest(Frame):
+    type: Literal["channel_request"]
+    to: Address
+
+class ChannelApprove(Frame):
+    type: Literal["channel_approve"]
+    channel: ChannelName
+
+class ChannelReject(Frame):
+    type: Literal["channel_reject"]
+    channel: ChannelName
+
+class GroupCreate(Frame):
+    type: Literal["group_create"]
+    members: AddressList = []
+
+class GroupInvite(Frame):
+    type: Literal["group_invite"]
+    channel: GroupName
+    members: Annotated[list[str], Field(min_length=1, max_length=storage.GROUP_MAX_MEMBERS)]
+
+class GroupAccept(Frame):
+    type: Literal["group_accept"]
+    channel: GroupName
+
+class GroupReject(Frame):
+    type: Literal["group_reject"]
+    channel: GroupName
+
+class GroupLeave(Frame):
+    type: Literal["group_leave"]
+    channel: GroupName
+
+class PresenceSubscribe(Frame):
+    type: Literal["presence_subscribe"]
+    addresses: AddressList = []
+
+class PresenceUnsubscribe(Frame):
+    type: Literal["presence_unsubscribe"]
+    addresses: AddressList = []
+
+class Receipt(Frame):
+    type: Literal["delivered", "read"]
+    channel: ChannelName
+    seq: Annotated[int, Field(gt=0)]
+
+class Ephemeral(Frame):
+    type: Literal["ephemeral"]
+    channel: ChannelName
+    event: Annotated[str, Field(min_length=1, max_length=ephemeral.EPHEMERAL_MAX_EVENT)]
+
+class UploadStart(Frame):
+    type: Literal["upload_start"]
+    sha256: Annotated[str, Field(pattern=blobs.DIGEST_PATTERN.pattern)]
+    size: Annotated[int, Field(gt=0, le=blobs.BLOB_MAX_SIZE)]
+
+class Renew(Frame):
+    type: Literal["renew"]
+    refresh_token: Annotated[str, Field(min_length=1)]
+
+class Block(Frame):
+    type: Literal["block", "unblock"]
+    address: Address
+
+class Search(Frame):
+    type: Literal["search"]
+    query: Annotated[str, Field(min_length=1, max_length=1000)]
+    channel: ChannelName | None = None
+    offset: Annotated[int, Field(ge=0)] = 0
+    limit: Annotated[int, Field(gt=0, le=search.SEARCH_MAX_LIMIT)] = 20
+
+InboundFrame = Annotated[
+    Union[Ping, ChannelMessage, ChannelRequest, ChannelApprove, ChannelReject, GroupCreate, GroupInvite,
+          GroupAccept, GroupReject, GroupLeave, PresenceSubscribe, PresenceUnsubscribe, Receipt, Ephemeral,
+          UploadStart, Renew, Block, Search],
+    Field(discriminator="type"),
+]
+
+# Built once; validate_json parses and validates in a single pass inside pydantic-core
+FRAME_ADAPTER = TypeAdapter(InboundFrame)
+
+def error_frame(error: ValidationError) -> dict:
+    """Turn the first validation error into an error frame with a machine-readable code."""
+    detail = error.errors(include_url=False, include_context=False)[0]
+    kind = detail["type"]
+    if kind == "json_invalid":
+        return {"type": "error", "code": "invalid_json", "message": "Invalid JSON"}
+    if kind in ("union_tag_invalid", "union_tag_not_found") or not detail["loc"]:
+        tag = detail.get("input", {}).get("type") if isinstance(detail.get("input"), dict) else None
+        return {"type": "error", "code": "invalid_type", "message": f"Invalid message type: {tag}"}
+    field = ".".join(str(part) for part in detail["loc"][1:])
+    return {"type": "error", "code": "invalid_field", "field": field, "reason": kind, "message": f"Invalid {field}: {detail['msg']}"}
+
+def decode(text: str | bytes) -> tuple[bool, Frame | dict]:
+    """Decode and validate a raw frame.
+
+    Returns:
+        tuple[bool, Frame | dict]: (success, typed frame or error frame).
+    """
+    try:
+        return True, FRAME_ADAPTER.validate_json(text)
+    except ValidationError as e:
+        return False, error_frame(e)
+
+def validate(data) -> tuple[bool, Frame | dict]:
+    """Validate an already decoded frame, as received by the HTTP transports."""
+    try:
+        return True, FRAME_ADAPTER.validate_python(data)
+    except ValidationError as e:
+        return False, error_frame(e)
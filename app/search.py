@@ -0,0 +1,211 @@
+# app/search.py
+import array
+import asyncio
+import json
+import math
+import os
+import re
+import time
+from app import utils, coalescing
+
+SEARCH_BATCH_SIZE = 256  # Messages indexed per segment at most
+SEARCH_FLUSH_INTERVAL = 0.5  # Seconds a message may wait before being indexed
+SEARCH_MERGE_FACTOR = 10  # Segments of one size tier merged into one of the next tier
+SEARCH_MAX_LIMIT = 50
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+def tokenize(text: str) -> list[str]:
+    """Split text into lowercase word tokens."""
+    return TOKEN_PATTERN.findall(text.lower())
+
+def tier(size: int, factor: int) -> int:
+    """Return the size tier of a segment: 0 below factor documents, 1 below factor squared, ..."""
+    return int(math.log(max(size, 1), factor))
+
+class Segment:
+    """A JSON-lines file holding the documents with ids first_id to first_id + size - 1."""
+    def __init__(self, number: int, first_id: int, size: int):
+        self.number = number
+        self.first_id = first_id
+        self.size = size
+
+class SearchIndex:
+    """Incremental inverted index over channel messages.
+
+    Messages are queued by add() without any indexing work, then appended to
+    disk as one JSON-lines segment per batch and indexed, off the delivery
+    path. Postings are kept per channel: channel -> token -> {document id:
+    term count}. Message bodies are not kept in memory: a document is its
+    segment number and byte offset, and hits are read back from disk.
+    Whenever merge_factor segments of the same size tier end the segment
+    list they are merged into one, so a history of n messages takes
+    O(merge_factor * log(n)) segment files.
+    """
+    def __init__(self, directory: str | None = None, batch_size: int = SEARCH_BATCH_SIZE,
+                 flush_interval: float = SEARCH_FLUSH_INTERVAL, merge_factor: int = SEARCH_MERGE_FACTOR):
+        self.directory = directory or utils.join_paths(utils.get_data_path(), 'search')
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.merge_factor = merge_factor
+        self.document_segments = array.array("I")  # document id -> segment number
+        self.document_offsets = array.array("Q")  # document id -> byte offset in its segment
+        self.postings = {}  # channel -> token -> {document id: term count}
+        self.channel_sizes = {}  # channel -> number of indexed documents
+        self.segments = []  # Segments, oldest first
+        self.pending = []
+        self.next_segment = 1
+        self._timer = coalescing.FlushTimer(self.flush)
+        self._flush_lock = asyncio.Lock()
+        self.logger = utils.get_logger(__name__)
+
+    def path(self, number: int) -> str:
+        return utils.join_paths(self.directory, f"segment-{number:08d}.jsonl")
+
+    def load(self) -> None:
+        """Index every persisted segment, oldest first."""
+        if not utils.path_exists(self.directory):
+            return
+        names = sorted(name for name in os.listdir(self.directory)
+                       if name.startswith("segment-") and name.endswith(".jsonl"))
+        for name in names:
+            number = int(name[len("segment-"):-len(".jsonl")])
+            batch, offsets = [], []
+            with open(utils.join_paths(self.directory, name), "rb") as f:
+                offset = 0
+                for line in f:
+                    if line.strip():
+                        batch.append(json.loads(line))
+                        offsets.append(offset)
+                    offset += len(line)
+            self._index(number, batch, offsets)
+            self.next_segment = number + 1
+        self.logger.info(f"Loaded {len(self.document_offsets)} messages from {len(names)} search segments")
+
+    def add(self, channel_name: str, sender_address: str, text: str) -> None:
+        """Queue a message for indexing."""
+        self.pending.append({"channel": channel_name, "from": sender_address, "data": text, "ts": time.time()})
+        self._timer.schedule(self.flush_interval)
+        if len(self.pending) >= self.batch_size:
+            self._timer.expedite()
+
+    async def flush(self) -> None:
+        """Persist pending messages as segments, index them and merge full tiers."""
+        async with self._flush_lock:
+            while self.pending:
+                batch, self.pending = self.pending[:self.batch_size], self.pending[self.batch_size:]
+                number = self.next_segment
+                self.next_segment += 1
+                lines = [(json.dumps(document, ensure_ascii=False) + "\n").encode() for document in batch]
+                offsets = await self._write_segment(number, lines)
+                # Indexed once written, so every indexed document can be read back
+                self._index(number, batch, offsets)
+            await self._merge()
+
+    async def _write_segment(self, number: int, lines: list[bytes]) -> list[int]:
+        """Write lines as a segment and return their byte offsets.
+
+        The file is written aside and renamed into place on the loop, so a
+        search never reads a segment while its offsets are being replaced.
+        """
+        temporary = f"{self.path(number)}.tmp"
+        offsets = await asyncio.to_thread(self._write_lines, temporary, lines)
+        os.replace(temporary, self.path(number))
+        return offsets
+
+    def _write_lines(self, path: str, lines: list[bytes]) -> list[int]:
+        os.makedirs(self.directory, exist_ok=True)
+        offsets = []
+        offset = 0
+        with open(path, "wb") as f:
+            for line in lines:
+                offsets.append(offset)
+                f.write(line)
+                offset += len(line)
+        return offsets
+
+    def _read_segments(self, numbers: list[int]) -> list[bytes]:
+        lines = []
+        for number in numbers:
+            with open(self.path(number), "rb") as f:
+                lines.extend(line for line in f if line.strip())
+        return lines
+
+    async def _merge(self) -> None:
+        """Merge trailing segments of the same tier until no tier is full."""
+        factor = self.merge_factor
+        while len(self.segments) >= factor:
+            tail = self.segments[-factor:]
+            if len({tier(segment.size, factor) for segment in tail}) > 1:
+                return
+            numbers = [segment.number for segment in tail]
+            lines = await asyncio.to_thread(self._read_segments, numbers)
+            # The merged segment takes the newest number, keeping file order equal to id order
+            offsets = await self._write_segment(numbers[-1], lines)
+            first_id = tail[0].first_id
+            for document_id, offset in enumerate(offsets, first_id):
+                self.document_segments[document_id] = numbers[-1]
+                self.document_offsets[document_id] = offset
+            self.segments[-factor:] = [Segment(numbers[-1], first_id, len(offsets))]
+            for number in numbers[:-1]:
+                await asyncio.to_thread(utils.remove_path, self.path(number))
+            self.logger.debug(f"Merged {factor} search segments into segment {numbers[-1]}")
+
+    def _index(self, number: int, batch: list[dict], offsets: list[int]) -> None:
+        self.segments.append(Segment(number, len(self.document_offsets), len(batch)))
+        for document, offset in zip(batch, offsets):
+            document_id = len(self.document_offsets)
+            self.document_segments.append(number)
+            self.document_offsets.append(offset)
+            channel_name = document["channel"]
+            self.channel_sizes[channel_name] = self.channel_sizes.get(channel_name, 0) + 1
+            channel_postings = self.postings.setdefault(channel_name, {})
+            for token in tokenize(document["data"]):
+                postings = channel_postings.setdefault(token, {})
+                postings[document_id] = postings.get(document_id, 0) + 1
+
+    def _read_document(self, document_id: int) -> dict:
+        with open(self.path(self.document_segments[document_id]), "rb") as f:
+            f.seek(self.document_offsets[document_id])
+            return json.loads(f.readline())
+
+    def search(self, query: str, channel_names, offset: int = 0, limit: int = 20) -> tuple[int, list[dict]]:
+        """Find messages in the given channels containing every query token.
+
+        Hits are ranked by TF-IDF computed per channel, newest first on ties.
+
+        Returns:
+            tuple[int, list[dict]]: (total number of hits, requested page of hits).
+        """
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens:
+            return 0, []
+        scored = []
+        for channel_name in channel_names:
+            channel_postings = self.postings.get(channel_name)
+            if not channel_postings:
+                continue
+            token_postings = [channel_postings.get(token) for token in tokens]
+            if not all(token_postings):
+                continue
+            # Intersect starting from the rarest token
+            token_postings.sort(key=len)
+            candidates = set(token_postings[0])
+            for postings in token_postings[1:]:
+                candidates.intersection_update(postings)
+            size = self.channel_sizes[channel_name]
+            weights = [math.log(1 + size / len(postings)) for postings in token_postings]
+            for document_id in candidates:
+                score = sum(weight * postings[document_id] for weight, postings in zip(weights, token_postings))
+                scored.append((score, document_id))
+        scored.sort(key=lambda hit: (-hit[0], -hit[1]))
+        hits = []
+        for score, document_id in scored[offset:offset + limit]:
+            document = self._read_document(document_id)
+            hits.append({
+                "channel": document["channel"],
+                "from": document["from"],
+                "data": document["data"],
+                "ts": document["ts"],
+                "score": round(score, 4)
+            })
+        return len(scored), hits
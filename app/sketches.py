@@ -0,0 +1,115 @@
+# app/sketches.py
+import time
+
+SKETCH_WIDTH = 2048  # counters per count-min row
+SKETCH_DEPTH = 4  # count-min rows
+HEAVY_HITTERS = 64  # keys tracked by each space-saving summary
+DECAY_INTERVAL = 60.0  # seconds after which every count is halved
+
+class CountMinSketch:
+    """Fixed-size frequency estimates; never under-counts, over-counts on collisions."""
+    def __init__(self, width: int = SKETCH_WIDTH, depth: int = SKETCH_DEPTH):
+        self.width = width
+        self.rows = [[0] * width for _ in range(depth)]
+
+    def add(self, key: str, count: int = 1) -> int:
+        """Count a key and return its new estimate."""
+        estimate = None
+        for seed, row in enumerate(self.rows):
+            index = hash((seed, key)) % self.width
+            row[index] += count
+            estimate = row[index] if estimate is None else min(estimate, row[index])
+        return estimate
+
+    def estimate(self, key: str) -> int:
+        """Return the estimated count of a key."""
+        return min(row[hash((seed, key)) % self.width] for seed, row in enumerate(self.rows))
+
+    def decay(self) -> None:
+        """Halve every counter."""
+        self.rows = [[value >> 1 for value in row] for row in self.rows]
+
+class SpaceSaving:
+    """Tracks the most frequent keys in a bounded number of slots.
+
+    When all slots are taken the key with the lowest count is replaced and the
+    newcomer inherits its count, so counts are upper bounds.
+    """
+    def __init__(self, capacity: int = HEAVY_HITTERS):
+        self.capacity = capacity
+        self.counts = {}  # key -> count
+
+    def add(self, key: str, count: int = 1) -> None:
+        """Count a key."""
+        if key in self.counts:
+            self.counts[key] += count
+        elif len(self.counts) < self.capacity:
+            self.counts[key] = count
+        else:
+            victim = min(self.counts, key=self.counts.get)
+            self.counts[key] = self.counts.pop(victim) + count
+
+    def top(self, limit: int) -> list[tuple[str, int]]:
+        """Return the most frequent keys, highest count first."""
+        return sorted(self.counts.items(), key=lambda item: -item[1])[:limit]
+
+    def decay(self) -> None:
+        """Halve every count, dropping keys that reach zero."""
+        self.counts = {key: count >> 1 for key, count in self.counts.items() if count > 1}
+
+class HeavyHitters:
+    """A count-min sketch paired with a space-saving summary, decayed over time.
+
+    Memory is fixed by the sketch and summary sizes regardless of the number
+    of distinct keys. Every DECAY_INTERVAL seconds all counts are halved, so
+    reports favour recent load.
+    """
+    def __init__(self, decay_interval: float = DECAY_INTERVAL):
+        self.sketch = CountMinSketch()
+        self.summary = SpaceSaving()
+        self.decay_interval = decay_interval
+        self.last_decay = time.monotonic()
+
+    def add(self, key: str) -> None:
+        """Count one event for a key."""
+        now = time.monotonic()
+        if now - self.last_decay >= self.decay_interval:
+            self.sketch.decay()
+            self.summary.decay()
+            self.last_decay = now
+        self.summary.add(key)
+        self.sketch.add(key)
+
+    def top(self, limit: int) -> list[dict]:
+        """Return the heaviest keys with their sketch estimates."""
+        return [
+            {"key": key, "count": min(count, self.sketch.estimate(key))}
+            for key, count in self.summary.top(limit)
+        ]
+
+class LoadTracker:
+    """Top senders, channels and channel request senders."""
+    def __init__(self):
+        self.senders = HeavyHitters()
+        self.channels = HeavyHitters()
+        self.requesters = HeavyHitters()
+
+    def record_message(self, sender_address: str, channel_name) -> None:
+        """Count a channel message frame."""
+        self.senders.add(sender_address)
+        if isinstance(channel_name, str):
+            self.channels.add(channel_name)
+
+    def record_request(self, sender_address: str) -> None:
+        """Count a channel request frame."""
+        self.requesters.add(sender_address)
+
+    def report(self, limit: int = 10) -> dict:
+        """Return the heaviest keys of every tracker."""
+        return {
+            "senders": self.senders.top(limit),
+            "channels": self.channels.top(limit),
+            "requesters": self.requesters.top(limit),
+        }
+
+load_tracker = LoadTracker()
@@ -0,0 +1,119 @@
+# app/static_assets.py
+import gzip
+import hashlib
+import mimetypes
+import os
+from fastapi import Request, Response
+from app import utils
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip is always available
+    brotli = None
+
+STATIC_PREFIX = "/static/"
+INDEX_FILE = "index.html"
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "no-cache"
+COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json", "image/svg+xml")
+
+class Asset:
+    """A file held in memory with its precompressed variants."""
+    def __init__(self, content: bytes, media_type: str, immutable: bool = False):
+        self.media_type = media_type
+        self.immutable = immutable
+        self.digest = hashlib.sha256(content).hexdigest()
+        self.variants = {"identity": content}
+        if media_type.startswith(COMPRESSIBLE_TYPES):
+            # mtime=0 keeps the gzip output, and so its ETag, stable across restarts
+            self.variants["gzip"] = gzip.compress(content, compresslevel=9, mtime=0)
+            if brotli:
+                self.variants["br"] = brotli.compress(content)
+
+    def etag(self, encoding: str) -> str:
+        """Return the strong ETag of the given encoding of the asset."""
+        suffix = "" if encoding == "identity" else f"-{encoding}"
+        return f'"{self.digest[:32]}{suffix}"'
+
+class StaticAssets:
+    """Serves the frontend bundle from memory with ETags and cache headers.
+
+    Every file is loaded and compressed once at startup. Files are reachable
+    under their plain name (revalidated on each use) and under a content-hashed
+    name (cached forever); index.html is rewritten to reference the hashed names.
+    """
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.assets = {}  # relative path -> Asset
+        self.hashed_names = {}  # relative path -> content-hashed relative path
+        self.logger = utils.get_logger(__name__)
+        self.load()
+
+    def load(self) -> None:
+        """Read and precompress every file under the directory."""
+        contents = {}
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                path = utils.join_paths(root, name)
+                relative_path = os.path.relpath(path, self.directory).replace(os.sep, "/")
+                with open(path, "rb") as f:
+                    contents[relative_path] = f.read()
+
+        for relative_path, content in contents.items():
+            if relative_path == INDEX_FILE:
+                continue
+            asset = Asset(content, self.get_media_type(relative_path))
+            self.assets[relative_path] = asset
+            stem, extension = os.path.splitext(relative_path)
+            hashed_path = f"{stem}.{asset.digest[:12]}{extension}"
+            self.hashed_names[relative_path] = hashed_path
+            self.assets[hashed_path] = Asset(content, asset.media_type, immutable=True)
+
+        if INDEX_FILE in contents:
+            index = contents[INDEX_FILE].decode("utf-8")
+            for relative_path, hashed_path in self.hashed_names.items():
+                index = index.replace(f'"{STATIC_PREFIX}{relative_path}"', f'"{STATIC_PREFIX}{hashed_path}"')
+            self.assets[INDEX_FILE] = Asset(index.encode("utf-8"), "text/html; charset=utf-8")
+        self.logger.info(f"Loaded {len(contents)} static assets")
+
+    @staticmethod
+    def get_media_type(path: str) -> str:
+        """Guess the media type of a file, with a charset for text types."""
+        media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        if media_type.startswith("text/") or media_type == "application/javascript":
+            media_type += "; charset=utf-8"
+        return media_type
+
+    @staticmethod
+    def choose_encoding(asset: Asset, accept_encoding: str) -> str:
+        """Pick the best available encoding accepted by the client."""
+        accepted = {part.split(";")[0].strip() for part in accept_encoding.lower().split(",")}
+        for encoding in ("br", "gzip"):
+            if encoding in asset.variants and encoding in accepted:
+                return encoding
+        return "identity"
+
+    def response(self, request: Request, path: str) -> Response:
+        """Build the GET or HEAD response for an asset, honoring If-None-Match."""
+        asset = self.assets.get(path)
+        if asset is None:
+            return Response(status_code=404)
+        encoding = self.choose_encoding(asset, request.headers.get("accept-encoding", ""))
+        etag = asset.etag(encoding)
+        headers = {
+            "ETag": etag,
+            "Cache-Control": IMMUTABLE_CACHE_CONTROL if asset.immutable else REVALIDATE_CACHE_CONTROL,
+            "Vary": "Accept-Encoding",
+        }
+        # If-None-Match uses weak comparison, and proxies weaken ETags when they recompress
+        if_none_match = request.headers.get("if-none-match", "")
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        if etag in tags or if_none_match.strip() == "*":
+            return Response(status_code=304, headers=headers)
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+        content = asset.variants[encoding]
+        if request.method == "HEAD":
+            headers["Content-Length"] = str(len(content))
+            return Response(media_type=asset.media_type, headers=headers)
+        return Response(content, media_type=asset.media_type, headers=headers)
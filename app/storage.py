@@ -1,56 +1,201 @@
-from fastapi import WebSocket
-from app import utils
+import asyncio
+import weakref
+from fastapi import WebSocket, WebSocketDisconnect
+from app import accounting, utils, tracing
+
+GROUP_MAX_MEMBERS = 5000
 
 class Storage:
-    """Manages WebSocket connections, channels, and channel requests."""
+    """Manages WebSocket connections, channels, and channel requests.
+
+    Connection tuples and channel member frozensets are copy-on-write: they
+    are replaced, never mutated, so a reference taken before an await is a
+    stable snapshot for fan-out. Handlers that check and then modify state
+    across awaits serialize on lock(channel_name). Every change of a
+    dictionary value is reported to accounting as its element count before
+    and after, None meaning no entry.
+    """
     def __init__(self):
-        self.connections = {}  # Store active WebSocket connections
-        self.channels = {}  # Store channel subscriptions as a dictionary of lists
+        self.connections = {}  # Store active WebSocket connections as tuples
+        self.channels = {}  # Store channel subscriptions as a dictionary of frozensets
         self.channel_requests = {}  # Store channel requests as a dictionary
+        self.memberships = {}  # Reverse index: address -> set of channel names
+        self.request_index = {}  # Reverse index: lowercase address -> channel names with pending requests
+        self.invitations = {}  # Reverse index: address -> group names with pending invites
+        self.group_owners = {}  # Store group channel owners
+        self.group_invites = {}  # Store pending group invites as a dictionary of sets
+        self.sequences = {}  # Last message sequence number per channel
+        self._locks = weakref.WeakValueDictionary()  # Per-channel locks, dropped when unused
+        self.accounting = accounting.MemoryAccounting()
         self.logger = utils.get_logger(__name__)
 
-    async def add_connection(self, address: str, websocket: WebSocket) -> None:
-        """Add a WebSocket connection for the given address."""
-        if address not in self.connections:
-            self.connections[address] = []
-        self.connections[address].append(websocket)
+    def lock(self, channel_name: str) -> asyncio.Lock:
+        """Return the lock guarding multi-step updates of a channel."""
+        lock = self._locks.get(channel_name)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._locks[channel_name] = lock
+        return lock
+
+    def next_sequence(self, channel_name: str) -> int:
+        """Assign the next message sequence number of a channel, starting at 1."""
+        sequence = self.sequences.get(channel_name, 0) + 1
+        if sequence == 1:
+            self.accounting.update("sequences", channel_name, None, 1)
+        self.sequences[channel_name] = sequence
+        return sequence
+
+    @tracing.traced("storage.add_connection")
+    async def add_connection(self, address: str, websocket: WebSocket) -> bool:
+        """Add a WebSocket connection for the given address.
+
+        Returns:
+            bool: True if this is the first connection of the address.
+        """
+        connections = self.connections.get(address, ())
+        first = not connections
+        self.connections[address] = (*connections, websocket)
+        self.accounting.update("connections", address, len(connections) or None, len(connections) + 1)
         self.logger.info("New WebSocket connection established")
+        return first
+
+    @tracing.traced("storage.remove_connection")
+    async def remove_connection(self, address: str, websocket: WebSocket) -> bool:
+        """Remove a WebSocket connection for the given address.
 
-    async def remove_connection(self, address: str, websocket: WebSocket) -> None:
-        """Remove a WebSocket connection for the given address."""
-        if address in self.connections:
-            self.connections[address].remove(websocket)
-            if not self.connections[address]:
+        Returns:
+            bool: True if this was the last connection of the address.
+        """
+        last = False
+        connections = self.connections.get(address, ())
+        if websocket in connections:
+            remaining = tuple(ws for ws in connections if ws is not websocket)
+            self.accounting.update("connections", address, len(connections), len(remaining) or None)
+            if remaining:
+                self.connections[address] = remaining
+            else:
                 del self.connections[address]
+                last = True
         self.logger.info("WebSocket connection closed")
+        return last
 
+    def is_online(self, address: str) -> bool:
+        """Check if the address has at least one open connection."""
+        return address in self.connections
+
+    def get_peers(self, address: str) -> set[str]:
+        """Return the addresses sharing at least one channel with the address."""
+        peers = set()
+        for channel_name in self.memberships.get(address, ()):
+            peers.update(self.channels.get(channel_name, ()))
+        peers.discard(address)
+        return peers
+
+    def are_peers(self, address_1: str, address_2: str) -> bool:
+        """Check if two addresses share at least one channel."""
+        channels_1 = self.memberships.get(address_1, set())
+        channels_2 = self.memberships.get(address_2, set())
+        return not channels_1.isdisjoint(channels_2)
+
+    @tracing.traced("storage.add_channel")
     async def add_channel(self, channel_name: str) -> None:
         """Add a new channel if it doesn't exist."""
         if channel_name not in self.channels:
-            self.channels[channel_name] = []
+            self.channels[channel_name] = frozenset()
+            self.accounting.update("channels", channel_name, None, 0)
         self.logger.debug("Channel added")
 
+    def _add_member(self, channel_name: str, address: str) -> bool:
+        """Add an address to a channel and the reverse index, return True if it was added."""
+        members = self.channels[channel_name]
+        if address in members:
+            return False
+        self.channels[channel_name] = members | {address}
+        self.accounting.update("channels", channel_name, len(members), len(members) + 1)
+        channels = self.memberships.setdefault(address, set())
+        self.accounting.update("memberships", address, len(channels) or None, len(channels) + 1)
+        channels.add(channel_name)
+        return True
+
+    def _remove_member(self, channel_name: str, address: str) -> bool:
+        """Remove an address from a channel and the reverse index, return True if it was removed."""
+        members = self.channels.get(channel_name)
+        if not members or address not in members:
+            return False
+        self.channels[channel_name] = members - {address}
+        self.accounting.update("channels", channel_name, len(members), len(members) - 1)
+        self._unindex_member(channel_name, address)
+        return True
+
+    def _unindex_member(self, channel_name: str, address: str) -> None:
+        """Remove a channel from the address's reverse index entry."""
+        channels = self.memberships.get(address)
+        if channels is not None and channel_name in channels:
+            channels.discard(channel_name)
+            self.accounting.update("memberships", address, len(channels) + 1, len(channels) or None)
+            if not channels:
+                del self.memberships[address]
+
+    @tracing.traced("storage.subscribe_to_channel")
     async def subscribe_to_channel(self, channel_name: str, addresses: list[str]) -> tuple[bool, str]:
         """Subscribe a list of addresses to a channel."""
         for address in addresses:
             if not utils.is_valid_address(address):
                 self.logger.warning(f"Invalid address for subscription: {address}")
                 return False, f"Invalid address: {address}"
-            if address not in self.channels[channel_name]:
-                self.channels[channel_name].append(address)
+            if self._add_member(channel_name, address):
                 self.logger.debug(f"Subscribed address {address} to channel {channel_name}")
         return True, "Subscription successful"
 
     async def add_channel_request(self, channel_name: str, sender_address: str) -> None:
         """Store a channel request."""
+        self.accounting.update("channel_requests", channel_name, 1 if channel_name in self.channel_requests else None, 1)
         self.channel_requests[channel_name] = {"from": sender_address}
+        for address in channel_name.split(":"):
+            channels = self.request_index.setdefault(address.lower(), set())
+            if channel_name not in channels:
+                self.accounting.update("request_index", address.lower(), len(channels) or None, len(channels) + 1)
+                channels.add(channel_name)
         self.logger.debug("Channel request created")
 
+    def get_channel_requests(self, address: str) -> tuple[list[dict], list[str]]:
+        """Return the pending channel requests involving an address.
+
+        Returns:
+            tuple[list[dict], list[str]]: (inbound requests with their sender,
+            channel names of outbound requests).
+        """
+        inbound, outbound = [], []
+        for channel_name in self.request_index.get(address.lower(), ()):
+            requester_address = self.channel_requests[channel_name]["from"]
+            if requester_address.lower() == address.lower():
+                outbound.append(channel_name)
+            else:
+                inbound.append({"channel": channel_name, "from": requester_address})
+        return inbound, outbound
+
+    def get_group_invites(self, address: str) -> list[dict]:
+        """Return the pending group invites of an address with the inviting owner."""
+        return [
+            {"channel": channel_name, "from": self.group_owners[channel_name]}
+            for channel_name in self.invitations.get(address, ())
+        ]
+
+    def _unindex_invite(self, channel_name: str, address: str) -> None:
+        """Remove a group from the address's pending invite index entry."""
+        channels = self.invitations.get(address)
+        if channels is not None and channel_name in channels:
+            channels.discard(channel_name)
+            self.accounting.update("invitations", address, len(channels) + 1, len(channels) or None)
+            if not channels:
+                del self.invitations[address]
+
     async def notify_channel_creation(self, channel_name: str) -> None:
         """Notify all subscribers of a channel about its creation."""
-        recipient_addresses = self.channels.get(channel_name, [])
+        # Copy-on-write snapshots stay unchanged while the sends below await
+        recipient_addresses = self.channels.get(channel_name, frozenset())
         for address in recipient_addresses:
-            recipient_connections = self.connections.get(address, [])
+            recipient_connections = self.connections.get(address, ())
             for ws in recipient_connections:
                 try:
                     await ws.send_json({"type": "info", "message": "Channel created", "channel": channel_name})
@@ -63,7 +208,19 @@ class Storage:
         """Delete a channel if it exists."""
         try:
             if channel_name in self.channels:
-                del self.channels[channel_name]
+                members = self.channels.pop(channel_name)
+                self.accounting.update("channels", channel_name, len(members), None)
+                for address in members:
+                    self._unindex_member(channel_name, address)
+                if self.group_owners.pop(channel_name, None) is not None:
+                    self.accounting.update("group_owners", channel_name, 1, None)
+                invites = self.group_invites.pop(channel_name, None)
+                if invites is not None:
+                    self.accounting.update("group_invites", channel_name, len(invites), None)
+                    for address in invites:
+                        self._unindex_invite(channel_name, address)
+                if self.sequences.pop(channel_name, None) is not None:
+                    self.accounting.update("sequences", channel_name, 1, None)
                 return True, f"Channel {channel_name} deleted successfully"
             return True, f"Channel {channel_name} does not exist"
         except Exception as e:
@@ -75,12 +232,21 @@ class Storage:
         try:
             if channel_name in self.channel_requests:
                 del self.channel_requests[channel_name]
+                self.accounting.update("channel_requests", channel_name, 1, None)
+                for address in channel_name.split(":"):
+                    channels = self.request_index.get(address.lower())
+                    if channels is not None and channel_name in channels:
+                        channels.discard(channel_name)
+                        self.accounting.update("request_index", address.lower(), len(channels) + 1, len(channels) or None)
+                        if not channels:
+                            del self.request_index[address.lower()]
                 return True, f"Channel request {channel_name} deleted successfully"
             return True, f"Channel request {channel_name} does not exist"
         except Exception as e:
             self.logger.error(f"Failed to delete channel request {channel_name}: {str(e)}")
             return False, f"Failed to delete channel request {channel_name}: {str(e)}"
 
+    @tracing.traced("storage.ensure_channel")
     async def ensure_channel(self, channel_name: str, addresses: list[str]) -> tuple[bool, str]:
         """Ensure a channel exists, creating it and subscribing addresses if it doesn't."""
         try:
@@ -89,16 +255,114 @@ class Storage:
                 return False, f"Invalid channel name: {channel_name}"
             for address in addresses:
                 if channel_name not in self.channels:
-                    self.channels[channel_name] = []
+                    self.channels[channel_name] = frozenset()
+                    self.accounting.update("channels", channel_name, None, 0)
                     self.logger.debug(f"Channel {channel_name} created")
-                if address not in self.channels[channel_name]:
-                    self.channels[channel_name].append(address)
+                if self._add_member(channel_name, address):
                     self.logger.debug(f"Subscribed address {address} to channel {channel_name}")
             return True, f"Channel {channel_name} ensured"
         except Exception as e:
             self.logger.error(f"Failed to ensure channel {channel_name}: {str(e)}")
             return False, f"Failed to ensure channel {channel_name}: {str(e)}"
-    
+
+    @tracing.traced("storage.create_group")
+    async def create_group(self, owner_address: str) -> tuple[bool, str]:
+        """Create a group channel with owner_address as its only member.
+
+        Returns:
+            tuple[bool, str]: (success, group channel name or error message).
+        """
+        if not utils.is_valid_address(owner_address):
+            self.logger.warning(f"Invalid address for group: {owner_address}")
+            return False, f"Invalid address: {owner_address}"
+        channel_name = utils.generate_group_name()
+        self.channels[channel_name] = frozenset()
+        self.group_owners[channel_name] = owner_address
+        self.group_invites[channel_name] = set()
+        self.accounting.update("channels", channel_name, None, 0)
+        self.accounting.update("group_owners", channel_name, None, 1)
+        self.accounting.update("group_invites", channel_name, None, 0)
+        self._add_member(channel_name, owner_address)
+        self.logger.debug(f"Group {channel_name} created")
+        return True, channel_name
+
+    @tracing.traced("storage.add_group_invites")
+    async def add_group_invites(self, channel_name: str, inviter_address: str, addresses: list[str]) -> tuple[bool, list[str] | str]:
+        """Store pending invites to a group channel; only the owner may invite.
+
+        Returns:
+            tuple[bool, list[str] | str]: (success, newly invited addresses or error message).
+        """
+        if channel_name not in self.group_owners:
+            return False, f"No such group: {channel_name}"
+        if self.group_owners[channel_name] != inviter_address:
+            return False, "Only the group owner can invite members"
+        for address in addresses:
+            if not utils.is_valid_address(address):
+                self.logger.warning(f"Invalid address for group: {address}")
+                return False, f"Invalid address: {address}"
+        members = self.channels[channel_name]
+        invites = self.group_invites[channel_name]
+        new_addresses = [a for a in dict.fromkeys(addresses) if a not in members and a not in invites]
+        if len(members) + len(invites) + len(new_addresses) > GROUP_MAX_MEMBERS:
+            return False, f"Too many group members (max {GROUP_MAX_MEMBERS})"
+        self.accounting.update("group_invites", channel_name, len(invites), len(invites) + len(new_addresses))
+        invites.update(new_addresses)
+        for address in new_addresses:
+            channels = self.invitations.setdefault(address, set())
+            self.accounting.update("invitations", address, len(channels) or None, len(channels) + 1)
+            channels.add(channel_name)
+        self.logger.debug(f"Invited {len(new_addresses)} addresses to group {channel_name}")
+        return True, new_addresses
+
+    @tracing.traced("storage.accept_group_invite")
+    async def accept_group_invite(self, channel_name: str, address: str) -> tuple[bool, str]:
+        """Turn a pending group invite into membership."""
+        if address not in self.group_invites.get(channel_name, ()):
+            return False, "No such group invite"
+        invites = self.group_invites[channel_name]
+        invites.discard(address)
+        self.accounting.update("group_invites", channel_name, len(invites) + 1, len(invites))
+        self._unindex_invite(channel_name, address)
+        self._add_member(channel_name, address)
+        self.logger.debug(f"Address {address} joined group {channel_name}")
+        return True, f"Joined group {channel_name}"
+
+    async def reject_group_invite(self, channel_name: str, address: str) -> tuple[bool, str]:
+        """Drop a pending group invite."""
+        if address not in self.group_invites.get(channel_name, ()):
+            return False, "No such group invite"
+        invites = self.group_invites[channel_name]
+        invites.discard(address)
+        self.accounting.update("group_invites", channel_name, len(invites) + 1, len(invites))
+        self._unindex_invite(channel_name, address)
+        return True, f"Group invite {channel_name} rejected"
+
+    @tracing.traced("storage.remove_group_member")
+    async def remove_group_member(self, channel_name: str, address: str) -> tuple[bool, str]:
+        """Remove an address from a group channel, deleting the group once it is empty."""
+        if channel_name not in self.group_owners:
+            return False, f"No such group: {channel_name}"
+        if not self._remove_member(channel_name, address):
+            return False, "Not a group member"
+        if not self.channels[channel_name]:
+            await self.delete_channel(channel_name)
+            self.logger.debug(f"Group {channel_name} deleted")
+        elif self.group_owners[channel_name] == address:
+            # Hand ownership to a remaining member so invites stay possible
+            self.group_owners[channel_name] = min(self.channels[channel_name])
+        return True, f"Left group {channel_name}"
+
+    def is_participant(self, channel_name: str, address: str) -> bool:
+        """Check if the address may use the channel.
+
+        Group membership is looked up in the channel's member set; direct
+        channels are checked against the addresses encoded in their name.
+        """
+        if utils.is_group_channel(channel_name):
+            return address in self.channels.get(channel_name, ())
+        return utils.is_channel_participant(channel_name, address)
+
     async def channel_exists(self, channel_name: str) -> bool:
         """Check if a channel exists.
 
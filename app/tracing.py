@@ -0,0 +1,152 @@
+# app/tracing.py
+import asyncio
+import collections
+import contextvars
+import functools
+import json
+import os
+import random
+import time
+from app import utils
+
+TRACE_SAMPLE_RATE = float(os.getenv("W3CHAT_TRACE_SAMPLE_RATE", "0"))
+TRACE_BATCH_SIZE = 512  # Spans written per exporter batch
+TRACE_RESERVOIR_SIZE = 4096  # Recent durations kept per stage for percentiles
+
+_current_span = contextvars.ContextVar("w3chat_current_span", default=None)
+
+class Span:
+    """A timed stage of a traced frame; the current span is held in a context variable."""
+    __slots__ = ("tracer", "trace_id", "span_id", "parent_id", "name", "attributes", "start", "_token")
+
+    def __init__(self, tracer, trace_id: str, parent_id: str | None, name: str, attributes: dict):
+        self.tracer = tracer
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.name = name
+        self.attributes = attributes
+        self.start = 0
+
+    def __enter__(self):
+        self.start = time.time_ns()
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        end = time.time_ns()
+        _current_span.reset(self._token)
+        self.tracer.exporter.export(self, end)
+        return False
+
+class _NoopSpan:
+    """Stand-in used when the frame is not sampled."""
+    attributes = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+NOOP_SPAN = _NoopSpan()
+
+class BatchExporter:
+    """Buffers finished spans and appends them to a JSON-lines file in batches.
+
+    Records follow the OTLP span field names so a local collector can ingest
+    them. Durations are also kept per stage for percentile reports.
+    """
+    def __init__(self, path: str | None = None, batch_size: int = TRACE_BATCH_SIZE):
+        self.path = path or utils.join_paths(utils.get_data_path(), 'traces', 'spans.jsonl')
+        self.batch_size = batch_size
+        self.buffer = []
+        self.durations = {}  # span name -> deque of recent durations in nanoseconds
+
+    def export(self, span: Span, end: int) -> None:
+        """Record a finished span."""
+        stage = self.durations.get(span.name)
+        if stage is None:
+            stage = self.durations[span.name] = collections.deque(maxlen=TRACE_RESERVOIR_SIZE)
+        stage.append(end - span.start)
+        self.buffer.append({
+            "traceId": span.trace_id,
+            "spanId": span.span_id,
+            "parentSpanId": span.parent_id or "",
+            "name": span.name,
+            "startTimeUnixNano": span.start,
+            "endTimeUnixNano": end,
+            "attributes": span.attributes,
+        })
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """Write buffered spans, off the event loop when one is running."""
+        batch, self.buffer = self.buffer, []
+        if not batch:
+            return
+        try:
+            asyncio.get_running_loop().run_in_executor(None, self._write, batch)
+        except RuntimeError:
+            self._write(batch)
+
+    def _write(self, batch: list[dict]) -> None:
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, "a") as f:
+            for record in batch:
+                f.write(json.dumps(record) + "\n")
+
+    def percentiles(self) -> dict:
+        """Return p50/p90/p99 durations in milliseconds per stage."""
+        report = {}
+        for name, durations in self.durations.items():
+            ordered = sorted(durations)
+            pick = lambda q: round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] / 1e6, 3)
+            report[name] = {"count": len(ordered), "p50_ms": pick(0.5), "p90_ms": pick(0.9), "p99_ms": pick(0.99)}
+        return report
+
+class Tracer:
+    """Starts sampled traces and child spans.
+
+    Unsampled frames get NOOP_SPAN everywhere, so the cost of tracing a frame
+    that is not sampled is one random() call plus a context variable lookup per
+    instrumented stage.
+    """
+    def __init__(self, exporter: BatchExporter, sample_rate: float = TRACE_SAMPLE_RATE):
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+
+    def trace(self, name: str, **attributes):
+        """Start a new trace for an inbound frame if it is sampled."""
+        if self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            return NOOP_SPAN
+        return Span(self, os.urandom(16).hex(), None, name, attributes)
+
+    def span(self, name: str, **attributes):
+        """Start a child span of the current span, if any."""
+        return self.child(_current_span.get(), name, **attributes)
+
+    def child(self, parent: Span | None, name: str, **attributes):
+        """Start a child span of the given span, for work done outside the span's context."""
+        if parent is None:
+            return NOOP_SPAN
+        return Span(self, parent.trace_id, parent.span_id, name, attributes)
+
+def current_span() -> Span | None:
+    """Return the span of the sampled trace being handled, if any."""
+    return _current_span.get()
+
+def traced(name: str):
+    """Decorate an async function so calls inside a sampled trace get their own span."""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            if _current_span.get() is None:
+                return await func(*args, **kwargs)
+            with tracer.span(name):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+tracer = Tracer(BatchExporter())
@@ -0,0 +1,94 @@
+# app/transports.py
+import asyncio
+import json
+import time
+import uuid
+from app import utils
+
+POLL_TIMEOUT = 25.0  # seconds a long-poll request waits for frames
+SSE_KEEPALIVE = 15.0  # seconds between SSE comments on an idle stream
+SESSION_IDLE_TIMEOUT = 60.0  # seconds without a poll or open stream before a session is closed
+SEND_MAX_FRAMES = 100  # frames accepted per batched POST
+QUEUE_MAX_FRAMES = 1000  # frames buffered per session, oldest dropped first
+
+class HttpConnection:
+    """An HTTP client session registered in Storage.connections like a WebSocket.
+
+    Handlers and fan-out write to it through send_json/send_text; frames are
+    queued as encoded text until the client collects them, all at once, from
+    a long-poll response or an SSE stream.
+    """
+    def __init__(self, address: str, max_frames: int = QUEUE_MAX_FRAMES):
+        self.session_id = uuid.uuid4().hex
+        self.address = address
+        self.max_frames = max_frames
+        self.frames = []
+        self.streaming = False  # True while an SSE stream is attached
+        self.last_seen = time.monotonic()
+        self.dropped = 0
+        self._ready = asyncio.Event()
+
+    async def send_text(self, payload: str) -> None:
+        """Queue an encoded frame."""
+        if len(self.frames) >= self.max_frames:
+            self.frames.pop(0)
+            self.dropped += 1
+        self.frames.append(payload)
+        self._ready.set()
+
+    async def send_json(self, message: dict) -> None:
+        """Encode and queue a frame."""
+        await self.send_text(json.dumps(message, separators=(",", ":"), ensure_ascii=False))
+
+    async def collect(self, timeout: float) -> list[str]:
+        """Wait up to timeout for frames, then take every queued frame."""
+        self.last_seen = time.monotonic()
+        if not self.frames:
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        frames, self.frames = self.frames, []
+        self._ready.clear()
+        self.last_seen = time.monotonic()
+        return frames
+
+class HttpSessions:
+    """Open HTTP sessions by id, closing those the client has abandoned."""
+    def __init__(self, idle_timeout: float = SESSION_IDLE_TIMEOUT):
+        self.idle_timeout = idle_timeout
+        self.sessions = {}  # session id -> HttpConnection
+        self._reaper_task = None
+        self.logger = utils.get_logger(__name__)
+
+    def open(self, address: str, close) -> HttpConnection:
+        """Create a session; close(connection) is awaited when it is reaped."""
+        connection = HttpConnection(address)
+        self.sessions[connection.session_id] = connection
+        if self._reaper_task is None:
+            self._reaper_task = asyncio.create_task(self._reap(close))
+        return connection
+
+    def get(self, session_id: str, address: str) -> HttpConnection | None:
+        """Return the session if it exists and belongs to the address."""
+        connection = self.sessions.get(session_id)
+        if connection is None or connection.address != address:
+            return None
+        return connection
+
+    def remove(self, session_id: str) -> HttpConnection | None:
+        """Forget a session."""
+        return self.sessions.pop(session_id, None)
+
+    async def _reap(self, close) -> None:
+        try:
+            while self.sessions:
+                await asyncio.sleep(min(self.idle_timeout, 10.0))
+                now = time.monotonic()
+                for connection in list(self.sessions.values()):
+                    if not connection.streaming and now - connection.last_seen > self.idle_timeout:
+                        self.remove(connection.session_id)
+                        await close(connection)
+                        self.logger.debug(f"Closed idle HTTP session of {connection.address}")
+        finally:
+            self._reaper_task = None
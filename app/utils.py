@@ -14,8 +14,12 @@ from pydantic import BaseModel
 
 # Constants
 W3 = Web3()
-TOKEN_EXPIRE_MINUTES = 300
+TOKEN_EXPIRE_MINUTES = 15  # Short-lived access token, renewed over the open WebSocket
+REFRESH_TOKEN_EXPIRE_MINUTES = 7 * 24 * 60
+ACCESS_TOKEN = "access"
+REFRESH_TOKEN = "refresh"
 ALGORITHM = "HS256"
+GROUP_PREFIX = "group"
 SECRET_KEY = None  # Initialize to None, set below
 LOGGER_PREFIX = "w3chat"
 
@@ -25,6 +29,9 @@ class AuthRequest(BaseModel):
     message: str
     signature: str
 
+class RefreshRequest(BaseModel):
+    refresh_token: str
+
 def set_environment_variable(name: str, value: str) -> None:
     """Set an environment variable."""
     os.environ[name] = value
@@ -72,8 +79,18 @@ def get_secret_key() -> str:
         raise ValueError("SECRET_KEY not found in secret data")
     return secret_key
 
-# Initialize SECRET_KEY at module load
+def get_admin_addresses() -> set[str]:
+    """Get lowercased admin addresses from secret data, empty if not configured."""
+    secret_data = get_secret_data()
+    return {address.lower() for address in secret_data.get('ADMIN_ADDRESSES', [])}
+
+def is_admin(address: str) -> bool:
+    """Check if the address may use admin endpoints."""
+    return address.lower() in ADMIN_ADDRESSES
+
+# Initialize SECRET_KEY and admin addresses at module load
 SECRET_KEY = get_secret_key()
+ADMIN_ADDRESSES = get_admin_addresses()
 
 def verify_signature(auth: AuthRequest) -> tuple[bool, str]:
     """Verify the signature in AuthRequest, return (success, message)."""
@@ -89,27 +106,31 @@ def verify_signature(auth: AuthRequest) -> tuple[bool, str]:
     except Exception as e:
         return False, f"Signature verification failed: {str(e)}"
 
-def generate_jwt(address: str) -> tuple[bool, str]:
-    """Generate JWT for the given address, return (success, token or message)."""
+def generate_jwt(address: str, token_type: str = ACCESS_TOKEN) -> tuple[bool, str]:
+    """Generate JWT of the given type for the address, return (success, token or message)."""
     try:
         if not is_valid_address(address):
             return False, "Invalid Ethereum address"
+        expire_minutes = REFRESH_TOKEN_EXPIRE_MINUTES if token_type == REFRESH_TOKEN else TOKEN_EXPIRE_MINUTES
         payload = {
             "sub": address,
-            "exp": datetime.utcnow() + timedelta(minutes=TOKEN_EXPIRE_MINUTES)
+            "typ": token_type,
+            "exp": datetime.utcnow() + timedelta(minutes=expire_minutes)
         }
         token = jwt.encode(payload, SECRET_KEY, algorithm=ALGORITHM)
         return True, token
     except Exception as e:
         return False, f"JWT generation failed: {str(e)}"
 
-def decode_jwt(token: str) -> tuple[bool, str]:
-    """Decode JWT and return (success, address or message)."""
+def decode_jwt(token: str, token_type: str = ACCESS_TOKEN) -> tuple[bool, str]:
+    """Decode JWT of the given type and return (success, address or message)."""
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         address = payload.get("sub")
         if address is None:
             return False, "Invalid token: missing 'sub' field"
+        if payload.get("typ", ACCESS_TOKEN) != token_type:
+            return False, f"Invalid token: expected {token_type} token"
         return True, address
     except JWTError as e:
         return False, f"JWT verification failed: {str(e)}"
@@ -186,6 +207,14 @@ def generate_channel_name(address_1: str, address_2: str) -> str:
     sorted_addresses = sorted([address_1, address_2])
     return f"{sorted_addresses[0]}:{sorted_addresses[1]}"
 
+def generate_group_name() -> str:
+    """Generate a unique name for a group channel."""
+    return f"{GROUP_PREFIX}:{uuid.uuid4().hex}"
+
+def is_group_channel(channel_name: str) -> bool:
+    """Check if the channel name refers to a group channel."""
+    return isinstance(channel_name, str) and channel_name.startswith(f"{GROUP_PREFIX}:")
+
 def is_channel_participant(channel_name: str, address: str) -> bool:
     """Check if the address is a participant in the channel.
 
@@ -219,4 +248,17 @@ def is_valid_channel_name(channel_name: str) -> bool:
     """
     # Channel names should be in the format address1:address2
     pattern = r"^0x[a-fA-F0-9]{40}:0x[a-fA-F0-9]{40}$"
+    return bool(re.match(pattern, channel_name))
+
+def is_valid_group_name(channel_name: str) -> bool:
+    """Check if the given group channel name is valid.
+
+    Args:
+        channel_name: The name of the group channel to validate.
+
+    Returns:
+        bool: True if the group channel name is valid, False otherwise.
+    """
+    # Group channel names should be in the format group:<32 hex characters>
+    pattern = rf"^{GROUP_PREFIX}:[a-f0-9]{{32}}$"
     return bool(re.match(pattern, channel_name))
\ No newline at end of file
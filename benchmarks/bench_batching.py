@@ -0,0 +1,81 @@
+# benchmarks/bench_batching.py
+"""Benchmark outbound micro-batching over a real uvicorn WebSocket.
+
+A server thread pushes bursts of channel messages to one socket through
+outbound.OutboundSocket, the way fan-out does on a busy channel, and a
+websockets client reads them. Transport writes made by the server thread are
+counted; each is at most one send syscall. Run from the project root:
+
+    MODE=testing python -m benchmarks.bench_batching [messages] [size]
+"""
+import asyncio
+import json
+import sys
+import threading
+import time
+import uvicorn
+import websockets
+from asyncio import selector_events
+from fastapi import FastAPI, WebSocket
+from app import outbound
+
+PORT = 8765
+BURST = 50  # messages produced together, like one busy channel tick
+
+app = FastAPI()
+writes = {"count": 0}
+server_thread = None
+
+original_write = selector_events._SelectorSocketTransport.write
+
+def counting_write(self, data):
+    if threading.current_thread() is server_thread:
+        writes["count"] += 1
+    return original_write(self, data)
+
+selector_events._SelectorSocketTransport.write = counting_write
+
+@app.websocket("/burst")
+async def burst(websocket: WebSocket, messages: int, size: int):
+    batch = outbound.BATCH_SUBPROTOCOL in websocket.scope.get("subprotocols", ())
+    await websocket.accept(subprotocol=outbound.BATCH_SUBPROTOCOL if batch else None)
+    connection = outbound.OutboundSocket(websocket, batch=batch)
+    payload = json.dumps({"type": "message", "channel": "bench", "data": "x" * size})
+    for start in range(0, messages, BURST):
+        await asyncio.gather(*(connection.send_text(payload) for _ in range(min(BURST, messages - start))))
+        await asyncio.sleep(0)
+    await connection.send_text('{"type":"done"}')
+    await websocket.receive_text()
+
+async def receive(messages: int, size: int, batch: bool) -> tuple[float, int]:
+    subprotocols = [outbound.BATCH_SUBPROTOCOL] if batch else None
+    async with websockets.connect(f"ws://127.0.0.1:{PORT}/burst?messages={messages}&size={size}",
+                                  subprotocols=subprotocols, max_size=None) as ws:
+        received = 0
+        writes["count"] = 0
+        start = time.perf_counter()
+        while True:
+            frames = json.loads(await ws.recv())
+            frames = frames if isinstance(frames, list) else [frames]
+            received += sum(frame["type"] == "message" for frame in frames)
+            if frames[-1]["type"] == "done":
+                break
+        elapsed = time.perf_counter() - start
+        await ws.send("bye")
+    assert received == messages
+    return elapsed, writes["count"]
+
+if __name__ == "__main__":
+    messages = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    sizes = [int(sys.argv[2])] if len(sys.argv) > 2 else [100, 1000, 12000]
+    server = uvicorn.Server(uvicorn.Config(app, port=PORT, loop="asyncio", ws="websockets-sansio", log_level="warning"))
+    server_thread = threading.Thread(target=server.run, daemon=True)
+    server_thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    for size in sizes:
+        for batch in (False, True):
+            elapsed, count = asyncio.run(receive(messages, size, batch))
+            print(f"data={size:>5} {'batched' if batch else 'plain  '}: {messages / elapsed:>9.0f} msg/s, "
+                  f"{count / messages:.3f} writes/msg")
+    server.should_exit = True
@@ -0,0 +1,60 @@
+# benchmarks/bench_group_fanout.py
+"""Benchmark fan-out of channel messages to large group channels.
+
+Run from the project root:
+
+    MODE=testing python -m benchmarks.bench_group_fanout [members] [messages]
+"""
+import asyncio
+import sys
+import time
+from app.routers import websocket
+
+class CountingSocket:
+    """In-memory stand-in for a WebSocket that only counts frames."""
+    def __init__(self):
+        self.frames = 0
+
+    async def send_text(self, data: str) -> None:
+        self.frames += 1
+
+    async def send_json(self, data: dict) -> None:
+        self.frames += 1
+
+async def run(members: int, messages: int) -> None:
+    store = websocket.store
+    owner = f"0x{0:040x}"
+    addresses = [f"0x{i:040x}" for i in range(1, members)]
+    sockets = []
+    for address in [owner, *addresses]:
+        ws = CountingSocket()
+        sockets.append(ws)
+        await store.add_connection(address, ws)
+    success, group_name = await store.create_group(owner)
+    assert success, group_name
+    success, invited = await store.add_group_invites(group_name, owner, addresses)
+    assert success, invited
+    for address in invited:
+        await store.accept_group_invite(group_name, address)
+
+    # Membership checks are set lookups regardless of group size
+    start = time.perf_counter()
+    for _ in range(messages):
+        store.is_participant(group_name, addresses[-1])
+    check_elapsed = time.perf_counter() - start
+
+    message = {"type": "message", "from": owner, "channel": group_name, "data": "x" * 200}
+    start = time.perf_counter()
+    for _ in range(messages):
+        await websocket.send_to_subscribers(store.channels[group_name], message)
+    elapsed = time.perf_counter() - start
+
+    frames = sum(ws.frames for ws in sockets)
+    print(f"members={members} messages={messages}")
+    print(f"membership check: {check_elapsed / messages * 1e9:.0f} ns/check")
+    print(f"fan-out: {elapsed / messages * 1e3:.3f} ms/message, {frames / elapsed:,.0f} frames/s")
+
+if __name__ == "__main__":
+    members = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    messages = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    asyncio.run(run(members, messages))
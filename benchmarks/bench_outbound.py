@@ -0,0 +1,54 @@
+# benchmarks/bench_outbound.py
+"""Benchmark pong latency on a socket saturated with large channel messages.
+
+A fake socket writes at a fixed bandwidth. Message senders flood it with
+12000-character frames while pings arrive every few milliseconds; the time
+from sending each pong to it being written is measured with writes in
+arrival order and with the outbound control and bulk lanes. Run from the
+project root:
+
+    MODE=testing python -m benchmarks.bench_outbound [messages]
+"""
+import asyncio
+import json
+import statistics
+import sys
+import time
+from app import outbound
+
+BANDWIDTH = 20 * 1024 * 1024  # bytes per second the fake socket can write
+
+class ThrottledSocket:
+    """Writes one frame at a time at BANDWIDTH and records when pongs leave."""
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.pongs = []
+
+    async def send_text(self, payload: str) -> None:
+        async with self.lock:
+            await asyncio.sleep(len(payload) / BANDWIDTH)
+            if outbound.frame_type(payload) == "pong":
+                self.pongs.append(time.perf_counter())
+
+async def run(messages: int, lanes: bool) -> list[float]:
+    socket = ThrottledSocket()
+    connection = outbound.OutboundSocket(socket, bulk_max_frames=messages) if lanes else socket
+    payload = json.dumps({"type": "message", "data": "x" * 12000})
+    senders = [asyncio.create_task(connection.send_text(payload)) for _ in range(messages)]
+    sent = []
+    for _ in range(20):
+        await asyncio.sleep(0.005)
+        sent.append(time.perf_counter())
+        senders.append(asyncio.create_task(connection.send_text('{"type":"pong"}')))
+    await asyncio.gather(*senders)
+    # Queued frames are written after their senders return
+    while len(socket.pongs) < len(sent):
+        await asyncio.sleep(0.001)
+    return [(written - start) * 1000 for start, written in zip(sent, socket.pongs)]
+
+if __name__ == "__main__":
+    messages = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    for lanes in (False, True):
+        latencies = asyncio.run(run(messages, lanes))
+        print(f"{'lanes' if lanes else 'fifo':>5}: pong latency median {statistics.median(latencies):.2f} ms, "
+              f"max {max(latencies):.2f} ms over {len(latencies)} pongs behind {messages} messages")
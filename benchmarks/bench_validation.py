@@ -0,0 +1,50 @@
+# benchmarks/bench_validation.py
+"""Benchmark per-frame decode and validation cost.
+
+Compares the previous json.loads plus hand-written checks of process_channel
+with a single schemas.decode call. Run from the project root:
+
+    MODE=testing python -m benchmarks.bench_validation [frames]
+"""
+import json
+import sys
+import time
+from app import schemas
+
+CHANNEL = "0x1234567890abcdef1234567890abcdef12345678:0xabcdef1234567890abcdef1234567890abcdef12"
+
+def manual(text: str) -> bool:
+    """The decode and structural checks done before schemas existed."""
+    data = json.loads(text)
+    message_type = data.get("type")
+    if not message_type:
+        return False
+    channel_name = data.get("channel")
+    data_content = data.get("data")
+    client_msg_id = data.get("client_msg_id")
+    if not isinstance(data_content, str) or len(data_content) > 12000:
+        return False
+    if not channel_name or not data_content:
+        return False
+    if client_msg_id is not None and not (isinstance(client_msg_id, str) and 0 < len(client_msg_id) <= 64):
+        return False
+    return True
+
+def compiled(text: str) -> bool:
+    return schemas.decode(text)[0]
+
+def run(check, frames: list[str], rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for text in frames:
+            check(text)
+    return (time.perf_counter() - start) / (rounds * len(frames)) * 1e6
+
+if __name__ == "__main__":
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    for size in (20, 1000, 12000):
+        frames = [json.dumps({"type": "channel", "channel": CHANNEL, "data": "x" * size, "client_msg_id": f"id-{i}"})
+                  for i in range(10)]
+        assert all(manual(text) and compiled(text) for text in frames)
+        print(f"data={size:>5} chars: manual {run(manual, frames, rounds // 10):.2f} us/frame, "
+              f"compiled {run(compiled, frames, rounds // 10):.2f} us/frame")
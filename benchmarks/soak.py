@@ -0,0 +1,207 @@
+# benchmarks/soak.py
+"""Long-running soak test with leak and memory-growth detection.
+
+Simulated clients repeatedly connect, request channels, approve or reject
+requests, send messages and disconnect, all in-process through the real
+handlers. Storage structure sizes and tracemalloc totals are sampled every
+interval; once the warm-up is over the first sample becomes the baseline and
+every later sample must stay within the configured bounds. After the run
+every client is disconnected and per-connection state must drain to zero.
+
+Run from the project root, for example for two hours:
+
+    MODE=testing python -m benchmarks.soak --duration 7200 --interval 60
+"""
+import argparse
+import asyncio
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from app import schemas, search, utils
+from app.routers import websocket
+
+# Allocations by these files are expected to grow with message history and are not counted
+EXCLUDED_FILES = ("*/app/search.py", "*/tracemalloc.py", "<frozen importlib._bootstrap>")
+
+# Message bodies come from a fixed pool so the search postings stay bounded
+PAYLOADS = tuple("soak " * n for n in range(1, 51))
+
+class SoakSocket:
+    """In-memory stand-in for a WebSocket; counts frames and keeps nothing."""
+    def __init__(self):
+        self.frames = 0
+
+    async def send_text(self, payload: str) -> None:
+        self.frames += 1
+
+    async def send_json(self, message: dict) -> None:
+        self.frames += 1
+
+    def offer(self, payload: str) -> bool:
+        self.frames += 1
+        return True
+
+def structure_sizes() -> dict:
+    """Return the sizes of the server structures that must not drift."""
+    store = websocket.store
+    return {
+        "connections": sum(len(c) for c in store.connections.values()),
+        "channels": len(store.channels),
+        "channel_members": sum(len(m) for m in store.channels.values()),
+        "channel_requests": len(store.channel_requests),
+        "memberships": sum(len(c) for c in store.memberships.values()),
+        "request_index": sum(len(c) for c in store.request_index.values()),
+        "locks": len(store._locks),
+        "presence_subscriptions": len(websocket.presence_service.subscriptions),
+        "presence_pending": len(websocket.presence_service.pending),
+        "receipts_pending": len(websocket.receipts_service.pending),
+        "ephemeral_pending": len(websocket.ephemeral_lane.pending),
+    }
+
+def traced_bytes() -> tuple[int, tracemalloc.Snapshot]:
+    """Return traced memory outside the excluded files, with the snapshot it came from."""
+    snapshot = tracemalloc.take_snapshot().filter_traces(
+        [tracemalloc.Filter(False, pattern) for pattern in EXCLUDED_FILES]
+    )
+    return sum(stat.size for stat in snapshot.statistics("filename")), snapshot
+
+def soak_addresses(clients: int) -> list[str]:
+    """Return the simulated client addresses, disjoint from real ones in practice."""
+    return [f"0x{0x50ac << 144 | i:040x}" for i in range(clients)]
+
+async def send(socket: SoakSocket, address: str, frame: dict) -> None:
+    success, data = schemas.validate(frame)
+    assert success, data
+    await websocket.dispatch(socket, data, address)
+
+async def client(address: str, online: dict, deadline: float, rng: random.Random) -> int:
+    """Churn one simulated client until the deadline, return the number of sessions."""
+    sessions = 0
+    while time.monotonic() < deadline:
+        socket = SoakSocket()
+        await websocket.connect(address, socket)
+        online[address] = socket
+        sessions += 1
+
+        peers = [peer for peer in online if peer != address]
+        if peers:
+            peer = rng.choice(peers)
+            channel_name = utils.generate_channel_name(address, peer)
+            await send(socket, address, {"type": "channel_request", "to": peer})
+            if channel_name in websocket.store.channel_requests and peer in online:
+                action = "channel_approve" if rng.random() < 0.3 else "channel_reject"
+                await send(online[peer], peer, {"type": action, "channel": channel_name})
+
+        for channel_name in list(websocket.store.memberships.get(address, ()))[:3]:
+            await send(socket, address, {"type": "channel", "channel": channel_name, "data": rng.choice(PAYLOADS)})
+            await send(socket, address, {"type": "ephemeral", "channel": channel_name, "event": "typing"})
+        await send(socket, address, {"type": "presence_subscribe", "addresses": []})
+        await asyncio.sleep(rng.uniform(0, 0.01))
+
+        # Pending requests to this address are dropped like a client would on logout
+        inbound, _ = websocket.store.get_channel_requests(address)
+        for request in inbound:
+            await send(socket, address, {"type": "channel_reject", "channel": request["channel"]})
+        online.pop(address, None)
+        await websocket.disconnect(address, socket)
+        await asyncio.sleep(rng.uniform(0, 0.01))
+    return sessions
+
+async def soak(duration: float, interval: float, clients: int = 20, warmup: float = 0.3,
+               max_growth_bytes: int = 2 * 1024 * 1024, tolerance: float = 0.1, seed: int = 0,
+               traceback_limit: int = 1) -> dict:
+    """Run the soak and return its report; raise AssertionError on drift or leftovers.
+
+    Args:
+        duration: Seconds of churn.
+        interval: Seconds between samples.
+        clients: Number of simulated addresses, which bounds the number of channels.
+        warmup: Fraction of the duration before the baseline sample.
+        max_growth_bytes: Allowed traced memory growth over the baseline.
+        tolerance: Allowed relative growth of each structure over the baseline.
+        traceback_limit: Frames kept per allocation, raise it to see where growth comes from.
+    """
+    # Messages are indexed into a throwaway directory instead of the data path
+    search_directory = tempfile.TemporaryDirectory()
+    saved_index, websocket.search_index = websocket.search_index, search.SearchIndex(search_directory.name)
+    try:
+        return await _soak(duration, interval, clients, warmup, max_growth_bytes, tolerance, seed, traceback_limit)
+    finally:
+        await websocket.search_index.flush()
+        websocket.search_index = saved_index
+        search_directory.cleanup()
+
+async def _soak(duration, interval, clients, warmup, max_growth_bytes, tolerance, seed, traceback_limit) -> dict:
+    rng = random.Random(seed)
+    addresses = soak_addresses(clients)
+    online = {}
+    pairs = clients * (clients - 1) // 2
+    initial = structure_sizes()
+    bounds = {name: initial[name] + pairs * (1 if name == "channels" else 2)
+              for name in ("channels", "channel_members", "memberships")}
+    deadline = time.monotonic() + duration
+    tracemalloc.start(traceback_limit)
+    tasks = [asyncio.create_task(client(address, online, deadline, random.Random(rng.random()))) for address in addresses]
+
+    samples = []
+    baseline = None
+    failures = []
+    warmup_end = time.monotonic() + duration * warmup
+    while time.monotonic() < deadline:
+        await asyncio.sleep(min(interval, max(0.0, deadline - time.monotonic())))
+        memory, snapshot = traced_bytes()
+        sizes = structure_sizes()
+        samples.append({"memory": memory, **sizes})
+        if time.monotonic() < warmup_end:
+            continue
+        if baseline is None:
+            baseline = (memory, sizes, snapshot)
+            continue
+        if memory > baseline[0] + max_growth_bytes:
+            top = snapshot.compare_to(baseline[2], "lineno")[:5]
+            failures.append(f"traced memory grew by {memory - baseline[0]} bytes; top growth: " + "; ".join(map(str, top)))
+        for name, size in sizes.items():
+            # Channels legitimately accumulate until every pair has one
+            limit = bounds.get(name, baseline[1][name] * (1 + tolerance) + clients)
+            if size > limit:
+                failures.append(f"{name} grew from {baseline[1][name]} to {size}")
+
+    sessions = sum(await asyncio.gather(*tasks))
+    # Let coalescing windows close so pending state can drain
+    await asyncio.sleep(max(websocket.presence_service.window, websocket.receipts_service.window,
+                            websocket.ephemeral_lane.window) + 0.1)
+    final = structure_sizes()
+    top = tracemalloc.take_snapshot().statistics("traceback" if traceback_limit > 1 else "lineno")[:10]
+    tracemalloc.stop()
+    for name in ("connections", "channel_requests", "request_index", "presence_subscriptions",
+                 "presence_pending", "receipts_pending", "ephemeral_pending"):
+        if final[name] > initial[name]:
+            failures.append(f"{name} not drained after disconnect: {final[name]} (was {initial[name]})")
+
+    report = {"sessions": sessions, "samples": samples, "final": final, "top": top, "failures": failures}
+    assert not failures, "\n".join(failures)
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--duration", type=float, default=600.0)
+    parser.add_argument("--interval", type=float, default=30.0)
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--max-growth-mb", type=float, default=8.0)
+    parser.add_argument("--tolerance", type=float, default=0.1)
+    parser.add_argument("--traceback-limit", type=int, default=1)
+    args = parser.parse_args()
+    try:
+        report = asyncio.run(soak(args.duration, args.interval, args.clients,
+                                  max_growth_bytes=int(args.max_growth_mb * 1024 * 1024), tolerance=args.tolerance,
+                                  traceback_limit=args.traceback_limit))
+    except AssertionError as e:
+        print(f"FAILED\n{e}")
+        sys.exit(1)
+    for sample in report["samples"]:
+        print(sample)
+    for stat in report["top"]:
+        print(stat)
+    print(f"OK: {report['sessions']} sessions, final {report['final']}")
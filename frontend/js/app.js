@@ -12,6 +12,13 @@ let userAddress = null;
 let activeContent = "channels"; // Default to channels when authenticated
 let selectedChannel = null; // No channel selected initially
 let ws = null; // WebSocket connection
+let renewInterval = null; // Access token renewal timer
+const TOKEN_RENEW_INTERVAL = 10 * 60 * 1000; // Renew before the 15 minute access token expires
+const BATCH_PROTOCOL = "w3chat.batch"; // WebSocket subprotocol for batched delivery
+let lastSeq = {}; // Highest message sequence number received per channel
+let lastTypingSent = 0; // Time the last typing event was sent
+let typingTimeout = null; // Clears the peer typing indicator
+const TYPING_INTERVAL = 2000; // Send typing events at most this often
 
 // Generate color based on address hash
 const colors = [
@@ -106,7 +113,8 @@ function updateContentUI() {
 function connectWebSocket(token) {
     return new Promise((resolve, reject) => {
         console.log("Connecting to WebSocket...");
-        ws = new WebSocket(`ws://${window.location.host}/ws/chat?token=${token}`);
+        // Opt in to batched delivery: bursts arrive as one JSON array frame
+        ws = new WebSocket(`ws://${window.location.host}/ws/chat?token=${token}`, BATCH_PROTOCOL);
 
         const timeout = setTimeout(() => {
             console.log("WebSocket connection timed out after 3 seconds");
@@ -117,6 +125,8 @@ function connectWebSocket(token) {
         ws.onopen = () => {
             console.log("WebSocket connected");
             clearTimeout(timeout); // Clear timeout on success
+            clearInterval(renewInterval);
+            renewInterval = setInterval(renewToken, TOKEN_RENEW_INTERVAL);
             resolve();
         };
 
@@ -132,6 +142,7 @@ function connectWebSocket(token) {
 
         ws.onclose = () => {
             console.log("WebSocket disconnected");
+            clearInterval(renewInterval);
             ws = null;
             clearTimeout(timeout); // Clear timeout on close
             reject(new Error("WebSocket closed"));
@@ -142,32 +153,71 @@ function connectWebSocket(token) {
 function handleWebSocket(event) {
     console.log("WebSocket message received:", event.data);
     try {
-        const data = JSON.parse(event.data);
-        console.log("Parsed WebSocket message:", data);
-        switch (data.type) {
-            case "ack":
-                handleAck(data);
-                break;
-            case "channel_request":
-                handleChannelRequest(data);
-                break;
-            case "info":
-                handleInfo(data);
-                break;
-            case "message":
-                handleMessage(data);
-                break;
-            case "error":
-                handleError(data);
-                break;
-            default:
-                console.log("Unknown message type:", data.type);
-        }
+        const parsed = JSON.parse(event.data);
+        const frames = Array.isArray(parsed) ? parsed : [parsed];
+        frames.forEach(handleFrame);
     } catch (error) {
         console.log("Failed to parse WebSocket message:", error.message);
     }
 }
 
+function handleFrame(data) {
+    console.log("Parsed WebSocket message:", data);
+    switch (data.type) {
+        case "ack":
+            handleAck(data);
+            break;
+        case "channel_request":
+            handleChannelRequest(data);
+            break;
+        case "info":
+            handleInfo(data);
+            break;
+        case "message":
+            handleMessage(data);
+            break;
+        case "error":
+            handleError(data);
+            break;
+        case "token":
+            handleToken(data);
+            break;
+        case "sync":
+            handleSync(data);
+            break;
+        case "receipts":
+            handleReceipts(data);
+            break;
+        case "ephemeral":
+            handleEphemeral(data);
+            break;
+        default:
+            console.log("Unknown message type:", data.type);
+    }
+}
+
+function renewToken() {
+    const userData = localStorage.getItem("w3chat_user");
+    if (!userData || !ws || ws.readyState !== WebSocket.OPEN) {
+        return;
+    }
+    const w3chat_user = JSON.parse(userData);
+    if (w3chat_user.refresh) {
+        ws.send(JSON.stringify({ type: "renew", refresh_token: w3chat_user.refresh }));
+    }
+}
+
+function handleToken(data) {
+    const userData = localStorage.getItem("w3chat_user");
+    if (!userData) {
+        return;
+    }
+    const w3chat_user = JSON.parse(userData);
+    w3chat_user.jwt = data.token;
+    localStorage.setItem("w3chat_user", JSON.stringify(w3chat_user));
+    console.log("Access token renewed");
+}
+
 function handleAck(data) {
     console.log("Command acknowledged by server");
 }
@@ -240,6 +290,17 @@ function sendChannelAction(message, channel, requestItem) {
     updateWalletUI(); // Update UI to reflect notification status
 }
 
+function handleSync(data) {
+    console.log(`Sync: ${data.channels.length} channels, ${data.requests.inbound.length} pending requests`);
+    data.channels.forEach(channel => handleInfo({ type: "info", message: "Channel created", channel: channel }));
+    const notifications = JSON.parse(sessionStorage.getItem("w3chat_notifications") || "{}");
+    data.requests.inbound.forEach(request => {
+        if (!notifications[request.channel]) {
+            handleChannelRequest({ type: "channel_request", from: request.from, channel: request.channel });
+        }
+    });
+}
+
 function handleChannelRequest(data) {
     console.log(`Channel request from ${data.from} for channel ${data.channel}`);
     const notificationsList = document.getElementById("notifications-list");
@@ -345,6 +406,7 @@ function handleInfo(data) {
                     console.log(`Moved channel-messages-${data.channel} to chat-messages`);
                 }
             }
+            sendReceipt("read", data.channel);
             // Clear new messages for this channel
             const newMessages = JSON.parse(sessionStorage.getItem("w3chat_new_messages") || "{}");
             delete newMessages[data.channel];
@@ -400,6 +462,10 @@ function handleMessage(data) {
     messageDiv.textContent = `${data.data}`;
     messagesDiv.appendChild(messageDiv);
     scrollChatToBottom();
+    if (data.seq && data.from.toLowerCase() !== userAddress.toLowerCase()) {
+        lastSeq[data.channel] = Math.max(lastSeq[data.channel] || 0, data.seq);
+        sendReceipt(data.channel === selectedChannel && activeContent === "chat" ? "read" : "delivered", data.channel);
+    }
     // Save new message if not in the active channel
     if (data.channel !== selectedChannel || activeContent !== "chat") {
         const newMessages = JSON.parse(sessionStorage.getItem("w3chat_new_messages") || "{}");
@@ -419,6 +485,36 @@ function handleMessage(data) {
     }
 }
 
+function sendReceipt(type, channel) {
+    if (!lastSeq[channel] || !ws || ws.readyState !== WebSocket.OPEN) {
+        return;
+    }
+    ws.send(JSON.stringify({ type: type, channel: channel, seq: lastSeq[channel] }));
+}
+
+function handleReceipts(data) {
+    console.log(`Receipts in channel ${data.channel}: delivered ${JSON.stringify(data.delivered)}, read ${JSON.stringify(data.read)}`);
+}
+
+function sendTyping() {
+    const now = Date.now();
+    if (!selectedChannel || !ws || ws.readyState !== WebSocket.OPEN || now - lastTypingSent < TYPING_INTERVAL) {
+        return;
+    }
+    lastTypingSent = now;
+    ws.send(JSON.stringify({ type: "ephemeral", channel: selectedChannel, event: "typing" }));
+}
+
+function handleEphemeral(data) {
+    if (data.event !== "typing" || data.channel !== selectedChannel) {
+        return;
+    }
+    const elem_username = document.getElementById("user-info-username");
+    elem_username.classList.add("typing");
+    clearTimeout(typingTimeout);
+    typingTimeout = setTimeout(() => elem_username.classList.remove("typing"), TYPING_INTERVAL + 1000);
+}
+
 function handleError(data) {
     console.log("Error from server:", data.message);
 }
@@ -467,10 +563,9 @@ async function connectWallet() {
         const address = accounts[0];
         console.log(`Connected: ${address}`);
 
-        // Sign message
-        const timestamp = new Date().toISOString();
-        const nonce = crypto.randomUUID();
-        const message = `Sign this message to authenticate with w3chat: ${nonce} at ${timestamp}`;
+        // Sign the server's single-use challenge
+        const challenge = await fetch("/auth/nonce").then((response) => response.json());
+        const message = challenge.message;
         const signature = await window.ethereum.request({
             method: "personal_sign",
             params: [message, address]
@@ -487,7 +582,7 @@ async function connectWallet() {
 
         if (response.ok) {
             console.log("Authentication successful, JWT:", data.token);
-            localStorage.setItem("w3chat_user", JSON.stringify({ jwt: data.token, address: address }));
+            localStorage.setItem("w3chat_user", JSON.stringify({ jwt: data.token, refresh: data.refresh_token, address: address }));
             isAuthenticated = true;
             userAddress = address;
             activeContent = "channels";
@@ -520,6 +615,27 @@ function disconnectWallet() {
     updateContentUI();
 }
 
+async function refreshSession(w3chat_user) {
+    if (!w3chat_user.refresh) {
+        return false;
+    }
+    const response = await fetch("/auth/refresh", {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify({ refresh_token: w3chat_user.refresh })
+    });
+    if (!response.ok) {
+        console.log("Token refresh failed");
+        return false;
+    }
+    const data = await response.json();
+    w3chat_user.jwt = data.token;
+    w3chat_user.refresh = data.refresh_token;
+    localStorage.setItem("w3chat_user", JSON.stringify(w3chat_user));
+    console.log("Session refreshed");
+    return true;
+}
+
 async function checkExistingConnection() {
     if (!await checkWalletConnection()) {
         return;
@@ -542,8 +658,15 @@ async function checkExistingConnection() {
             localStorage.removeItem("w3chat_user");
             return;
         }
-        // Try to connect WebSocket
-        await connectWebSocket(w3chat_user.jwt);
+        // Try to connect WebSocket, refreshing an expired access token without a new signature
+        try {
+            await connectWebSocket(w3chat_user.jwt);
+        } catch (error) {
+            if (!await refreshSession(w3chat_user)) {
+                throw error;
+            }
+            await connectWebSocket(w3chat_user.jwt);
+        }
         isAuthenticated = true;
         userAddress = w3chat_user.address;
         activeContent = "channels";
@@ -586,7 +709,8 @@ function sendMessage() {
     const messageData = {
         type: "channel",
         channel: selectedChannel,
-        data: message
+        data: message,
+        client_msg_id: crypto.randomUUID() // Lets the server drop retried duplicates
     };
     ws.send(JSON.stringify(messageData));
     console.log(`Sent message to channel ${selectedChannel}: ${message}`);
@@ -651,5 +775,6 @@ document.addEventListener("DOMContentLoaded", () => {
                 sendMessage();
             }
         });
+        messageInput.addEventListener("input", sendTyping);
     }
 });
\ No newline at end of file
@@ -1,10 +1,29 @@
 # tests/conftest.py
 import pytest
+import pytest_asyncio
 import json
 from fastapi.testclient import TestClient
 from web3 import Web3
 from app.main import app
-from app import utils
+from app import utils, storage
+
+ADDRESS_1 = "0x1234567890abcdef1234567890abcdef12345678"
+ADDRESS_2 = "0xabcdef1234567890abcdef1234567890abcdef12"
+ADDRESS_3 = "0x9999999999999999999999999999999999999999"
+CHANNEL_1_2 = f"{ADDRESS_1}:{ADDRESS_2}"
+
+class Recorder:
+    """Collect frames published by a service in place of send_to_subscribers."""
+    def __init__(self):
+        self.sent = []
+
+    async def __call__(self, addresses, message: dict):
+        self.sent.append((sorted(addresses), message))
+
+    def offer(self, addresses, message: dict) -> int:
+        """Record a best-effort frame; nothing is dropped."""
+        self.sent.append((sorted(addresses), message))
+        return 0
 
 @pytest.fixture(autouse=True, scope="session")
 def set_testing_mode():
@@ -13,8 +32,9 @@ def set_testing_mode():
 
 @pytest.fixture(scope="session")
 def client():
-    """Provide a FastAPI test client."""
-    return TestClient(app)
+    """Provide a FastAPI test client sharing one event loop across connections."""
+    with TestClient(app) as test_client:
+        yield test_client
 
 @pytest.fixture(scope="session")
 def web3():
@@ -43,7 +63,7 @@ def user_account(web3):
 @pytest.fixture
 def user_1():
     """Generate address and JWT token for user 1."""
-    address = "0x1234567890abcdef1234567890abcdef12345678"
+    address = ADDRESS_1
     success, token = utils.generate_jwt(address)
     assert success, f"Failed to generate token: {token}"
     return {"address": address, "token": token}
@@ -51,7 +71,7 @@ def user_1():
 @pytest.fixture
 def user_2():
     """Generate address and JWT token for user 2."""
-    address = "0xabcdef1234567890abcdef1234567890abcdef12"
+    address = ADDRESS_2
     success, token = utils.generate_jwt(address)
     assert success, f"Failed to generate token: {token}"
     return {"address": address, "token": token}
@@ -65,18 +85,20 @@ def channel_name(user_1, user_2):
 def websocket_1(client, user_1):
     """Connect WebSocket client for user 1 and close after test."""
     with client.websocket_connect(f"/ws/chat?token={user_1['token']}") as ws:
+        assert ws.receive_json()["type"] == "sync"
         yield ws
 
 @pytest.fixture
 def websocket_2(client, user_2):
     """Connect WebSocket client for user 2 and close after test."""
     with client.websocket_connect(f"/ws/chat?token={user_2['token']}") as ws:
+        assert ws.receive_json()["type"] == "sync"
         yield ws
 
 @pytest.fixture
 def user_3():
     """Generate address and JWT token for user 3."""
-    address = "0x9999999999999999999999999999999999999999"
+    address = ADDRESS_3
     success, token = utils.generate_jwt(address)
     assert success, f"Failed to generate token: {token}"
     return {"address": address, "token": token}
@@ -85,6 +107,7 @@ def user_3():
 def websocket_3(client, user_3):
     """Connect WebSocket client for user 3 and close after test."""
     with client.websocket_connect(f"/ws/chat?token={user_3['token']}") as ws:
+        assert ws.receive_json()["type"] == "sync"
         yield ws
 
 @pytest.fixture
@@ -93,14 +116,33 @@ def store():
     from app.routers import websocket
     return websocket.store
 
+@pytest_asyncio.fixture
+async def channel_store():
+    """Return a fresh storage with ADDRESS_1 and ADDRESS_2 sharing a channel."""
+    channel_store = storage.Storage()
+    success, msg = await channel_store.ensure_channel(CHANNEL_1_2, [ADDRESS_1, ADDRESS_2])
+    assert success, f"Failed to ensure channel: {msg}"
+    return channel_store
+
+@pytest.fixture(autouse=True)
+def search_index(tmp_path, monkeypatch):
+    """Index messages sent during a test into a temporary directory instead of the data path."""
+    from app import search
+    from app.routers import websocket
+    index = search.SearchIndex(str(tmp_path / "search"))
+    monkeypatch.setattr(websocket, "search_index", index)
+    return index
+
 @pytest.fixture
 def websocket_1_2(client, user_1):
     """Fixture to create a second WebSocket connection for user_1."""
     with client.websocket_connect(f"/ws/chat?token={user_1['token']}") as ws:
+        assert ws.receive_json()["type"] == "sync"
         yield ws
 
 @pytest.fixture
 def websocket_2_2(client, user_2):
     """Fixture to create a second WebSocket connection for user_2."""
     with client.websocket_connect(f"/ws/chat?token={user_2['token']}") as ws:
+        assert ws.receive_json()["type"] == "sync"
         yield ws
\ No newline at end of file
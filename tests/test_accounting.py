@@ -0,0 +1,86 @@
+import pytest
+from app import accounting, storage, utils
+
+ADDRESSES = [f"0x{i:040x}" for i in range(1, 41)]
+
+def actual(store: storage.Storage) -> tuple[dict, dict]:
+    """Return entry and element counts by walking the structures."""
+    entries, elements = {}, {}
+    for name in accounting.VALUE_BYTES:
+        values = getattr(store, name).values()
+        entries[name] = len(values)
+        elements[name] = sum(1 if isinstance(v, (str, int, dict)) else len(v) for v in values)
+    return entries, elements
+
+@pytest.fixture
+def admin_token(user_1, monkeypatch):
+    """Make user_1 an admin and return its token."""
+    monkeypatch.setattr(utils, "ADMIN_ADDRESSES", {user_1["address"].lower()})
+    return user_1["token"]
+
+@pytest.mark.asyncio
+async def test_counters_follow_every_change():
+    """Test that incremental counters match the structures through adds and removals."""
+    store = storage.Storage()
+    sockets = [object() for _ in range(6)]
+    for i, socket in enumerate(sockets):
+        await store.add_connection(ADDRESSES[i % 2], socket)
+    for i in range(1, 20):
+        channel_name = utils.generate_channel_name(ADDRESSES[0], ADDRESSES[i])
+        await store.ensure_channel(channel_name, [ADDRESSES[0], ADDRESSES[i]])
+        store.next_sequence(channel_name)
+        await store.add_channel_request(utils.generate_channel_name(ADDRESSES[i], ADDRESSES[i + 20]), ADDRESSES[i])
+    _, group = await store.create_group(ADDRESSES[0])
+    await store.add_group_invites(group, ADDRESSES[0], ADDRESSES[1:11])
+    await store.accept_group_invite(group, ADDRESSES[1])
+    await store.reject_group_invite(group, ADDRESSES[2])
+
+    entries, elements = actual(store)
+    assert store.accounting.entries == entries
+    assert store.accounting.elements == elements
+    report = store.accounting.report()
+    assert report["histograms"]["devices_per_address"] == {"2-3": 2}
+    assert report["histograms"]["subscribers_per_channel"] == {"2-3": 20}
+    measured = accounting.measure(store)
+    for name, size in measured.items():
+        assert abs(report["structures"][name]["estimated_bytes"] - size) <= size * 0.35
+
+    await store.remove_group_member(group, ADDRESSES[1])
+    await store.remove_group_member(group, ADDRESSES[0])
+    for i in range(1, 20):
+        await store.delete_channel(utils.generate_channel_name(ADDRESSES[0], ADDRESSES[i]))
+        await store.delete_channel_request(utils.generate_channel_name(ADDRESSES[i], ADDRESSES[i + 20]))
+    for i, socket in enumerate(sockets):
+        await store.remove_connection(ADDRESSES[i % 2], socket)
+    report = store.accounting.report()
+    assert report["estimated_bytes"] == 0
+    assert all(not structure["entries"] and not structure["elements"] for structure in report["structures"].values())
+    assert report["histograms"] == {"subscribers_per_channel": {}, "devices_per_address": {}}
+
+def test_histogram_buckets():
+    """Test that lengths land in power-of-two buckets and can move between them."""
+    histogram = accounting.Histogram()
+    for length in (0, 1, 2, 3, 4, 7, 8, 1000):
+        histogram.move(None, length)
+    histogram.move(3, 4)
+    assert histogram.report() == {"0": 1, "1": 1, "2-3": 1, "4-7": 3, "8-15": 1, "512-1023": 1}
+
+def test_admin_memory(client, websocket_1, admin_token):
+    """Test the memory report and the on-demand tracemalloc statistics."""
+    response = client.get("/admin/memory", params={"token": admin_token, "exact": True})
+    assert response.status_code == 200
+    report = response.json()
+    assert report["structures"]["connections"]["entries"] >= 1
+    assert set(report["measured_bytes"]) == set(report["structures"])
+    assert client.get("/admin/memory/tracemalloc", params={"token": admin_token}).status_code == 409
+    client.post("/admin/memory/tracemalloc", params={"token": admin_token, "enabled": True})
+    try:
+        response = client.get("/admin/memory/tracemalloc", params={"token": admin_token, "limit": 3})
+        assert response.status_code == 200
+        assert len(response.json()["top"]) <= 3
+    finally:
+        client.post("/admin/memory/tracemalloc", params={"token": admin_token, "enabled": False})
+
+def test_admin_memory_requires_admin(client, user_2):
+    """Test that non-admins cannot read the memory report."""
+    assert client.get("/admin/memory", params={"token": user_2["token"]}).status_code == 403
@@ -1,9 +1,16 @@
 # tests/test_auth.py
 from eth_account.messages import encode_defunct
 
+def signed_login(client, user_account, message=None) -> dict:
+    """Sign a fresh login challenge, or the given message, and return the login payload."""
+    if message is None:
+        message = client.get("/auth/nonce").json()["message"]
+    signature = user_account.sign_message(encode_defunct(text=message)).signature.hex()
+    return {"address": user_account.address, "message": message, "signature": signature}
+
 def test_web3_auth(client, web3, user_account):
     # Prepare test data
-    message = "Login to Web3 Chat"
+    message = client.get("/auth/nonce").json()["message"]
     message_hash = encode_defunct(text=message)
     signature = user_account.sign_message(message_hash).signature.hex()
     payload = {
@@ -18,4 +25,55 @@ def test_web3_auth(client, web3, user_account):
     # Assert response
     assert response.status_code == 200
     assert "token" in response.json()
-    assert isinstance(response.json()["token"], str)
\ No newline at end of file
+    assert isinstance(response.json()["token"], str)
+    assert isinstance(response.json()["refresh_token"], str)
+def test_login_nonce_is_single_use(client, user_account):
+    """Test that replaying a successful login is rejected."""
+    payload = signed_login(client, user_account)
+    assert client.post("/auth/login", json=payload).status_code == 200
+    response = client.post("/auth/login", json=payload)
+    assert response.status_code == 401
+    assert response.json()["detail"] == "Invalid or expired nonce"
+
+def test_unknown_nonce_skips_signature_recovery(client, user_account, monkeypatch):
+    """Test that messages without an outstanding nonce never reach verify_signature."""
+    from app import nonces, utils
+    calls = []
+    monkeypatch.setattr(utils, "verify_signature", lambda auth: calls.append(auth) or (True, ""))
+    for message in ("Login to Web3 Chat", nonces.login_message("0" * 32)):
+        response = client.post("/auth/login", json=signed_login(client, user_account, message))
+        assert response.status_code == 401
+    assert calls == []
+
+def test_nonce_store_expiry_and_bound(monkeypatch):
+    """Test that nonces expire and the oldest are dropped when the store is full."""
+    from app import nonces
+    now = [1000.0]
+    monkeypatch.setattr(nonces.time, "monotonic", lambda: now[0])
+    store = nonces.NonceStore(ttl=10, max_entries=2)
+    first, second = store.issue(), store.issue()
+    third = store.issue()
+    assert not store.consume(first)
+    assert store.consume(second)
+    now[0] += 11
+    assert not store.consume(third)
+    assert len(store.nonces) == 0
+    store.issue()
+    now[0] += 11
+    store.issue()
+    assert len(store.nonces) == 1
+
+def test_refresh_token_exchange(client, user_account):
+    """Test that a refresh token yields new tokens without a signature and access tokens are refused."""
+    from app import utils
+    tokens = client.post("/auth/login", json=signed_login(client, user_account)).json()
+    response = client.post("/auth/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert response.status_code == 200
+    success, address = utils.decode_jwt(response.json()["token"])
+    assert success and address == user_account.address
+    success, address = utils.decode_jwt(response.json()["refresh_token"], utils.REFRESH_TOKEN)
+    assert success and address == user_account.address
+
+    response = client.post("/auth/refresh", json={"refresh_token": tokens["token"]})
+    assert response.status_code == 401, "An access token should not be accepted as a refresh token"
+    assert response.json()["detail"] == "Invalid refresh token"
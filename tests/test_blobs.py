@@ -0,0 +1,97 @@
+import hashlib
+import pytest
+from app import blobs
+from app.routers import websocket
+
+OWNER = "0x1234567890abcdef1234567890abcdef12345678"
+CONTENT = bytes(range(256)) * 40
+DIGEST = hashlib.sha256(CONTENT).hexdigest()
+
+@pytest.fixture
+def blob_store(tmp_path, monkeypatch):
+    """Replace the server blob store with one under tmp_path."""
+    store = blobs.BlobStore(str(tmp_path))
+    monkeypatch.setattr(websocket, "blob_store", store)
+    return store
+
+def chunk_frame(upload_id: str, offset: int, data: bytes) -> bytes:
+    """Build a binary upload frame."""
+    return bytes.fromhex(upload_id) + offset.to_bytes(blobs.OFFSET_SIZE, "big") + data
+
+@pytest.mark.asyncio
+async def test_upload_resume_and_dedup(blob_store):
+    """Test that an interrupted upload resumes from disk and a stored blob is not uploaded again."""
+    success, upload = blob_store.start(OWNER, DIGEST, len(CONTENT))
+    assert success and upload.offset == 0
+    success, upload = await blob_store.write(OWNER, upload.upload_id, 0, CONTENT[:4000])
+    assert success and upload.offset == 4000
+
+    # Lose the in-memory state, as after the last connection closes
+    blob_store.cancel(OWNER)
+    success, upload = blob_store.start(OWNER, DIGEST, len(CONTENT))
+    assert upload.offset == 4000, "Upload should resume from the bytes on disk"
+    success, result = await blob_store.write(OWNER, upload.upload_id, 0, CONTENT[:4000])
+    assert not success and "expected 4000" in result
+    success, upload = await blob_store.write(OWNER, upload.upload_id, 4000, CONTENT[4000:])
+    assert success and upload.offset == upload.size
+    with open(blob_store.path(DIGEST), "rb") as f:
+        assert f.read() == CONTENT
+
+    assert blob_store.start("0xabcdef1234567890abcdef1234567890abcdef12", DIGEST, len(CONTENT)) == (True, None)
+
+@pytest.mark.asyncio
+async def test_upload_digest_mismatch(blob_store):
+    """Test that content not matching the declared digest is discarded."""
+    success, upload = blob_store.start(OWNER, "0" * 64, 3)
+    success, result = await blob_store.write(OWNER, upload.upload_id, 0, b"abc")
+    assert (success, result) == (False, "Blob digest mismatch")
+    assert not blob_store.exists("0" * 64)
+
+@pytest.mark.asyncio
+async def test_upload_restarted_with_another_size(blob_store):
+    """Test that restarting with another size replaces the upload and its bytes."""
+    success, stale = blob_store.start(OWNER, DIGEST, len(CONTENT) + 1)
+    success, stale = await blob_store.write(OWNER, stale.upload_id, 0, CONTENT[:4000])
+    success, upload = blob_store.start(OWNER, DIGEST, len(CONTENT))
+    assert success and upload.upload_id != stale.upload_id and upload.offset == 0
+    assert list(blob_store.uploads) == [upload.upload_id], "Stale upload should be forgotten"
+    success, result = await blob_store.write(OWNER, stale.upload_id, 4000, CONTENT[4000:])
+    assert (success, result) == (False, "Unknown upload")
+    success, upload = await blob_store.write(OWNER, upload.upload_id, 0, CONTENT)
+    assert success and blob_store.exists(DIGEST)
+
+@pytest.mark.asyncio
+async def test_expired_partial_uploads_are_swept(blob_store, tmp_path):
+    """Test that only partial files idle past the expiry and not in use are deleted."""
+    import os, time
+    success, upload = blob_store.start(OWNER, DIGEST, len(CONTENT))
+    await blob_store.write(OWNER, upload.upload_id, 0, CONTENT[:10])
+    abandoned = tmp_path / "uploads" / f"{OWNER}-{'0' * 64}.part"
+    abandoned.write_bytes(b"abc")
+    old = time.time() - blob_store.expiry - 1
+    for path in (abandoned, upload.path):
+        os.utime(path, (old, old))
+    assert blob_store.sweep({upload.path}) == 1
+    assert not abandoned.exists() and os.path.exists(upload.path)
+
+def test_websocket_upload_and_range_download(client, websocket_1, user_1, blob_store):
+    """Test a chunked upload over binary frames and a ranged HTTP download."""
+    websocket_1.send_json({"type": "upload_start", "sha256": DIGEST, "size": len(CONTENT)})
+    response = websocket_1.receive_json()
+    assert response["type"] == "upload" and response["offset"] == 0
+    upload_id = response["upload_id"]
+    websocket_1.send_bytes(chunk_frame(upload_id, 0, CONTENT[:6000]))
+    assert websocket_1.receive_json() == {"type": "upload", "upload_id": upload_id, "offset": 6000}
+    websocket_1.send_bytes(chunk_frame(upload_id, 6000, CONTENT[6000:]))
+    assert websocket_1.receive_json() == {"type": "upload_complete", "sha256": DIGEST}
+
+    response = client.get(f"/blobs/{DIGEST}", params={"token": user_1["token"]}, headers={"Range": "bytes=10-19"})
+    assert response.status_code == 206, f"Expected status code 206, got {response.status_code}"
+    assert response.content == CONTENT[10:20]
+    response = client.get(f"/blobs/{DIGEST}", params={"token": "invalid"})
+    assert response.status_code == 401, f"Expected status code 401, got {response.status_code}"
+
+def test_websocket_unknown_attachment(websocket_1, channel_name, blob_store):
+    """Test that a message cannot reference a blob that was never uploaded."""
+    websocket_1.send_json({"type": "channel", "channel": channel_name, "data": "", "attachment": DIGEST})
+    assert websocket_1.receive_json() == {"type": "error", "message": "Unknown attachment"}
@@ -0,0 +1,82 @@
+import pytest
+from app import blocklist
+from app.routers import websocket
+
+ADDRESS_A = "0x" + "a" * 40
+ADDRESS_B = "0x" + "b" * 40
+
+@pytest.mark.asyncio
+async def test_block_and_unblock(tmp_path):
+    """Test that blocks are directional, case-insensitive and can be lifted."""
+    blocks = blocklist.BlockList(str(tmp_path))
+    assert not blocks.is_blocked(ADDRESS_A, ADDRESS_B)
+    assert await blocks.block(ADDRESS_A, ADDRESS_B.upper().replace("0X", "0x")) == (True, "Address blocked")
+    assert blocks.is_blocked(ADDRESS_A, ADDRESS_B)
+    assert not blocks.is_blocked(ADDRESS_B, ADDRESS_A)
+    assert await blocks.block(ADDRESS_A, ADDRESS_B) == (True, "Address already blocked")
+    assert blocks.blocked_by(ADDRESS_A) == [ADDRESS_B]
+    await blocks.unblock(ADDRESS_A, ADDRESS_B)
+    assert not blocks.is_blocked(ADDRESS_A, ADDRESS_B)
+    assert blocks.blocked_by(ADDRESS_A) == []
+
+@pytest.mark.asyncio
+async def test_block_lists_persist(tmp_path):
+    """Test that block lists are reloaded from disk."""
+    blocks = blocklist.BlockList(str(tmp_path))
+    for i in range(20):
+        await blocks.block(ADDRESS_A, f"0x{i:040x}")
+    await blocks.block(ADDRESS_B, ADDRESS_A)
+    reloaded = blocklist.BlockList(str(tmp_path))
+    reloaded.load()
+    assert len(reloaded.fingerprints) == 21
+    assert reloaded.is_blocked(ADDRESS_A, f"0x{7:040x}")
+    assert reloaded.is_blocked(ADDRESS_B, ADDRESS_A)
+    assert not reloaded.is_blocked(ADDRESS_A, ADDRESS_A)
+
+@pytest.mark.asyncio
+async def test_filter_grows_past_capacity(tmp_path):
+    """Test that exceeding capacity rebuilds a larger filter without losing entries."""
+    blocks = blocklist.BlockList(str(tmp_path), capacity=8)
+    addresses = [f"0x{i:040x}" for i in range(30)]
+    for address in addresses:
+        await blocks.block(ADDRESS_A, address)
+    assert blocks.capacity >= 30
+    assert all(blocks.is_blocked(ADDRESS_A, address) for address in addresses)
+
+def test_bloom_filter_error_rate():
+    """Test that the filter has no false negatives and about the configured false positive rate."""
+    bloom = blocklist.BloomFilter(10000)
+    for i in range(10000):
+        bloom.add(blocklist.fingerprint(ADDRESS_A, str(i)))
+    assert all(blocklist.fingerprint(ADDRESS_A, str(i)) in bloom for i in range(10000))
+    false_positives = sum(blocklist.fingerprint(ADDRESS_B, str(i)) in bloom for i in range(10000))
+    assert false_positives < 300
+    assert len(bloom.bits) / 10000 < 1.3  # bytes per entry
+
+@pytest.mark.asyncio
+async def test_websocket_blocked_traffic(websocket_1, websocket_2, user_1, user_2, channel_name, store, tmp_path, monkeypatch):
+    """Test that requests and messages to a user who blocked the sender are refused."""
+    monkeypatch.setattr(websocket, "block_list", blocklist.BlockList(str(tmp_path)))
+    await store.delete_channel(channel_name)
+    await store.delete_channel_request(channel_name)
+
+    websocket_2.send_json({"type": "block", "address": user_1["address"]})
+    assert websocket_2.receive_json() == {"type": "ack"}
+    websocket_1.send_json({"type": "channel_request", "to": user_2["address"]})
+    assert websocket_1.receive_json() == {"type": "error", "message": "user is unavailable"}
+    assert channel_name not in store.channel_requests
+
+    await store.ensure_channel(channel_name, [user_1["address"], user_2["address"]])
+    websocket_1.send_json({"type": "channel", "channel": channel_name, "data": "hello"})
+    assert websocket_1.receive_json() == {"type": "error", "message": "user is unavailable"}
+
+    websocket_2.send_json({"type": "unblock", "address": user_1["address"]})
+    assert websocket_2.receive_json() == {"type": "ack"}
+    websocket_1.send_json({"type": "channel", "channel": channel_name, "data": "hello"})
+    assert websocket_1.receive_json() == {"type": "ack"}
+    assert websocket_2.receive_json()["data"] == "hello"
+    assert websocket_1.receive_json()["data"] == "hello"
+
+    websocket_1.send_json({"type": "block", "address": user_1["address"]})
+    assert websocket_1.receive_json() == {"type": "error", "message": "Cannot block self"}
+    await store.delete_channel(channel_name)
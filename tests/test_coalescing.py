@@ -0,0 +1,28 @@
+import asyncio
+import pytest
+from app import coalescing
+
+@pytest.mark.asyncio
+async def test_flush_timer_coalesces_and_expedites():
+    """Test that schedules within a window flush once and expedite() flushes early."""
+    flushes = []
+    async def flush():
+        flushes.append(asyncio.get_running_loop().time())
+    timer = coalescing.FlushTimer(flush)
+
+    for _ in range(3):
+        timer.schedule(0.01)
+    assert timer.scheduled
+    await asyncio.sleep(0.05)
+    assert len(flushes) == 1 and not timer.scheduled
+
+    start = asyncio.get_running_loop().time()
+    timer.schedule(10)
+    timer.expedite()
+    await asyncio.sleep(0.01)
+    assert len(flushes) == 2 and flushes[1] - start < 1, "Expedited flush should not wait for the window"
+
+    timer.schedule(0.01)
+    timer.cancel()
+    await asyncio.sleep(0.05)
+    assert len(flushes) == 2, "Cancelled flush should not run"
@@ -0,0 +1,25 @@
+import time
+from app import dedupe
+
+SENDER_1 = "0x1234567890abcdef1234567890abcdef12345678"
+SENDER_2 = "0xabcdef1234567890abcdef1234567890abcdef12"
+
+def test_duplicates_are_detected_per_sender():
+    """Test that an id is a duplicate only for the sender that used it."""
+    window = dedupe.DedupeWindow()
+    assert not window.check_and_add(SENDER_1, "m1")
+    assert window.check_and_add(SENDER_1, "m1")
+    assert not window.check_and_add(SENDER_2, "m1"), "Ids should be scoped to their sender"
+
+def test_window_is_bounded_by_size_and_time():
+    """Test that old ids are forgotten when the buffer is full or the window has passed."""
+    window = dedupe.DedupeWindow(max_entries=3)
+    for i in range(5):
+        window.check_and_add(SENDER_1, f"m{i}")
+    assert len(window.order) == len(window.seen) == 3
+    assert not window.check_and_add(SENDER_1, "m0"), "Evicted ids should be accepted again"
+
+    window = dedupe.DedupeWindow(window=0.01)
+    window.check_and_add(SENDER_1, "m1")
+    time.sleep(0.02)
+    assert not window.check_and_add(SENDER_1, "m1"), "Expired ids should be accepted again"
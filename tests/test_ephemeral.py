@@ -0,0 +1,49 @@
+import asyncio
+import types
+import pytest
+from app import ephemeral, profiling
+from conftest import ADDRESS_1, ADDRESS_2, CHANNEL_1_2, Recorder
+
+@pytest.mark.asyncio
+async def test_ephemeral_events_are_coalesced(channel_store):
+    """Test that only the latest event per sender and channel is published per window."""
+    recorder = Recorder()
+    lane = ephemeral.EphemeralLane(channel_store, recorder.offer, window=0.01)
+    for event in ("typing", "typing", "idle"):
+        assert lane.publish(CHANNEL_1_2, ADDRESS_1, event)
+    await asyncio.sleep(0.05)
+    assert recorder.sent == [([ADDRESS_2], {
+        "type": "ephemeral",
+        "from": ADDRESS_1,
+        "channel": CHANNEL_1_2,
+        "event": "idle"
+    })]
+
+@pytest.mark.asyncio
+async def test_ephemeral_events_are_dropped_under_load(channel_store, monkeypatch):
+    """Test that a full buffer refuses new pairs and loop lag discards the window."""
+    recorder = Recorder()
+    lane = ephemeral.EphemeralLane(channel_store, recorder.offer, window=0.01, max_pending=1)
+    assert lane.publish(CHANNEL_1_2, ADDRESS_1, "typing")
+    assert not lane.publish(CHANNEL_1_2, ADDRESS_2, "typing"), "A full buffer should refuse new pairs"
+    assert lane.publish(CHANNEL_1_2, ADDRESS_1, "idle"), "A buffered pair should still be updated"
+
+    # Replaced rather than patched, since the running monitor would overwrite its reading
+    monkeypatch.setattr(profiling, "lag_monitor", types.SimpleNamespace(last=1.0))
+    await asyncio.sleep(0.05)
+    assert recorder.sent == [], "Events should be shed while the loop lags"
+    assert lane.dropped == 2
+
+@pytest.mark.asyncio
+async def test_ephemeral_drops_refused_by_sockets_are_counted(channel_store):
+    """Test that frames a saturated socket refuses are counted as dropped."""
+    offered = []
+    def offer(addresses, message):
+        offered.append(message["event"])
+        return len(addresses)
+    lane = ephemeral.EphemeralLane(channel_store, offer, window=0.01)
+    lane.publish(CHANNEL_1_2, ADDRESS_1, "typing")
+    lane.publish(CHANNEL_1_2, ADDRESS_2, "typing")
+    await asyncio.sleep(0.05)
+    assert offered == ["typing", "typing"], "A refusing socket should not stop the flush"
+    assert lane.dropped == 2
@@ -0,0 +1,69 @@
+import asyncio
+import pytest
+from app import transports
+from app.routers import fallback
+
+@pytest.mark.asyncio
+async def test_http_connection_batches_frames():
+    """Test that queued frames are collected together and the queue is bounded."""
+    connection = transports.HttpConnection("0x1234567890abcdef1234567890abcdef12345678", max_frames=2)
+    assert await connection.collect(0.01) == []
+    for i in range(3):
+        await connection.send_json({"type": "message", "seq": i})
+    assert await connection.collect(0.01) == ['{"type":"message","seq":1}', '{"type":"message","seq":2}']
+    assert connection.dropped == 1
+
+    waiter = asyncio.create_task(connection.collect(1.0))
+    await asyncio.sleep(0.01)
+    await connection.send_text("{}")
+    assert await asyncio.wait_for(waiter, 0.5) == ["{}"], "A waiting poll should return as soon as a frame arrives"
+
+def test_poll_session_roundtrip(client, websocket_2, user_1, user_2, channel_name, store):
+    """Test that an HTTP session receives messages from and sends messages to WebSocket clients."""
+    client.portal.call(store.ensure_channel, channel_name, [user_1["address"], user_2["address"]])
+    response = client.get("/http/poll", params={"token": user_1["token"]})
+    body = response.json()
+    session = body["session"]
+    assert body["frames"][0]["type"] == "sync"
+    try:
+        # HTTP -> WebSocket
+        response = client.post("/http/send", params={"token": user_1["token"], "session": session},
+                               json=[{"type": "ping"}, {"type": "channel", "channel": channel_name, "data": "over http"}])
+        assert response.json() == {"accepted": 2}
+        assert websocket_2.receive_json()["data"] == "over http"
+
+        # WebSocket -> HTTP, every pending frame in one response
+        websocket_2.send_json({"type": "channel", "channel": channel_name, "data": "over ws"})
+        assert websocket_2.receive_json() == {"type": "ack"}
+        websocket_2.receive_json()  # Own copy of the message
+        response = client.get("/http/poll", params={"token": user_1["token"], "session": session, "timeout": 1})
+        frames = response.json()["frames"]
+        assert [frame["type"] for frame in frames] == ["pong", "ack", "message", "message"]
+        assert frames[-1]["data"] == "over ws"
+
+        response = client.get("/http/poll", params={"token": user_2["token"], "session": session})
+        assert response.status_code == 404, "Sessions should only be usable by their owner"
+    finally:
+        client.post("/http/close", params={"token": user_1["token"], "session": session})
+    assert session not in fallback.sessions.sessions
+
+class FakeRequest:
+    """Request stand-in that reports a disconnect after a number of checks."""
+    def __init__(self, checks: int):
+        self.checks = checks
+
+    async def is_disconnected(self) -> bool:
+        self.checks -= 1
+        return self.checks < 0
+
+@pytest.mark.asyncio
+async def test_sse_stream(user_1, monkeypatch):
+    """Test that the SSE stream announces its session, batches frames and closes the session."""
+    monkeypatch.setattr(transports, "SSE_KEEPALIVE", 0.01)
+    response = await fallback.events(FakeRequest(checks=2), user_1["token"])
+    chunks = [chunk async for chunk in response.body_iterator]
+    session = chunks[0].split("data: ")[1].strip()
+    assert chunks[0] == f"event: session\ndata: {session}\n\n"
+    assert chunks[1].startswith('data: {"type":"sync"')
+    assert chunks[2] == ": keepalive\n\n"
+    assert session not in fallback.sessions.sessions, "The session should close with the stream"
@@ -22,12 +22,59 @@ def test_index_page_has_placeholder(client):
     assert "Please connect your wallet to start chatting" in response.text, "Expected placeholder text in response"
 
 def test_index_page_loads_app_js(client):
-    """Test that the main page includes app.js."""
+    """Test that the main page includes app.js under its content-hashed name."""
+    from app.main import assets
     response = client.get("/")
-    assert 'src="/static/js/app.js"' in response.text, "Expected app.js to be included in response"
+    hashed_path = assets.hashed_names["js/app.js"]
+    assert f'src="/static/{hashed_path}"' in response.text, "Expected hashed app.js to be included in response"
 
 def test_app_js_accessible(client):
     """Test that app.js is accessible at /static/js/app.js."""
     response = client.get("/static/js/app.js")
     assert response.status_code == 200, f"Expected status code 200, got {response.status_code}"
-    assert "truncateAddress" in response.text, "Expected app.js to contain truncateAddress function"
\ No newline at end of file
+    assert "truncateAddress" in response.text, "Expected app.js to contain truncateAddress function"
+
+def test_hashed_assets_are_immutable(client):
+    """Test that content-hashed assets are served with long-lived cache headers."""
+    from app.main import assets
+    response = client.get(f"/static/{assets.hashed_names['css/style.css']}")
+    assert response.status_code == 200, f"Expected status code 200, got {response.status_code}"
+    assert response.headers["cache-control"] == "public, max-age=31536000, immutable"
+    assert response.text == client.get("/static/css/style.css").text
+
+def test_assets_are_precompressed(client):
+    """Test that compressible assets are served gzip-encoded when accepted."""
+    response = client.get("/static/js/app.js", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert "truncateAddress" in response.text, "Expected decompressed app.js content"
+
+def test_etag_not_modified(client):
+    """Test that a matching If-None-Match returns 304 without a body."""
+    response = client.get("/", headers={"Accept-Encoding": "identity"})
+    etag = response.headers["etag"]
+    assert response.headers["cache-control"] == "no-cache"
+    response = client.get("/", headers={"Accept-Encoding": "identity", "If-None-Match": etag})
+    assert response.status_code == 304, f"Expected status code 304, got {response.status_code}"
+    assert response.content == b""
+
+def test_weak_etag_not_modified(client):
+    """Test that an ETag weakened by a proxy still matches."""
+    etag = client.get("/static/js/app.js", headers={"Accept-Encoding": "gzip"}).headers["etag"]
+    response = client.get("/static/js/app.js", headers={"Accept-Encoding": "gzip", "If-None-Match": f'"other", W/{etag}'})
+    assert response.status_code == 304, f"Expected status code 304, got {response.status_code}"
+
+def test_head_asset(client):
+    """Test that HEAD returns the GET headers without a body."""
+    get_response = client.get("/static/js/app.js", headers={"Accept-Encoding": "identity"})
+    response = client.head("/static/js/app.js", headers={"Accept-Encoding": "identity"})
+    assert response.status_code == 200, f"Expected status code 200, got {response.status_code}"
+    assert response.content == b""
+    assert response.headers["etag"] == get_response.headers["etag"]
+    assert response.headers["content-length"] == str(len(get_response.content))
+    assert client.head("/").status_code == 200
+
+def test_missing_asset(client):
+    """Test that unknown assets return 404."""
+    response = client.get("/static/js/missing.js")
+    assert response.status_code == 404, f"Expected status code 404, got {response.status_code}"
\ No newline at end of file
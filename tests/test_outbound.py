@@ -0,0 +1,135 @@
+import asyncio
+import json
+import pytest
+from app import outbound
+
+class SlowSocket:
+    """Records written frames; every write takes a while, like a saturated socket."""
+    def __init__(self, delay: float = 0.001):
+        self.delay = delay
+        self.written = []
+
+    async def send_text(self, payload: str) -> None:
+        await asyncio.sleep(self.delay)
+        self.written.append(json.loads(payload)["type"])
+
+class RecordingSocket:
+    """Records raw payloads, including batched array frames."""
+    def __init__(self):
+        self.raw = []
+
+    async def send_text(self, payload: str) -> None:
+        self.raw.append(payload)
+
+async def written(connection: outbound.OutboundSocket) -> None:
+    """Wait until every queued frame has been written."""
+    while connection.control or connection.bulk or connection._writing:
+        await asyncio.sleep(0.001)
+
+def test_frame_type_reads_prefix():
+    """Test that the frame type is read from the encoded prefix."""
+    assert outbound.frame_type('{"type":"pong"}') == "pong"
+    assert outbound.frame_type('{"type":"channel","data":"x"}') == "channel"
+    assert outbound.frame_type('{"data":"x","type":"ack"}') is None
+
+@pytest.mark.asyncio
+async def test_idle_socket_keeps_order():
+    """Test that frames sent one at a time are written in order."""
+    socket = SlowSocket()
+    connection = outbound.OutboundSocket(socket)
+    await connection.send_json({"type": "message", "data": "x"})
+    await connection.send_json({"type": "ack"})
+    assert socket.written == ["message", "ack"]
+
+@pytest.mark.asyncio
+async def test_control_frames_skip_queued_bulk():
+    """Test that a pong sent behind many messages is written almost first."""
+    socket = SlowSocket()
+    connection = outbound.OutboundSocket(socket)
+    senders = [asyncio.create_task(connection.send_json({"type": "message", "data": "x" * 12000})) for _ in range(50)]
+    await asyncio.sleep(0)
+    await connection.send_json({"type": "pong"})
+    await asyncio.gather(*senders)
+    await written(connection)
+    assert len(socket.written) == 51
+    assert socket.written.index("pong") <= 1
+
+@pytest.mark.asyncio
+async def test_bulk_lane_is_not_starved():
+    """Test that bulk frames still get a weighted share under a flood of control frames."""
+    socket = SlowSocket()
+    connection = outbound.OutboundSocket(socket, control_weight=3)
+    senders = [asyncio.create_task(connection.send_json({"type": "message"}))]
+    await asyncio.sleep(0)
+    senders += [connection.send_json({"type": "message"}) for _ in range(5)]
+    senders += [connection.send_json({"type": "ack"}) for _ in range(20)]
+    await asyncio.gather(*senders)
+    await written(connection)
+    queued = socket.written[1:]
+    assert queued[:4] == ["ack", "ack", "ack", "message"]
+    assert queued.count("message") == 5
+
+@pytest.mark.asyncio
+async def test_offer_drops_when_bulk_lane_is_full():
+    """Test that offered frames are queued while there is room and dropped, not awaited, after."""
+    socket = SlowSocket()
+    connection = outbound.OutboundSocket(socket, bulk_max_frames=2)
+    assert connection.offer('{"type":"ephemeral"}'), "An idle socket should take the frame"
+    assert connection.offer('{"type":"ephemeral"}')
+    assert not connection.offer('{"type":"ephemeral"}'), "A full bulk lane should drop the frame"
+    await written(connection)
+    assert socket.written == ["ephemeral", "ephemeral"]
+
+@pytest.mark.asyncio
+async def test_writer_failure_reaches_senders():
+    """Test that a failed write stops the writer and later sends raise."""
+    class BrokenSocket(SlowSocket):
+        async def send_text(self, payload: str) -> None:
+            await asyncio.sleep(0.001)
+            raise RuntimeError("closed")
+    connection = outbound.OutboundSocket(BrokenSocket())
+    first = asyncio.create_task(connection.send_json({"type": "message"}))
+    await asyncio.sleep(0)
+    await connection.send_json({"type": "message"})
+    with pytest.raises(RuntimeError):
+        await first
+    while connection._writing:
+        await asyncio.sleep(0.001)
+    with pytest.raises(RuntimeError):
+        await connection.send_json({"type": "ack"})
+
+@pytest.mark.asyncio
+async def test_batch_coalesces_burst_into_array_frame():
+    """Test that a burst is written as one array frame with control frames first."""
+    socket = RecordingSocket()
+    connection = outbound.OutboundSocket(socket, batch=True)
+    for i in range(10):
+        await connection.send_json({"type": "message", "data": str(i)})
+    await connection.send_json({"type": "ack"})
+    await written(connection)
+    assert connection.writes == 1
+    frames = json.loads(socket.raw[0])
+    assert [frame["type"] for frame in frames] == ["ack"] + ["message"] * 10
+    assert [frame["data"] for frame in frames[1:]] == [str(i) for i in range(10)]
+    assert connection.window > outbound.BATCH_MIN_WINDOW
+
+@pytest.mark.asyncio
+async def test_batch_respects_size_cap_and_sends_singles_plain():
+    """Test that batches stop at the byte cap and a lone frame is not wrapped."""
+    socket = RecordingSocket()
+    connection = outbound.OutboundSocket(socket, batch=True, batch_max_bytes=1000)
+    for _ in range(5):
+        await connection.send_json({"type": "message", "data": "x" * 300})
+    await written(connection)
+    assert [len(json.loads(raw)) for raw in socket.raw[:2]] == [3, 2]
+    await connection.send_json({"type": "pong"})
+    await written(connection)
+    assert json.loads(socket.raw[-1]) == {"type": "pong"}
+
+def test_batch_subprotocol_negotiation(client, user_1):
+    """Test that offering the batch subprotocol is accepted and frames still arrive."""
+    with client.websocket_connect(f"/ws/chat?token={user_1['token']}", subprotocols=[outbound.BATCH_SUBPROTOCOL]) as ws:
+        assert ws.accepted_subprotocol == outbound.BATCH_SUBPROTOCOL
+        assert ws.receive_json()["type"] == "sync"
+        ws.send_json({"type": "ping"})
+        assert ws.receive_json() == {"type": "pong"}
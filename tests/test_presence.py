@@ -0,0 +1,71 @@
+import asyncio
+import pytest
+from app import presence
+from conftest import ADDRESS_1, ADDRESS_2, ADDRESS_3, CHANNEL_1_2, Recorder
+
+async def connect_and_flush(channel_store, service, address):
+    """Connect a new device for address and wait for the presence window to close."""
+    if await channel_store.add_connection(address, object()):
+        service.update(address, True)
+    await asyncio.sleep(0.05)
+
+@pytest.mark.asyncio
+async def test_presence_subscribe_peers_only(channel_store):
+    """Test that only channel peers can be watched."""
+    service = presence.Presence(channel_store, Recorder())
+
+    assert service.subscribe(ADDRESS_1, [ADDRESS_2, ADDRESS_3]) == [ADDRESS_2]
+    assert service.subscribe(ADDRESS_2, []) == [ADDRESS_1], "Empty list should subscribe to all peers"
+    assert service.snapshot([ADDRESS_2]) == {ADDRESS_2: False}
+
+    service.unsubscribe(ADDRESS_1)
+    assert ADDRESS_1 not in service.subscriptions
+    assert ADDRESS_1 not in service.watchers.get(ADDRESS_2, set())
+
+@pytest.mark.asyncio
+async def test_presence_updates_are_coalesced(channel_store):
+    """Test that changes are published once per window and flapping is suppressed."""
+    recorder = Recorder()
+    service = presence.Presence(channel_store, recorder, window=0.01)
+    service.subscribe(ADDRESS_1, [ADDRESS_2])
+    ws = object()
+
+    # Connect and disconnect within one window: no update
+    await channel_store.add_connection(ADDRESS_2, ws)
+    service.update(ADDRESS_2, True)
+    await channel_store.remove_connection(ADDRESS_2, ws)
+    service.update(ADDRESS_2, False)
+    await asyncio.sleep(0.05)
+    assert recorder.sent == [], "Flapping connection should not publish presence"
+
+    # Several devices connecting within one window: a single update
+    for device in (object(), object()):
+        if await channel_store.add_connection(ADDRESS_2, device):
+            service.update(ADDRESS_2, True)
+    await asyncio.sleep(0.05)
+    assert recorder.sent == [([ADDRESS_1], {"type": "presence", "presence": {ADDRESS_2: True}})]
+
+@pytest.mark.asyncio
+async def test_presence_stops_after_leaving_channel(channel_store):
+    """Test that a watcher stops receiving updates once it no longer shares a channel."""
+    recorder = Recorder()
+    service = presence.Presence(channel_store, recorder, window=0.01)
+    service.subscribe(ADDRESS_1, [ADDRESS_2])
+    service.subscribe(ADDRESS_3, [])
+
+    await channel_store.delete_channel(CHANNEL_1_2)
+    await connect_and_flush(channel_store, service, ADDRESS_2)
+    assert recorder.sent == [], "Former peer should not receive presence updates"
+    assert ADDRESS_1 not in service.subscriptions, "Stale subscription should be dropped"
+
+@pytest.mark.asyncio
+async def test_presence_all_peers_follows_new_peers(channel_store):
+    """Test that an all-peers subscription covers peers who join later."""
+    recorder = Recorder()
+    service = presence.Presence(channel_store, recorder, window=0.01)
+    assert service.subscribe(ADDRESS_1, []) == [ADDRESS_2]
+
+    channel_1_3 = f"{ADDRESS_1}:{ADDRESS_3}"
+    await channel_store.ensure_channel(channel_1_3, [ADDRESS_1, ADDRESS_3])
+    await connect_and_flush(channel_store, service, ADDRESS_3)
+    assert recorder.sent == [([ADDRESS_1], {"type": "presence", "presence": {ADDRESS_3: True}})]
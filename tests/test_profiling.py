@@ -0,0 +1,78 @@
+import threading
+import time
+import pytest
+from app import utils, profiling
+
+@pytest.fixture
+def admin_token(user_1, monkeypatch):
+    """Make user_1 an admin and return its token."""
+    monkeypatch.setattr(utils, "ADMIN_ADDRESSES", {user_1["address"].lower()})
+    return user_1["token"]
+
+@pytest.mark.asyncio
+async def test_handler_timer_records_calls():
+    """Test that wrapped handlers are counted and timed."""
+    timer = profiling.HandlerTimer(enabled=True)
+
+    async def handler():
+        time.sleep(0.01)
+
+    await timer.run("ping", handler())
+    await timer.run("ping", handler())
+    report = timer.report()
+    assert report["ping"]["calls"] == 2
+    assert report["ping"]["wall_ms_max"] >= 10, f"Expected at least 10 ms, got {report['ping']}"
+
+def test_sample_stacks_collapses_thread_stack():
+    """Test that sampling a busy thread yields collapsed stacks with its functions."""
+    stop = threading.Event()
+
+    def busy_worker():
+        while not stop.is_set():
+            sum(range(1000))
+
+    worker = threading.Thread(target=busy_worker)
+    worker.start()
+    try:
+        stacks = profiling.sample_stacks(worker.ident, 0.1, interval=0.001)
+    finally:
+        stop.set()
+        worker.join()
+    assert stacks, "Expected samples"
+    assert any(stack.endswith("test_profiling:busy_worker") for stack in stacks), f"Unexpected stacks: {list(stacks)[:3]}"
+
+def test_admin_requires_admin(client, user_2, admin_token):
+    """Test that admin endpoints reject invalid and non-admin tokens."""
+    response = client.get("/admin/loop", params={"token": "invalid"})
+    assert response.status_code == 401, f"Expected status code 401, got {response.status_code}"
+    response = client.get("/admin/loop", params={"token": user_2["token"]})
+    assert response.status_code == 403, f"Expected status code 403, got {response.status_code}"
+
+def test_admin_handler_timings(client, websocket_1, admin_token):
+    """Test enabling handler timings and reading them back."""
+    response = client.post("/admin/handlers", params={"token": admin_token, "enabled": True, "reset": True})
+    assert response.json() == {"enabled": True}
+    try:
+        websocket_1.send_json({"type": "ping"})
+        assert websocket_1.receive_json() == {"type": "pong"}
+        response = client.get("/admin/handlers", params={"token": admin_token})
+        assert response.json()["handlers"]["ping"]["calls"] == 1
+    finally:
+        client.post("/admin/handlers", params={"token": admin_token, "enabled": False, "reset": True})
+
+def test_admin_profile(client, admin_token):
+    """Test that the profiler returns collapsed stacks of the event loop thread."""
+    response = client.get("/admin/profile", params={"token": admin_token, "seconds": 0.1})
+    assert response.status_code == 200, f"Expected status code 200, got {response.status_code}"
+    assert response.text, "Expected collapsed stacks"
+    stack, count = response.text.splitlines()[0].rsplit(" ", 1)
+    assert ";" in stack and int(count) > 0
+
+    response = client.get("/admin/profile", params={"token": admin_token, "seconds": 600})
+    assert response.status_code == 400, f"Expected status code 400, got {response.status_code}"
+
+def test_admin_loop_lag(client, admin_token):
+    """Test that loop lag statistics are reported."""
+    response = client.get("/admin/loop", params={"token": admin_token})
+    assert response.status_code == 200, f"Expected status code 200, got {response.status_code}"
+    assert set(response.json()) == {"samples", "last_ms", "avg_ms", "max_ms"}
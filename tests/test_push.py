@@ -0,0 +1,122 @@
+import pytest
+import pytest_asyncio
+from aiohttp import web
+from app import push
+from app.routers import websocket
+
+class StandIn:
+    """Local webhook recording requests; replies with the queued statuses, then 200."""
+    def __init__(self):
+        self.requests = []
+        self.peers = []
+        self.statuses = []
+
+    async def handle(self, request: web.Request) -> web.Response:
+        self.requests.append(await request.json())
+        self.peers.append(request.transport.get_extra_info("peername"))
+        return web.json_response({}, status=self.statuses.pop(0) if self.statuses else 200)
+
+@pytest_asyncio.fixture
+async def webhook():
+    stand_in = StandIn()
+    app = web.Application()
+    app.router.add_post("/push", stand_in.handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    stand_in.url = f"http://127.0.0.1:{port}/push"
+    yield stand_in
+    await runner.cleanup()
+
+def message(channel: str, seq: int) -> dict:
+    return {"type": "message", "from": "0xsender", "channel": channel, "data": "secret", "seq": seq}
+
+@pytest.mark.asyncio
+async def test_notifications_are_coalesced_and_batched(webhook):
+    """Test that notifications are summarised per user and posted in batches over one connection."""
+    dispatcher = push.PushDispatcher(webhook.url, window=60, batch_size=2)
+    for seq in range(1, 4):
+        dispatcher.notify("0xa", message("a:b", seq))
+    dispatcher.notify("0xa", message("a:c", 1))
+    dispatcher.notify("0xb", message("a:b", 4))
+    dispatcher.notify("0xc", message("c:d", 1))
+    await dispatcher.flush()
+    await dispatcher.close()
+    assert [len(body["notifications"]) for body in webhook.requests] == [2, 1]
+    first = webhook.requests[0]["notifications"][0]
+    assert first["address"] == "0xa" and first["count"] == 4
+    assert first["channels"] == {"a:b": 3, "a:c": 1}
+    assert first["last"]["channel"] == "a:c" and "data" not in first["last"]
+    assert webhook.peers[0] == webhook.peers[1]  # keep-alive connection reused
+    assert dispatcher.sent == 3 and dispatcher.dropped == 0
+
+@pytest.mark.asyncio
+async def test_failed_requests_are_retried(webhook):
+    """Test that server errors are retried with backoff until the webhook accepts the batch."""
+    webhook.statuses = [503, 500]
+    dispatcher = push.PushDispatcher(webhook.url, window=60, backoff=0.01)
+    dispatcher.notify("0xa", message("a:b", 1))
+    await dispatcher.flush()
+    await dispatcher.close()
+    assert len(webhook.requests) == 3
+    assert dispatcher.sent == 1
+    assert dispatcher.breaker.state == "closed"
+
+@pytest.mark.asyncio
+async def test_client_errors_are_not_retried(webhook):
+    """Test that a rejected batch is dropped without retrying."""
+    webhook.statuses = [400]
+    dispatcher = push.PushDispatcher(webhook.url, window=60, backoff=0.01)
+    dispatcher.notify("0xa", message("a:b", 1))
+    await dispatcher.flush()
+    await dispatcher.close()
+    assert len(webhook.requests) == 1
+    assert dispatcher.dropped == 1
+
+@pytest.mark.asyncio
+async def test_circuit_opens_after_repeated_failures(webhook):
+    """Test that an open circuit stops requests until the reset timeout passes."""
+    webhook.statuses = [500] * 10
+    breaker = push.CircuitBreaker(threshold=2, reset_timeout=60)
+    dispatcher = push.PushDispatcher(webhook.url, window=60, retries=1, breaker=breaker)
+    for address in ("0xa", "0xb", "0xc"):
+        dispatcher.notify(address, message("a:b", 1))
+        await dispatcher.flush()
+    assert len(webhook.requests) == 2
+    assert breaker.state == "open"
+    assert dispatcher.dropped == 3
+    breaker.opened_at -= 60
+    webhook.statuses = []
+    dispatcher.notify("0xd", message("a:b", 1))
+    await dispatcher.flush()
+    await dispatcher.close()
+    assert breaker.state == "closed"
+    assert dispatcher.sent == 1
+
+@pytest.mark.asyncio
+async def test_unreachable_webhook_is_dropped():
+    """Test that connection errors count as failures and the batch is dropped."""
+    dispatcher = push.PushDispatcher("http://127.0.0.1:9/push", window=60, retries=2, backoff=0.01)
+    dispatcher.notify("0xa", message("a:b", 1))
+    await dispatcher.flush()
+    await dispatcher.close()
+    assert dispatcher.dropped == 1
+    assert dispatcher.breaker.failures == 2
+
+@pytest.mark.asyncio
+async def test_offline_recipients_are_notified(monkeypatch, user_1, user_2):
+    """Test that fan-out queues notifications only for recipients without connections."""
+    dispatcher = push.PushDispatcher("http://127.0.0.1:9/push", window=60)
+    monkeypatch.setattr(websocket, "push_dispatcher", dispatcher)
+    class Sink:
+        async def send_text(self, payload):
+            pass
+    monkeypatch.setitem(websocket.store.connections, user_1["address"], ())
+    monkeypatch.setitem(websocket.store.connections, user_2["address"], (Sink(),))
+    await websocket.send_to_subscribers([user_1["address"], user_2["address"]], message("a:b", 1))
+    await websocket.send_to_subscribers([user_1["address"]], {"type": "presence", "presence": {}})
+    assert list(dispatcher.pending) == [user_1["address"]]
+    assert dispatcher.pending[user_1["address"]]["count"] == 1
+    dispatcher._timer.cancel()
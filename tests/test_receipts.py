@@ -0,0 +1,61 @@
+import asyncio
+import pytest
+from app import receipts
+from conftest import ADDRESS_1, ADDRESS_2, ADDRESS_3, CHANNEL_1_2, Recorder
+
+@pytest.fixture
+def receipts_store(channel_store):
+    """Return the channel storage with 3 messages sent in CHANNEL_1_2."""
+    receipts_store = channel_store
+    for _ in range(3):
+        receipts_store.next_sequence(CHANNEL_1_2)
+    return receipts_store
+
+@pytest.mark.asyncio
+async def test_receipt_marks_only_move_forward(receipts_store):
+    """Test that marks are monotonic and reading implies delivery."""
+    service = receipts.Receipts(receipts_store, Recorder())
+
+    assert service.update(receipts.DELIVERED, CHANNEL_1_2, ADDRESS_2, 2)
+    assert not service.update(receipts.DELIVERED, CHANNEL_1_2, ADDRESS_2, 1), "Marks should not move back"
+    assert service.update(receipts.READ, CHANNEL_1_2, ADDRESS_2, 3)
+    assert service.get(receipts.DELIVERED, CHANNEL_1_2, ADDRESS_2) == 3
+    assert service.get(receipts.READ, CHANNEL_1_2, ADDRESS_2) == 3
+    assert service.get(receipts.READ, CHANNEL_1_2, ADDRESS_1) == 0
+
+    service.forget(CHANNEL_1_2, ADDRESS_2)
+    assert service.get(receipts.DELIVERED, CHANNEL_1_2, ADDRESS_2) == 0
+
+@pytest.mark.asyncio
+async def test_receipts_are_coalesced(receipts_store):
+    """Test that receipts within one window produce one frame to the other participants."""
+    recorder = Recorder()
+    service = receipts.Receipts(receipts_store, recorder, window=0.01)
+
+    for sequence in (1, 2, 3):
+        service.update(receipts.DELIVERED, CHANNEL_1_2, ADDRESS_2, sequence)
+    service.update(receipts.READ, CHANNEL_1_2, ADDRESS_2, 2)
+    await asyncio.sleep(0.05)
+    assert recorder.sent == [([ADDRESS_1], {
+        "type": "receipts",
+        "channel": CHANNEL_1_2,
+        "delivered": {ADDRESS_2: 3},
+        "read": {ADDRESS_2: 2}
+    })]
+
+    # Both participants changed: both get the update
+    recorder.sent.clear()
+    service.update(receipts.READ, CHANNEL_1_2, ADDRESS_1, 3)
+    service.update(receipts.READ, CHANNEL_1_2, ADDRESS_2, 3)
+    await asyncio.sleep(0.05)
+    assert len(recorder.sent) == 1
+    assert recorder.sent[0][0] == sorted([ADDRESS_1, ADDRESS_2])
+
+@pytest.mark.asyncio
+async def test_receipts_of_former_members_are_not_published(receipts_store):
+    """Test that a receipt from an address that left the channel is not published."""
+    recorder = Recorder()
+    service = receipts.Receipts(receipts_store, recorder, window=0.01)
+    service.update(receipts.DELIVERED, CHANNEL_1_2, ADDRESS_3, 1)
+    await asyncio.sleep(0.05)
+    assert recorder.sent == []
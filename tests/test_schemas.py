@@ -0,0 +1,29 @@
+from app import schemas
+
+CHANNEL = "0x1234567890abcdef1234567890abcdef12345678:0xabcdef1234567890abcdef1234567890abcdef12"
+
+def test_decode_returns_typed_frames():
+    """Test that valid frames decode to their schema with defaults applied."""
+    success, frame = schemas.decode(f'{{"type": "channel", "channel": "{CHANNEL}", "data": "hi", "extra": 1}}')
+    assert success and isinstance(frame, schemas.ChannelMessage)
+    assert (frame.channel, frame.data, frame.client_msg_id) == (CHANNEL, "hi", None)
+    success, frame = schemas.decode('{"type": "search", "query": "hello"}')
+    assert success and (frame.offset, frame.limit) == (0, 20)
+    success, frame = schemas.validate({"type": "read", "channel": CHANNEL, "seq": 3})
+    assert success and frame.type == "read"
+
+def test_decode_error_codes():
+    """Test that invalid frames produce structured error frames."""
+    assert schemas.decode("not json")[1]["code"] == "invalid_json"
+    assert schemas.decode('{"type": "nope"}')[1] == {"type": "error", "code": "invalid_type", "message": "Invalid message type: nope"}
+    assert schemas.decode('[1, 2]')[1]["code"] == "invalid_type"
+
+    success, error = schemas.decode(f'{{"type": "channel", "channel": "{CHANNEL}", "data": "{"x" * 12001}"}}')
+    assert not success
+    assert (error["code"], error["field"], error["reason"]) == ("invalid_field", "data", "string_too_long")
+
+    success, error = schemas.decode(f'{{"type": "read", "channel": "{CHANNEL}", "seq": true}}')
+    assert (error["field"], error["reason"]) == ("seq", "int_type"), "Booleans should not pass as integers"
+
+    success, error = schemas.decode('{"type": "group_invite", "channel": "group:bad", "members": ["0x1"]}')
+    assert error["field"] == "channel"
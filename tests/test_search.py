@@ -0,0 +1,66 @@
+import pytest
+from app import search
+
+CHANNEL_1 = "0x1234567890abcdef1234567890abcdef12345678:0xabcdef1234567890abcdef1234567890abcdef12"
+CHANNEL_2 = "0x1234567890abcdef1234567890abcdef12345678:0x9999999999999999999999999999999999999999"
+SENDER = "0x1234567890abcdef1234567890abcdef12345678"
+
+def test_tokenize():
+    """Test that text is split into lowercase word tokens."""
+    assert search.tokenize("Hello, World! hello_there 42") == ["hello", "world", "hello_there", "42"]
+
+@pytest.mark.asyncio
+async def test_search_ranking_and_pagination(tmp_path):
+    """Test that hits are ranked, paginated and restricted to the given channels."""
+    index = search.SearchIndex(str(tmp_path), flush_interval=0.01)
+    index.add(CHANNEL_1, SENDER, "meeting tomorrow")
+    index.add(CHANNEL_1, SENDER, "meeting meeting at noon")
+    index.add(CHANNEL_1, SENDER, "lunch at noon")
+    index.add(CHANNEL_2, SENDER, "secret meeting")
+    assert index.search("meeting", [CHANNEL_1]) == (0, []), "Messages should not be indexed before the flush"
+    await index.flush()
+
+    total, hits = index.search("meeting", [CHANNEL_1])
+    assert total == 2
+    assert [hit["data"] for hit in hits] == ["meeting meeting at noon", "meeting tomorrow"]
+    assert all(hit["channel"] == CHANNEL_1 for hit in hits), "Hits should be restricted to the given channels"
+
+    total, hits = index.search("MEETING noon", [CHANNEL_1, CHANNEL_2])
+    assert total == 1 and hits[0]["data"] == "meeting meeting at noon", "All query tokens should match"
+
+    total, hits = index.search("meeting", [CHANNEL_1, CHANNEL_2], offset=1, limit=1)
+    assert total == 3 and len(hits) == 1
+
+@pytest.mark.asyncio
+async def test_search_segments_are_persisted(tmp_path):
+    """Test that flushed segments are reloaded by a new index."""
+    index = search.SearchIndex(str(tmp_path), batch_size=2)
+    for i in range(5):
+        index.add(CHANNEL_1, SENDER, f"message number {i}")
+    await index.flush()
+    assert len(list(tmp_path.iterdir())) == 3, "Expected one segment per batch"
+
+    reloaded = search.SearchIndex(str(tmp_path))
+    reloaded.load()
+    total, hits = reloaded.search("number", [CHANNEL_1])
+    assert total == 5
+    assert hits[0]["data"] == "message number 4", "Newest message should rank first on ties"
+
+@pytest.mark.asyncio
+async def test_search_segments_are_merged(tmp_path):
+    """Test that full tiers of segments are merged and hits are still read back."""
+    index = search.SearchIndex(str(tmp_path), batch_size=1, merge_factor=3)
+    for i in range(11):
+        index.add(CHANNEL_1, SENDER, f"message number {i}")
+        await index.flush()
+    # 9 single-message segments merged into one of 9, plus two of the next round
+    assert [segment.size for segment in index.segments] == [9, 1, 1]
+    assert len(list(tmp_path.iterdir())) == 3, "Merged segment files should be removed"
+
+    total, hits = index.search("number", [CHANNEL_1], limit=11)
+    assert total == 11
+    assert [hit["data"] for hit in hits] == [f"message number {i}" for i in reversed(range(11))]
+
+    reloaded = search.SearchIndex(str(tmp_path))
+    reloaded.load()
+    assert reloaded.search("number", [CHANNEL_1], limit=11) == (total, hits)
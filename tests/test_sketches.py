@@ -0,0 +1,48 @@
+import pytest
+from app import utils, sketches
+
+@pytest.fixture
+def admin_token(user_1, monkeypatch):
+    """Make user_1 an admin and return its token."""
+    monkeypatch.setattr(utils, "ADMIN_ADDRESSES", {user_1["address"].lower()})
+    return user_1["token"]
+
+def test_count_min_never_undercounts():
+    """Test that estimates are at least the true counts, even with collisions."""
+    sketch = sketches.CountMinSketch(width=16, depth=3)
+    for i in range(200):
+        for _ in range(i % 5):
+            sketch.add(f"key-{i}")
+    assert all(sketch.estimate(f"key-{i}") >= i % 5 for i in range(200))
+    sketch.decay()
+    assert sketch.estimate("key-4") >= 2
+
+def test_heavy_hitters_find_top_keys_in_fixed_space():
+    """Test that frequent keys are found among many rare ones within capacity."""
+    hitters = sketches.HeavyHitters()
+    for i in range(5000):
+        hitters.add(f"rare-{i}")
+        if i % 10 == 0:
+            hitters.add("spammer")
+        if i % 20 == 0:
+            hitters.add("busy")
+    assert len(hitters.summary.counts) <= sketches.HEAVY_HITTERS
+    top = [entry["key"] for entry in hitters.top(2)]
+    assert top == ["spammer", "busy"], f"Unexpected top keys: {top}"
+
+def test_heavy_hitters_decay(monkeypatch):
+    """Test that counts are halved after the decay interval."""
+    hitters = sketches.HeavyHitters(decay_interval=0)
+    for _ in range(8):
+        hitters.add("key")
+    assert hitters.top(1)[0]["count"] < 8
+
+def test_admin_top(client, websocket_1, user_1, user_2, admin_token, monkeypatch):
+    """Test that channel requests show up as top requesters."""
+    monkeypatch.setattr(sketches, "load_tracker", sketches.LoadTracker())
+    websocket_1.send_json({"type": "channel_request", "to": user_2["address"]})
+    websocket_1.receive_json()
+    response = client.get("/admin/top", params={"token": admin_token, "limit": 5})
+    assert response.json()["requesters"] == [{"key": user_1["address"], "count": 1}]
+    response = client.get("/admin/top", params={"token": admin_token, "limit": 0})
+    assert response.status_code == 400, f"Expected status code 400, got {response.status_code}"
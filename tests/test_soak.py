@@ -0,0 +1,22 @@
+import pytest
+from app.routers import websocket
+from benchmarks import soak
+
+@pytest.mark.asyncio
+async def test_short_soak_has_no_drift():
+    """Test that a brief soak run churns clients without structure or memory drift."""
+    report = await soak.soak(duration=2.0, interval=0.25, clients=8)
+    assert report["sessions"] > 8
+    assert not report["failures"]
+    assert len(report["samples"]) >= 4
+
+@pytest.mark.asyncio
+async def test_soak_detects_leaked_connections(monkeypatch):
+    """Test that connections left behind after disconnect fail the soak."""
+    async def leaky_disconnect(address, connection):
+        pass
+    monkeypatch.setattr(websocket, "disconnect", leaky_disconnect)
+    with pytest.raises(AssertionError, match="connections"):
+        await soak.soak(duration=1.0, interval=0.2, clients=4)
+    for address in soak.soak_addresses(4):
+        websocket.store.connections.pop(address, None)
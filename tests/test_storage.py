@@ -1,5 +1,6 @@
+import asyncio
 import pytest
-from app import utils
+from app import utils, storage
 
 @pytest.mark.asyncio
 async def test_ensure_channel(store):
@@ -43,4 +44,106 @@ async def test_delete_channel(store):
     # Delete channel
     success, msg = await store.delete_channel(channel_name)
     assert success, f"Failed to delete channel: {msg}"
-    assert channel_name not in store.channels, f"Channel {channel_name} should be deleted"
\ No newline at end of file
+    assert channel_name not in store.channels, f"Channel {channel_name} should be deleted"
+
+@pytest.mark.asyncio
+async def test_create_group(store):
+    """Test group creation, invites, membership checks and the reverse membership index."""
+    owner = "0x1234567890abcdef1234567890abcdef12345678"
+    members = [f"0x{i:040x}" for i in range(1, 1000)]
+
+    success, group_name = await store.create_group(owner)
+    assert success, f"Failed to create group: {group_name}"
+    assert utils.is_valid_group_name(group_name), f"Invalid group name: {group_name}"
+
+    # Invites stay pending until accepted
+    success, invited = await store.add_group_invites(group_name, owner, members)
+    assert success, f"Failed to invite members: {invited}"
+    assert invited == members
+    assert not store.is_participant(group_name, members[0]), "Invitee should not be a participant before accepting"
+    for address in members:
+        success, msg = await store.accept_group_invite(group_name, address)
+        assert success, f"Failed to accept invite: {msg}"
+    assert len(store.channels[group_name]) == 1000, "Expected 1000 group members"
+    assert store.is_participant(group_name, owner), "Owner should be a group participant"
+    assert store.is_participant(group_name, members[-1]), "Member should be a group participant"
+    assert not store.is_participant(group_name, "0xabcdef1234567890abcdef1234567890abcdef12"), "Non-member should not be a participant"
+    assert group_name in store.memberships[members[0]], "Reverse index should contain the group"
+
+    # Leaving removes the member from both the group and the reverse index
+    success, msg = await store.remove_group_member(group_name, members[0])
+    assert success, f"Failed to leave group: {msg}"
+    assert not store.is_participant(group_name, members[0]), "Member should have left the group"
+    assert members[0] not in store.memberships, "Reverse index should drop addresses without channels"
+
+    # Deleting the group clears the reverse index
+    success, msg = await store.delete_channel(group_name)
+    assert success, f"Failed to delete group: {msg}"
+    assert all(group_name not in channels for channels in store.memberships.values()), "Reverse index should not reference deleted group"
+
+@pytest.mark.asyncio
+async def test_add_group_invites_validation(store):
+    """Test that only the owner can invite, and only valid addresses."""
+    owner = "0x1234567890abcdef1234567890abcdef12345678"
+    member = "0xabcdef1234567890abcdef1234567890abcdef12"
+    success, group_name = await store.create_group(owner)
+    assert success, f"Failed to create group: {group_name}"
+
+    success, msg = await store.add_group_invites(group_name, owner, ["0xInvalidAddress"])
+    assert not success, "Should fail for invalid address"
+    assert "Invalid address: 0xInvalidAddress" in msg, f"Expected error message, got: {msg}"
+
+    await store.add_group_invites(group_name, owner, [member])
+    await store.accept_group_invite(group_name, member)
+    success, msg = await store.add_group_invites(group_name, member, ["0x9999999999999999999999999999999999999999"])
+    assert not success, "Should fail for non-owner invite"
+    assert msg == "Only the group owner can invite members"
+
+    success, msg = await store.accept_group_invite(group_name, "0x9999999999999999999999999999999999999999")
+    assert not success, "Should fail without a pending invite"
+    await store.delete_channel(group_name)
+
+@pytest.mark.asyncio
+async def test_remove_connection_twice():
+    """Test that removing the same connection twice is harmless."""
+    churn_store = storage.Storage()
+    address = "0x1234567890abcdef1234567890abcdef12345678"
+    ws = object()
+    assert await churn_store.add_connection(address, ws), "First connection should be reported"
+    assert await churn_store.remove_connection(address, ws), "Last connection should be reported"
+    assert not await churn_store.remove_connection(address, ws), "Second remove should be a no-op"
+    assert address not in churn_store.connections
+
+@pytest.mark.asyncio
+async def test_connection_churn_during_fanout():
+    """Test that fan-out over snapshots survives concurrent connect/disconnect churn."""
+    churn_store = storage.Storage()
+    addresses = [f"0x{i:040x}" for i in range(1, 21)]
+    success, group_name = await churn_store.create_group(addresses[0])
+    assert success, f"Failed to create group: {group_name}"
+    await churn_store.add_group_invites(group_name, addresses[0], addresses[1:])
+
+    class YieldingSocket:
+        """WebSocket stand-in that yields to the event loop on every send."""
+        async def send_json(self, data: dict):
+            await asyncio.sleep(0)
+
+    async def churn(address: str):
+        for _ in range(20):
+            ws = YieldingSocket()
+            await churn_store.add_connection(address, ws)
+            await churn_store.accept_group_invite(group_name, address)
+            await asyncio.sleep(0)
+            await churn_store.remove_connection(address, ws)
+            await churn_store.remove_connection(address, ws)
+            await churn_store.remove_group_member(group_name, address)
+            await churn_store.add_group_invites(group_name, addresses[0], [address])
+
+    async def fanout():
+        for _ in range(50):
+            await churn_store.notify_channel_creation(group_name)
+
+    await asyncio.gather(fanout(), *(churn(address) for address in addresses[1:]))
+    assert churn_store.connections == {}, "All connections should be removed"
+    assert churn_store.channels[group_name] == {addresses[0]}, "Only the owner should remain"
+    assert set(churn_store.memberships) == {addresses[0]}, "Reverse index should match membership"
@@ -0,0 +1,89 @@
+import json
+import pytest
+from app import utils, tracing
+
+@pytest.fixture
+def admin_token(user_1, monkeypatch):
+    """Make user_1 an admin and return its token."""
+    monkeypatch.setattr(utils, "ADMIN_ADDRESSES", {user_1["address"].lower()})
+    return user_1["token"]
+
+@pytest.fixture
+def tracer(tmp_path, monkeypatch):
+    """Replace the global tracer with one that samples every frame into tmp_path."""
+    test_tracer = tracing.Tracer(tracing.BatchExporter(str(tmp_path / "spans.jsonl")), sample_rate=1.0)
+    monkeypatch.setattr(tracing, "tracer", test_tracer)
+    return test_tracer
+
+def test_unsampled_frames_use_noop_span(tmp_path):
+    """Test that a zero sample rate records nothing."""
+    tracer = tracing.Tracer(tracing.BatchExporter(str(tmp_path / "spans.jsonl")), sample_rate=0.0)
+    with tracer.trace("frame") as frame:
+        assert frame is tracing.NOOP_SPAN
+        assert tracer.span("child") is tracing.NOOP_SPAN
+    assert tracer.exporter.buffer == []
+
+def test_child_spans_share_trace(tracer):
+    """Test that child spans link to their parent and are written in OTLP field names."""
+    with tracer.trace("frame", type="ping") as frame:
+        with tracer.span("dispatch") as child:
+            pass
+    assert child.trace_id == frame.trace_id
+    assert child.parent_id == frame.span_id
+    tracer.exporter.flush()
+    with open(tracer.exporter.path) as f:
+        records = [json.loads(line) for line in f]
+    assert [record["name"] for record in records] == ["dispatch", "frame"]
+    assert records[1]["parentSpanId"] == ""
+    assert records[1]["attributes"] == {"type": "ping"}
+    assert set(tracer.exporter.percentiles()) == {"frame", "dispatch"}
+
+def test_frame_stages_traced(websocket_1, websocket_2, user_2, channel_name, tracer):
+    """Test that a channel message produces receive, validate, fanout and send spans."""
+    websocket_1.send_json({"type": "channel_request", "to": user_2["address"]})
+    assert websocket_1.receive_json() == {"type": "ack"}
+    websocket_2.receive_json()  # Request notification
+    websocket_2.send_json({"type": "channel_approve", "channel": channel_name})
+    assert websocket_2.receive_json() == {"type": "ack"}
+    websocket_1.receive_json()  # Channel creation notification
+    websocket_2.receive_json()  # Channel creation notification
+
+    websocket_1.send_json({"type": "channel", "channel": channel_name, "data": "traced"})
+    assert websocket_1.receive_json() == {"type": "ack"}
+    websocket_1.receive_json()  # Own copy of the message
+    assert websocket_2.receive_json()["data"] == "traced"
+    stages = tracer.exporter.percentiles()
+    for stage in ("frame", "receive", "dispatch", "validate", "fanout", "send", "storage.subscribe_to_channel"):
+        assert stage in stages, f"Missing stage {stage} in {list(stages)}"
+
+@pytest.mark.asyncio
+async def test_send_span_times_queued_write(tracer):
+    """Test that a frame queued behind a write gets its send span when it is actually written."""
+    import asyncio
+    from app import outbound
+
+    class SlowSocket:
+        async def send_text(self, payload: str):
+            await asyncio.sleep(0.02)
+
+    connection = outbound.OutboundSocket(SlowSocket())
+    first = asyncio.create_task(connection.send_text('{"type":"message"}'))
+    await asyncio.sleep(0)
+    with tracer.trace("frame") as frame:
+        await connection.send_text('{"type":"message"}')
+    await first
+    while connection.bulk or connection._writing:
+        await asyncio.sleep(0.005)
+    sends = [record for record in tracer.exporter.buffer if record["name"] == "send"]
+    assert len(sends) == 1, "Only the sampled frame should have a send span"
+    assert sends[0]["parentSpanId"] == frame.span_id
+    assert sends[0]["endTimeUnixNano"] - sends[0]["startTimeUnixNano"] >= 15_000_000, "Span should cover the write"
+
+def test_admin_traces(client, admin_token, tracer):
+    """Test reading percentiles and changing the sample rate."""
+    response = client.post("/admin/traces", params={"token": admin_token, "sample_rate": 2})
+    assert response.status_code == 400, f"Expected status code 400, got {response.status_code}"
+    response = client.post("/admin/traces", params={"token": admin_token, "sample_rate": 0.25})
+    assert response.json() == {"sample_rate": 0.25}
+    response = client.get("/admin/traces", params={"token": admin_token})
+    assert response.json()["sample_rate"] == 0.25
@@ -33,4 +33,26 @@ def test_generate_jwt_invalid():
     invalid_address = "0xInvalidAddress"
     success, result = utils.generate_jwt(invalid_address)
     assert not success, "Should fail for invalid address"
-    assert "Invalid Ethereum address" in result, f"Expected error message, got: {result}"
\ No newline at end of file
+    assert "Invalid Ethereum address" in result, f"Expected error message, got: {result}"
+
+def test_generate_group_name():
+    """Test group channel name generation and validation."""
+    group_name = utils.generate_group_name()
+    assert utils.is_group_channel(group_name), f"Expected {group_name} to be a group channel"
+    assert utils.is_valid_group_name(group_name), f"Expected {group_name} to be a valid group name"
+    assert group_name != utils.generate_group_name(), "Group names should be unique"
+    assert not utils.is_valid_group_name("group:invalid"), "Expected invalid group name to be rejected"
+
+def test_refresh_token_type():
+    """Test that refresh and access tokens cannot be used in place of each other."""
+    valid_address = "0x1234567890abcdef1234567890abcdef12345678"
+    success, refresh_token = utils.generate_jwt(valid_address, utils.REFRESH_TOKEN)
+    assert success, f"Failed to generate refresh token: {refresh_token}"
+    success, decoded_address = utils.decode_jwt(refresh_token, utils.REFRESH_TOKEN)
+    assert success and decoded_address == valid_address, f"Failed to decode refresh token: {decoded_address}"
+
+    success, result = utils.decode_jwt(refresh_token)
+    assert not success, "Refresh token should not be accepted as access token"
+    success, access_token = utils.generate_jwt(valid_address)
+    success, result = utils.decode_jwt(access_token, utils.REFRESH_TOKEN)
+    assert not success, "Access token should not be accepted as refresh token"
\ No newline at end of file
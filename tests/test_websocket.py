@@ -1,6 +1,6 @@
 # tests/test_websocket.py
 import pytest
-from app import utils
+from app import utils, schemas
 
 @pytest.mark.asyncio
 async def test_websocket_connect(client):
@@ -10,6 +10,8 @@ async def test_websocket_connect(client):
     
     # Connect to WebSocket with token
     with client.websocket_connect(f"/ws/chat?token={token}") as websocket:
+        # The server opens with the initial state
+        assert websocket.receive_json()["type"] == "sync"
         # Send a test JSON message and expect a response
         websocket.send_json({"type": "ping"})
         response = websocket.receive_json()
@@ -64,14 +66,16 @@ async def test_websocket_channel_messaging(websocket_1, websocket_2, user_1, use
         "type": "message",
         "from": user_1["address"],
         "channel": channel_name,
-        "data": message["data"]
+        "data": message["data"],
+        "seq": store.sequences[channel_name]
     }
     ws2_received = websocket_2.receive_json()
     assert ws2_received == {
         "type": "message",
         "from": user_1["address"],
         "channel": channel_name,
-        "data": message["data"]
+        "data": message["data"],
+        "seq": store.sequences[channel_name]
     }
 
 @pytest.mark.asyncio
@@ -241,7 +245,7 @@ async def test_websocket_channel_name_validation(websocket_1, user_1, user_2, ch
     invalid_address = "0xInvalidAddress"
     websocket_1.send_json({"type": "channel_request", "to": invalid_address})
     ws1_response = websocket_1.receive_json()
-    assert ws1_response == {"type": "error", "message": "Invalid Ethereum address"}
+    assert ws1_response["code"] == "invalid_field" and ws1_response["field"] == "to", f"Unexpected response: {ws1_response}"
 
 @pytest.mark.asyncio
 async def test_websocket_disconnect(websocket_1, user_1, store):
@@ -278,7 +282,8 @@ async def test_websocket_multiple_websockets_channel_messaging(websocket_1, webs
         "type": "message",
         "from": user_1["address"],
         "channel": channel_name,
-        "data": message["data"]
+        "data": message["data"],
+        "seq": store.sequences[channel_name]
     }
 
     # Check message received on ws1_1 (user_1's first WebSocket)
@@ -295,4 +300,264 @@ async def test_websocket_multiple_websockets_channel_messaging(websocket_1, webs
 
     # Check message received on websocket_2_2 (user_2's second WebSocket)
     ws2_2_received = websocket_2_2.receive_json()
-    assert ws2_2_received == expected_message
\ No newline at end of file
+    assert ws2_2_received == expected_message
+
+@pytest.mark.asyncio
+async def test_websocket_group_messaging(websocket_1, websocket_2, websocket_3, user_1, user_2, user_3, store):
+    """Test creating a group, accepting invites, messaging all members and leaving it."""
+    # User1 creates a group and invites User2
+    websocket_1.send_json({"type": "group_create", "members": [user_2["address"]]})
+    ws1_ack = websocket_1.receive_json()
+    assert ws1_ack == {"type": "ack"}
+    ws1_info = websocket_1.receive_json()
+    assert ws1_info["type"] == "info" and ws1_info["message"] == "Channel created"
+    group_name = ws1_info["channel"]
+    assert utils.is_valid_group_name(group_name), f"Expected group channel, got {group_name}"
+    ws2_invite = websocket_2.receive_json()
+    assert ws2_invite == {"type": "group_invite", "from": user_1["address"], "channel": group_name}
+
+    # User2 is not a member until the invite is accepted
+    websocket_2.send_json({"type": "channel", "channel": group_name, "data": "Hello?"})
+    ws2_response = websocket_2.receive_json()
+    assert ws2_response == {"type": "error", "message": "Unauthorized access to channel"}
+    websocket_2.send_json({"type": "group_accept", "channel": group_name})
+    assert websocket_2.receive_json() == {"type": "ack"}
+    assert websocket_2.receive_json() == {"type": "info", "message": "Channel created", "channel": group_name}
+
+    # Only the owner can invite
+    websocket_2.send_json({"type": "group_invite", "channel": group_name, "members": [user_3["address"]]})
+    ws2_response = websocket_2.receive_json()
+    assert ws2_response == {"type": "error", "message": "Only the group owner can invite members"}
+
+    # User1 invites User3, who accepts
+    websocket_1.send_json({"type": "group_invite", "channel": group_name, "members": [user_3["address"]]})
+    assert websocket_1.receive_json() == {"type": "ack"}
+    assert websocket_3.receive_json() == {"type": "group_invite", "from": user_1["address"], "channel": group_name}
+    websocket_3.send_json({"type": "group_accept", "channel": group_name})
+    assert websocket_3.receive_json() == {"type": "ack"}
+    assert websocket_3.receive_json() == {"type": "info", "message": "Channel created", "channel": group_name}
+
+    # Message reaches every member
+    websocket_3.send_json({"type": "channel", "channel": group_name, "data": "Hello group!"})
+    ws3_ack = websocket_3.receive_json()
+    assert ws3_ack == {"type": "ack"}
+    expected_message = {
+        "type": "message",
+        "from": user_3["address"],
+        "channel": group_name,
+        "data": "Hello group!",
+        "seq": 1
+    }
+    assert websocket_1.receive_json() == expected_message
+    assert websocket_2.receive_json() == expected_message
+    assert websocket_3.receive_json() == expected_message
+
+    # User3 leaves and the remaining members are told
+    websocket_3.send_json({"type": "group_leave", "channel": group_name})
+    ws3_ack = websocket_3.receive_json()
+    assert ws3_ack == {"type": "ack"}
+    expected_info = {"type": "info", "message": f"Member left: {user_3['address']}", "channel": group_name}
+    assert websocket_1.receive_json() == expected_info
+    assert websocket_2.receive_json() == expected_info
+    assert not store.is_participant(group_name, user_3["address"]), "User3 should have left the group"
+    await store.delete_channel(group_name)
+
+@pytest.mark.asyncio
+async def test_websocket_group_name_validation(websocket_1):
+    """Test that malformed group names are rejected."""
+    websocket_1.send_json({"type": "group_leave", "channel": "group:anything"})
+    ws1_response = websocket_1.receive_json()
+    assert ws1_response["code"] == "invalid_field" and ws1_response["field"] == "channel", f"Unexpected response: {ws1_response}"
+
+@pytest.mark.asyncio
+async def test_group_fanout_with_concurrent_leave(store):
+    """Test that fan-out survives members leaving while sends are in flight."""
+    import asyncio
+    from app.routers import websocket
+
+    class SlowSocket:
+        """WebSocket stand-in that yields to the event loop on every send."""
+        def __init__(self):
+            self.frames = []
+
+        async def send_text(self, data: str):
+            await asyncio.sleep(0)
+            self.frames.append(data)
+
+        async def send_json(self, data: dict):
+            await asyncio.sleep(0)
+            self.frames.append(data)
+
+    owner = f"0x{1:040x}"
+    members = [f"0x{i:040x}" for i in range(2, 50)]
+    sockets = {address: SlowSocket() for address in [owner, *members]}
+    for address, ws in sockets.items():
+        await store.add_connection(address, ws)
+    success, group_name = await store.create_group(owner)
+    assert success, f"Failed to create group: {group_name}"
+    await store.add_group_invites(group_name, owner, members)
+    for address in members:
+        await store.accept_group_invite(group_name, address)
+
+    async def leave_all():
+        for address in members:
+            await store.remove_group_member(group_name, address)
+            await asyncio.sleep(0)
+
+    sender = sockets[owner]
+    await asyncio.gather(
+        websocket.process_channel(sender, schemas.ChannelMessage(type="channel", channel=group_name, data="Hi"), owner),
+        leave_all(),
+    )
+    assert sender.frames[0] == {"type": "ack"}, f"Expected ack, got {sender.frames[0]}"
+    for address, ws in sockets.items():
+        await store.remove_connection(address, ws)
+    await store.delete_channel(group_name)
+
+@pytest.mark.asyncio
+async def test_websocket_presence_subscribe(websocket_1, websocket_2, user_1, user_2, user_3, channel_name, store):
+    """Test subscribing to presence of channel peers."""
+    success, msg = await store.ensure_channel(channel_name, [user_1["address"], user_2["address"]])
+    assert success, f"Failed to ensure channel: {msg}"
+
+    websocket_1.send_json({"type": "presence_subscribe", "addresses": [user_2["address"], user_3["address"]]})
+    ws1_response = websocket_1.receive_json()
+    assert ws1_response == {"type": "presence", "presence": {user_2["address"]: True}}
+
+    websocket_1.send_json({"type": "presence_unsubscribe", "addresses": []})
+    ws1_ack = websocket_1.receive_json()
+    assert ws1_ack == {"type": "ack"}
+
+@pytest.mark.asyncio
+async def test_websocket_renew(websocket_1, user_1, user_2):
+    """Test renewing the access token over an open WebSocket."""
+    success, refresh_token = utils.generate_jwt(user_1["address"], utils.REFRESH_TOKEN)
+    assert success, f"Failed to generate refresh token: {refresh_token}"
+
+    websocket_1.send_json({"type": "renew", "refresh_token": refresh_token})
+    ws1_response = websocket_1.receive_json()
+    assert ws1_response["type"] == "token"
+    success, address = utils.decode_jwt(ws1_response["token"])
+    assert success and address == user_1["address"], f"Renewed token is invalid: {address}"
+
+    # Another address's refresh token or an access token is rejected
+    success, other_refresh_token = utils.generate_jwt(user_2["address"], utils.REFRESH_TOKEN)
+    for token in (other_refresh_token, user_1["token"]):
+        websocket_1.send_json({"type": "renew", "refresh_token": token})
+        ws1_response = websocket_1.receive_json()
+        assert ws1_response == {"type": "error", "message": "Invalid refresh token"}
+
+@pytest.mark.asyncio
+async def test_websocket_search(websocket_1, websocket_3, user_1, user_2, channel_name, store, monkeypatch):
+    """Test searching channel history, restricted to the caller's channels."""
+    import time
+    from app.routers import websocket
+    monkeypatch.setattr(websocket.search_index, "flush_interval", 0.01)
+    success, msg = await store.ensure_channel(channel_name, [user_1["address"], user_2["address"]])
+    assert success, f"Failed to ensure channel: {msg}"
+
+    word = f"needle{int(time.time() * 1000)}"
+    websocket_1.send_json({"type": "channel", "channel": channel_name, "data": f"find the {word} here"})
+    assert websocket_1.receive_json() == {"type": "ack"}
+    websocket_1.receive_json()  # Own copy of the message
+
+    # Indexing is batched, poll until the message is searchable
+    for _ in range(100):
+        websocket_1.send_json({"type": "search", "query": word})
+        ws1_response = websocket_1.receive_json()
+        if ws1_response["total"]:
+            break
+        time.sleep(0.01)
+    assert ws1_response["type"] == "search_results"
+    assert ws1_response["total"] == 1
+    assert ws1_response["hits"][0]["data"] == f"find the {word} here"
+
+    # Non-participants cannot search the channel
+    websocket_3.send_json({"type": "search", "query": word, "channel": channel_name})
+    ws3_response = websocket_3.receive_json()
+    assert ws3_response == {"type": "error", "message": "Unauthorized access to channel"}
+    websocket_3.send_json({"type": "search", "query": word})
+    ws3_response = websocket_3.receive_json()
+    assert ws3_response["total"] == 0, "Search should only cover the caller's channels"
+@pytest.mark.asyncio
+async def test_websocket_receipts(websocket_1, websocket_2, user_1, user_2, channel_name, store):
+    """Test that read receipts are validated and published to the other participant."""
+    success, msg = await store.ensure_channel(channel_name, [user_1["address"], user_2["address"]])
+    assert success, f"Failed to ensure channel: {msg}"
+    websocket_1.send_json({"type": "channel", "channel": channel_name, "data": "Read me"})
+    assert websocket_1.receive_json() == {"type": "ack"}
+    sequence = websocket_1.receive_json()["seq"]
+    assert websocket_2.receive_json()["seq"] == sequence
+
+    websocket_2.send_json({"type": "read", "channel": channel_name, "seq": sequence + 1})
+    assert websocket_2.receive_json() == {"type": "error", "message": "Invalid receipt sequence"}
+
+    websocket_2.send_json({"type": "read", "channel": channel_name, "seq": sequence})
+    assert websocket_1.receive_json() == {
+        "type": "receipts",
+        "channel": channel_name,
+        "delivered": {user_2["address"]: sequence},
+        "read": {user_2["address"]: sequence}
+    }
+
+@pytest.mark.asyncio
+async def test_websocket_ephemeral(websocket_1, websocket_2, websocket_3, user_1, user_2, channel_name, store):
+    """Test that ephemeral events reach the peer without an ack and are refused for non-members."""
+    success, msg = await store.ensure_channel(channel_name, [user_1["address"], user_2["address"]])
+    assert success, f"Failed to ensure channel: {msg}"
+
+    websocket_3.send_json({"type": "ephemeral", "channel": channel_name, "event": "typing"})
+    assert websocket_3.receive_json() == {"type": "error", "message": "Unauthorized access to channel"}
+
+    websocket_1.send_json({"type": "ephemeral", "channel": channel_name, "event": "typing"})
+    assert websocket_2.receive_json() == {
+        "type": "ephemeral",
+        "from": user_1["address"],
+        "channel": channel_name,
+        "event": "typing"
+    }
+    websocket_1.send_json({"type": "ping"})
+    assert websocket_1.receive_json() == {"type": "pong"}, "Ephemeral events should not be acknowledged"
+
+@pytest.mark.asyncio
+async def test_websocket_sync_on_connect(client, websocket_2, user_1, user_2, user_3, channel_name, store):
+    """Test that a new connection gets its channels, pending requests, invites and peer presence."""
+    success, msg = await store.ensure_channel(channel_name, [user_1["address"], user_2["address"]])
+    assert success, f"Failed to ensure channel: {msg}"
+    request_name = utils.generate_channel_name(user_1["address"], user_3["address"])
+    await store.add_channel_request(request_name, user_3["address"])
+    success, group_name = await store.create_group(user_2["address"])
+    await store.add_group_invites(group_name, user_2["address"], [user_1["address"]])
+    try:
+        with client.websocket_connect(f"/ws/chat?token={user_1['token']}") as ws:
+            sync = ws.receive_json()
+        assert sync["type"] == "sync"
+        assert channel_name in sync["channels"]
+        assert {"channel": request_name, "from": user_3["address"]} in sync["requests"]["inbound"]
+        assert sync["invites"] == [{"channel": group_name, "from": user_2["address"]}]
+        assert sync["presence"][user_2["address"]] is True
+        assert store.get_channel_requests(user_3["address"]) == ([], [request_name])
+    finally:
+        await store.delete_channel_request(request_name)
+        await store.delete_channel(group_name)
+    assert user_1["address"] not in store.invitations
+    assert user_3["address"].lower() not in store.request_index
+
+@pytest.mark.asyncio
+async def test_websocket_duplicate_client_msg_id(websocket_1, websocket_2, user_1, user_2, channel_name, store):
+    """Test that a retried message is acknowledged without being broadcast again."""
+    success, msg = await store.ensure_channel(channel_name, [user_1["address"], user_2["address"]])
+    assert success, f"Failed to ensure channel: {msg}"
+    message = {"type": "channel", "channel": channel_name, "data": "Once only", "client_msg_id": "retry-1"}
+
+    websocket_1.send_json(message)
+    assert websocket_1.receive_json() == {"type": "ack", "client_msg_id": "retry-1"}
+    assert websocket_1.receive_json()["data"] == "Once only"
+    assert websocket_2.receive_json()["data"] == "Once only"
+
+    websocket_1.send_json(message)
+    assert websocket_1.receive_json() == {"type": "ack", "client_msg_id": "retry-1"}
+    websocket_1.send_json({"type": "ping"})
+    assert websocket_1.receive_json() == {"type": "pong"}, "The duplicate should not be broadcast"
+    websocket_2.send_json({"type": "ping"})
+    assert websocket_2.receive_json() == {"type": "pong"}, "The duplicate should not be broadcast"